@@ -0,0 +1,272 @@
+"""
+Prueba de carga de la aplicación Streamlit con sesiones concurrentes.
+Prepara un espacio de trabajo temporal (copia de la app cuyo config.yaml apunta a
+sus propios datos), escribe extractos sintéticos del SIS, entrena un modelo
+pequeño con ellos y simula N sesiones autenticadas con AppTest, cada una en su
+propio hilo del mismo proceso (una instancia del servidor). Cada sesión abre la
+página, presiona "Procesar", espera los resultados y cambia de página varias
+veces. Por cada nivel de concurrencia se hacen dos rondas: la primera con la
+caché de etapas vacía y la segunda con la caché que dejó la primera.
+
+Se reportan p50/p95/p99 por etapa y ronda, la memoria de cada sesión (los
+DataFrames que guarda en `st.session_state`) y el crecimiento de la memoria del
+proceso, y se estima cuántas sesiones atiende una instancia sin que la
+interacción rebase el objetivo de latencia.
+
+AppTest reemplaza la instancia global del Runtime de Streamlit en cada
+ejecución, así que las ejecuciones del script de las sesiones se serializan con
+un candado; las corridas en segundo plano sí se traslapan. Por cada ejecución
+se mide aparte la espera por el candado (la cola de reruns de una instancia, que
+en este arnés crece con el número de hilos aunque el servidor real atendería
+reruns en paralelo) y el tiempo de ejecución del script; los percentiles y el
+objetivo de latencia se evalúan sobre la ejecución, y la espera se reporta como
+referencia. Una sesión que falla registra su error y no bloquea a las demás.
+
+AppTest no maneja `st.file_uploader`: los extractos se escriben donde los guarda
+la carga de archivos (`files` del config.yaml del espacio de trabajo) y, con
+`source: warehouse`, se integran al almacén en la primera corrida.
+
+Uso:
+    python -m benchmarks.bench_app_load --sesiones 1 4 8 --alumnos 5000
+"""
+import argparse
+import logging
+import os
+import resource
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from benchmarks.bench_preprocess_backends import synthetic_data
+from src.pipelines.pipeline_preprocessing import MATERIA_MAPPING
+from src.utils.cache_utils import TieredCache
+from src.utils.config_utils import PreprocessConfig
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Archivos de la app que se copian al espacio de trabajo
+APP_FILES = ['streamlit_app.py', 'config', 'static', '.streamlit']
+# Rejilla mínima para entrenar el modelo del espacio de trabajo
+TRAINING = {'output_dir': './src/models/', 'cache_dir': './data/processed/cache/', 'n_jobs': 1,
+            'cv_folds': 2, 'param_grid': {'n_estimators': [50], 'max_depth': [10]}}
+# Llaves de `st.session_state` con DataFrames de la sesión
+SESSION_FRAMES = ['results', 'prepared', 'drift']
+# Consulta del avance mientras la corrida está en proceso (segundos)
+POLL_SEC = 0.25
+PERCENTILES = [50, 95, 99]
+# AppTest no admite ejecuciones simultáneas del script en un mismo proceso
+_run_lock = threading.Lock()
+
+
+def write_extracts(config: dict, n_students: int) -> None:
+    """Escribe los extractos sintéticos del SIS y los catálogos en las rutas de `files`."""
+    df_cal, df_alumn, df_dcalumn, code_tables = synthetic_data(n_students)
+    # Las calificaciones sintéticas ya vienen por materia: se regresa a una clave del SIS por materia
+    raw_codes = {subject: code for code, subject in reversed(list(MATERIA_MAPPING.items()))}
+    df_cal = df_cal.assign(matcve=df_cal['matcve'].map(raw_codes))
+    files = config['files']
+    for table, df, encoding in [('dalumn', df_alumn, 'latin1'), ('dcalum', df_dcalumn, 'latin1'),
+                                ('dkarde', df_cal, 'utf-8')]:
+        os.makedirs(os.path.dirname(files[table]), exist_ok=True)
+        df.to_csv(files[table], index=False, encoding=encoding)
+    for table, df in zip(['ubicaciones', 'escuelas', 'plan_estudio', 'especialidad'], code_tables):
+        df.to_csv(files[table], index=False, encoding='latin1')
+
+
+def prepare_workspace(workspace: str, n_students: int) -> PreprocessConfig:
+    """Copia la app al espacio de trabajo, escribe los extractos y entrena el modelo.
+
+    Las rutas relativas de config.yaml se resuelven desde el directorio actual,
+    así que al terminar el proceso queda ubicado en `workspace`.
+    """
+    os.makedirs(workspace, exist_ok=True)
+    for name in APP_FILES:
+        source = os.path.join(REPO_DIR, name)
+        target = os.path.join(workspace, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, target, dirs_exist_ok=True)
+        elif os.path.exists(source):
+            shutil.copy2(source, target)
+    os.chdir(workspace)
+    config_path = os.path.join('config', 'config.yaml')
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    config['training'] = {**(config.get('training') or {}), **TRAINING}
+    write_extracts(config, n_students)
+
+    from src.pipelines.pipeline_training import TrainingPipeline
+    print('Entrenando el modelo del espacio de trabajo...')
+    model_dir = TrainingPipeline(PreprocessConfig(**config)).train()
+    config['files'].update({'model': os.path.join(model_dir, 'modelo_abandono.joblib'),
+                            'prep_artifact': os.path.join(model_dir, 'preparacion.joblib'),
+                            'drift_baseline': os.path.join(model_dir, 'linea_base_deriva.json')})
+    config['models'] = {'abandono': config['files']['model']}
+    with open(config_path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True, sort_keys=False)
+    return PreprocessConfig(**config)
+
+
+def session_memory(at) -> int:
+    """Bytes de los DataFrames que la sesión guarda en `st.session_state`."""
+    frames = [at.session_state[key] for key in SESSION_FRAMES if key in at.session_state]
+    # La matriz preparada se guarda por campus
+    frames += [df for value in frames if isinstance(value, dict) for df in value.values()]
+    if 'view' in at.session_state:
+        frames.append(at.session_state['view']['df'])
+    return int(sum(df.memory_usage(index=True, deep=True).sum() for df in frames if isinstance(df, pd.DataFrame)))
+
+
+def run_session(app_path: str, user: str, interactions: int, timeout: float, barrier: threading.Barrier,
+                samples: list, outcome: dict) -> None:
+    """Una sesión autenticada: abre la página, procesa, espera los resultados y pagina.
+
+    Cada muestra registra el tiempo total ('seg') y la parte que esperó el
+    candado ('espera'). Cualquier falla queda en `outcome['error']`; si ocurre
+    antes de la barrera, la barrera se aborta para liberar a las demás sesiones.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    def run(action=None) -> float:
+        """Ejecuta el script con el candado y regresa la espera por el candado (s)."""
+        start = time.perf_counter()
+        with _run_lock:
+            waited = time.perf_counter() - start
+            (action or at.run)()
+        return waited
+
+    def timed(stage: str, action=None) -> None:
+        start = time.perf_counter()
+        waited = run(action)
+        samples.append({'etapa': stage, 'seg': time.perf_counter() - start, 'espera': waited})
+
+    try:
+        at = AppTest.from_file(app_path, default_timeout=timeout)
+        # Sesión ya autenticada (como al volver con la cookie del autenticador)
+        at.session_state['authentication_status'] = True
+        at.session_state['name'] = at.session_state['username'] = user
+        barrier.wait(timeout=timeout)
+        timed('inicio')
+        button = [b for b in at.button if b.label == 'Procesar'][0]
+        start = time.perf_counter()
+        timed('envio', button.click().run)
+        waited = 0.0
+        while not any(c.value.startswith('Corrida registrada') for c in at.caption):
+            if at.exception or at.error or time.perf_counter() - start > timeout:
+                outcome['error'] = '; '.join([e.value for e in at.error] + [e.message for e in at.exception]) or 'timeout'
+                return
+            time.sleep(POLL_SEC)
+            waited += run()
+        samples.append({'etapa': 'corrida', 'seg': time.perf_counter() - start, 'espera': waited})
+        for i in range(interactions):
+            page = [n for n in at.number_input if n.label == 'Página'][0]
+            timed('interaccion', lambda: page.set_value(2 if page.value == 1 else 1).run())
+        outcome['job_id'] = at.session_state['job_id']
+        outcome['memoria'] = session_memory(at)
+    except threading.BrokenBarrierError:
+        outcome['error'] = 'sesión cancelada: otra sesión falló antes de empezar'
+    except Exception as e:
+        barrier.abort()
+        outcome['error'] = f'{type(e).__name__}: {e}'
+
+
+def run_level(app_path: str, n_sessions: int, interactions: int, timeout: float) -> tuple[pd.DataFrame, list]:
+    """Ejecuta `n_sessions` sesiones a la vez y regresa sus tiempos y resultados."""
+    samples, outcomes, threads = [], [{} for _ in range(n_sessions)], []
+    barrier = threading.Barrier(n_sessions)
+    for i in range(n_sessions):
+        thread = threading.Thread(target=run_session, args=(app_path, f'asesor{i}', interactions, timeout,
+                                                            barrier, samples, outcomes[i]))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return pd.DataFrame(samples, columns=['etapa', 'seg', 'espera']), outcomes
+
+
+def rss_mb() -> float:
+    """Memoria residente actual del proceso (MB)."""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+def percentile_table(df: pd.DataFrame) -> pd.DataFrame:
+    """p50/p95/p99 y máximo (ms) del tiempo de ejecución, y p95 de la espera por el candado,
+    por nivel, ronda y etapa."""
+    df = df.assign(ms=(df['seg'] - df['espera']) * 1000, espera_ms=df['espera'] * 1000)
+    grouped = df.groupby(['sesiones', 'ronda', 'etapa'], sort=False)
+    table = grouped['ms'].quantile([p / 100 for p in PERCENTILES]).unstack()
+    table.columns = [f'p{p}' for p in PERCENTILES]
+    table['max'] = grouped['ms'].max()
+    table['p95_espera'] = grouped['espera_ms'].quantile(0.95)
+    table = table.round(1)
+    table['n'] = grouped.size()
+    return table.reset_index()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sesiones', type=int, nargs='+', default=[1, 4, 8], help='Niveles de concurrencia')
+    parser.add_argument('--alumnos', type=int, default=5_000, help='Alumnos del extracto sintético')
+    parser.add_argument('--interacciones', type=int, default=5, help='Cambios de página por sesión')
+    parser.add_argument('--slo-ms', type=float, default=1_000, help='Objetivo de p95 de la ejecución de la interacción (ms)')
+    parser.add_argument('--timeout', type=float, default=600, help='Tiempo máximo por corrida (s)')
+    parser.add_argument('--espacio', default=None, help='Directorio de trabajo (por defecto uno temporal)')
+    parser.add_argument('--salida', default=None, help='CSV con los percentiles por etapa')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    workspace = os.path.abspath(args.espacio or tempfile.mkdtemp(prefix='edutrack_carga_'))
+    print(f'Espacio de trabajo: {workspace}')
+    config = prepare_workspace(workspace, args.alumnos)
+    app_path = os.path.join(workspace, 'streamlit_app.py')
+    stage_cache = TieredCache.for_path(config.files['stage_cache'])
+
+    frames, capacity = [], []
+    for n_sessions in args.sesiones:
+        stage_cache.clear()
+        for round_name in ['fria', 'caliente']:
+            base_rss = rss_mb()
+            start = time.perf_counter()
+            df_level, outcomes = run_level(app_path, n_sessions, args.interacciones, args.timeout)
+            wall = time.perf_counter() - start
+            errors = [o['error'] for o in outcomes if 'error' in o]
+            memory = [o['memoria'] for o in outcomes if 'memoria' in o]
+            frames.append(df_level.assign(sesiones=n_sessions, ronda=round_name))
+            interaction = df_level.loc[df_level['etapa'] == 'interaccion']
+            run_time = interaction['seg'] - interaction['espera']
+            capacity.append({
+                'sesiones': n_sessions, 'ronda': round_name, 'duracion_s': round(wall, 1),
+                'errores': len(errors), 'trabajos': len({o['job_id'] for o in outcomes if 'job_id' in o}),
+                'p95_interaccion_ms': round(float(np.percentile(run_time, 95)) * 1000, 1) if len(run_time) else np.nan,
+                'p95_espera_ms': (round(float(np.percentile(interaction['espera'], 95)) * 1000, 1)
+                                  if len(interaction) else np.nan),
+                'mem_sesion_mb': round(np.mean(memory) / 2**20, 2) if memory else np.nan,
+                'rss_por_sesion_mb': round(max(rss_mb() - base_rss, 0) / n_sessions, 2),
+            })
+            for error in errors:
+                print(f'❌ {n_sessions} sesiones, ronda {round_name}: {error}')
+
+    df_report = percentile_table(pd.concat(frames, ignore_index=True))
+    df_capacity = pd.DataFrame(capacity)
+    print('\nLatencia por etapa (ms de ejecución; p95_espera: espera por el candado)')
+    print(df_report.to_string(index=False))
+    print('\nCapacidad por nivel de concurrencia')
+    print(df_capacity.to_string(index=False))
+    # Un nivel se sostiene si ninguna de sus rondas tuvo errores ni su ejecución rebasó el objetivo
+    passed = (df_capacity['errores'] == 0) & (df_capacity['p95_interaccion_ms'] <= args.slo_ms)
+    levels = passed.groupby(df_capacity['sesiones']).all()
+    supported = max(levels[levels].index, default=0)
+    print(f'\nSesiones por instancia con p95 de ejecución de la interacción <= {args.slo_ms:.0f} ms: {supported} '
+          f'(máximo nivel probado: {max(args.sesiones)}; peak RSS del proceso '
+          f'{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.0f} MB)')
+    if args.salida:
+        df_report.to_csv(args.salida, index=False)
+        print(f'Percentiles guardados en {args.salida}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Comparativo de los motores de preprocesamiento (pandas vs Polars).
+Genera en memoria datos sintéticos del SIS para N alumnos (ya en la forma que
+entrega `load_data`), ejecuta las transformaciones con ambos motores, verifica
+que los resultados sean idénticos y reporta tiempos.
+
+Uso:
+    python -m benchmarks.bench_preprocess_backends --alumnos 1000000 --repeticiones 1
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.pipelines.pipeline_preprocessing import transform_data
+from src.pipelines.pipeline_preprocessing_polars import transform_data_polars
+
+# Columnas del SIS que el preprocesamiento descarta (solo deben existir)
+EXTRA_ALUMN = ['peerson', 'alute1', 'alute2', 'alumaii', 'alusmei', 'alusmea', 'alutsa', 'alupad', 'alupadt',
+               'alumadt', 'alutno', 'alutcl', 'alutnu', 'alutco', 'alutmu', 'alutci', 'alutte1', 'alutte2',
+               'alutmai', 'alufac', 'alutwi', 'alutce', 'alupasc', 'aluteotr', 'alutecll', 'alutenum',
+               'alutecol', 'aluteciu', 'alutemun', 'alutetel', 'alutepto', 'aluale', 'alupsi', 'aluoest',
+               'aluotra', 'alutinl', 'alutpot', 'alutsec', 'alulare', 'alulfde', 'alulfha', 'aluteanp',
+               'aluteotrt', 'aludch', 'aluescpd', 'aluescpa', 'alulemp', 'aluest', 'alupes', 'aluteing',
+               'alupegel', 'aluptoefl', 'alucll', 'alunum', 'alucol', 'aluciu', 'alumad', 'alumai', 'alupas',
+               'alurfc', 'alucur', 'aluseg']
+EXTRA_DCALUM = ['extcve', 'siscve', 'calplai', 'lincve', 'calcari', 'id', 'tbecve', 'gincve', 'cve',
+                'calter', 'calgpo', 'calobs']
+SUBJECTS = ['Algb_Lin', 'Calc_Dif', 'Calc_Int', 'Estad', 'Fund_Inv', 'Quim', 'Etica']
+
+
+def synthetic_data(n_students: int, seed: int = 0) -> tuple:
+    """Datos sintéticos con la forma de la salida de `load_data` y de `load_code_tables`.
+
+    Args:
+        n_students (int): Número de alumnos
+        seed (int): Semilla del generador
+
+    Returns:
+        tuple: (df_cal, df_alumn, df_dcalumn, code_tables)
+    """
+    rng = np.random.default_rng(seed)
+    n = n_students
+    ctr = pd.Series(np.arange(17_000_000, 17_000_000 + n)).astype(str).radd('E').to_numpy(dtype=object)
+
+    def codes(values, blank=0.05):
+        v = rng.choice(np.array(values, dtype=object), n)
+        v[rng.random(n) < blank] = ' '
+        return v
+
+    def location():
+        v = (rng.integers(1, 33, n) * 1000 + rng.integers(1, 20, n)).astype(float)
+        v[rng.random(n) < 0.05] = np.nan
+        return v
+
+    birth = pd.Series(pd.to_datetime({'year': rng.integers(1995, 2005, n), 'month': rng.integers(1, 13, n),
+                                      'day': rng.integers(1, 28, n)}).dt.strftime('%m/%d/%Y'), dtype=object)
+    birth[rng.random(n) < 0.03] = '/  /'
+    df_alumn = pd.DataFrame({
+        'aluctr': ctr, 'aluapp': 'PEREZ', 'aluapm': 'LOPEZ', 'alunom': rng.choice(['ANA', 'LUIS', 'MARIA'], n),
+        'alunac': birth.to_numpy(), 'alusex': rng.integers(1, 3, n), 'alulna': location(), 'alumun': location(),
+        'aluesc': rng.integers(1, 40, n), 'aluegr': rng.choice([2015, 2016, 17, 0], n),
+        'aluescp': rng.choice([0, 8, 9, 75, 80, 85, 92], n), 'alucpo': rng.choice([81000, 81010, 0, 81020], n),
+        'alusme': codes(['1', '2', '3', '4', '5', '6']), 'alueci': codes(['1', '2', '3']),
+        'aluare': codes(['1', '2', '3', '4', '5', '6']), 'alupadv': codes(['S', 'N']),
+        'alumadv': codes(['S', 'N']), 'alutcp': codes(['81000', '*****', '81010'], 0),
+        'alutra': rng.integers(0, 3, n), 'alulexp': codes(['S', 'N']), 'alutecpo': rng.integers(0, 3, n),
+        'alupexani': rng.integers(700, 1300, n), 'discve': rng.integers(0, 2, n), 'alucen': rng.integers(0, 2, n),
+        **{col: 1 for col in EXTRA_ALUMN},
+    })
+    df_dcalumn = pd.DataFrame({
+        'aluctr': ctr, 'carcve': rng.choice([1, 2, 3, 4, 6], n), 'placve': rng.integers(1, 6, n),
+        'espcve': codes(['1', '2'], 0.2), 'caling': rng.choice([2151, 2152, 2161, 2162, 2171], n),
+        'calsit': rng.choice([1, 2, 4, 5], n), 'calnpe': rng.integers(1, 12, n), 'calcac': rng.integers(0, 260, n),
+        'calnpec': rng.integers(0, 2, n), 'caltcala': rng.integers(0, 50, n), 'caltcalr': rng.integers(0, 10, n),
+        'calmata': rng.integers(0, 50, n), 'calmat': rng.integers(0, 60, n), 'calmatac': rng.integers(0, 5, n),
+        'calpri': codes(['*'], 0.7), 'calnpep': rng.integers(0, 2, n), 'calingt': codes(['N', 'T', 'E'], 0.2),
+        'calingi': rng.choice([0, 0, 0, 1, 52], n),
+        **{col: 1 for col in EXTRA_DCALUM},
+    })
+    # Calificaciones ya reducidas: a lo más un registro por alumno y materia
+    taken = rng.random((n, len(SUBJECTS))) < 0.6
+    rows, subj = np.nonzero(taken)
+    df_cal = pd.DataFrame({
+        'aluctr': ctr[rows], 'matcve': np.array(SUBJECTS, dtype=object)[subj],
+        'karcal': pd.array(rng.integers(0, 101, len(rows)), dtype='Int64'),
+        'tcacve': pd.array(rng.choice([0, 1, 2, 3, 4, 91], len(rows)), dtype='Int64'),
+    })
+
+    st, mu = np.repeat(np.arange(1, 33), 20), np.tile(np.arange(1, 21), 32)
+    loc_codes = pd.DataFrame({'muncve': mu, 'estcve': st, 'munnom': [f'MUN{m}' for m in mu],
+                              'estnom': [f'EST{s}' for s in st], 'cve': st * 1000 + mu})
+    school_codes = pd.DataFrame({'esccve': np.arange(1, 40), 'escnomcto': [f'ESC{i % 12}' for i in range(1, 40)]})
+    careers = [1, 2, 3, 4, 6]
+    plan_codes = pd.DataFrame([(c, p, f'PLAN{c}{p}') for c in careers for p in range(1, 6)],
+                              columns=['carcve', 'placve', 'placof'])
+    esp_codes = pd.DataFrame([(e, p, c, f'ESP{c}{e}') for c in careers for p in range(1, 6) for e in (1, 2)],
+                             columns=['espcve', 'placve', 'carcve', 'espnco'])
+    return df_cal, df_alumn, df_dcalumn, (loc_codes, school_codes, plan_codes, esp_codes)
+
+
+def timed(fn, data, repeats: int) -> tuple:
+    """Mejor tiempo de `repeats` ejecuciones (ningún motor modifica los DataFrames de entrada)."""
+    best, result = float('inf'), None
+    for _ in range(repeats):
+        result = None
+        start = time.perf_counter()
+        result = fn(*data, keep_target=True)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--alumnos', type=int, default=1_000_000, help='Número de alumnos sintéticos')
+    parser.add_argument('--repeticiones', type=int, default=1, help='Ejecuciones por motor (se reporta la mejor)')
+    parser.add_argument('--solo-polars', action='store_true', help='No ejecuta el motor de pandas')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f'Generando datos sintéticos para {args.alumnos:,} alumnos...')
+    data = synthetic_data(args.alumnos)
+    print(f'  calificaciones: {len(data[0]):,} registros')
+
+    t_polars, (pl_main, pl_names) = timed(transform_data_polars, data, args.repeticiones)
+    print(f'polars: {t_polars:8.2f} s  ({len(pl_main):,} alumnos procesados)')
+    if args.solo_polars:
+        return
+    t_pandas, (pd_main, pd_names) = timed(transform_data, data, args.repeticiones)
+    print(f'pandas: {t_pandas:8.2f} s')
+    pd.testing.assert_frame_equal(pd_main, pl_main)
+    pd.testing.assert_frame_equal(pd_names, pl_names)
+    print(f'Resultados idénticos; aceleración x{t_pandas / t_polars:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Corridas particionadas por campus.
+Cada campus tiene sus propias entradas, almacén, cachés, historial y modelo (ver
+`PreprocessConfig.for_campus`); aquí cada campus es una etapa independiente de
+un `StageGraph`, así que las corridas de todos los campus se ejecutan en
+paralelo y el reporte de tiempos muestra cuál campus define la duración total.
+Una etapa que falla cancela las de los demás campus que no han empezado.
+
+Uso:
+    python -m src.pipelines.pipeline_campus
+"""
+import os
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+
+from src.utils import load_config
+from src.utils.config_utils import PreprocessConfig
+from src.utils.dag_utils import StageGraph
+from src.utils.logging_utils import config_logging
+from src.pipelines import pipeline_preprocessing as pl_prep
+
+logger = config_logging()
+
+# Columna que identifica el campus de cada fila en los resultados combinados
+CAMPUS_COL = 'Campus'
+
+
+def run_per_campus(campuses: Dict[str, PreprocessConfig], func: Callable[[str, PreprocessConfig], Any],
+                   name: str = 'campus', max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """Ejecuta `func(campus, config)` para cada campus en paralelo.
+
+    Args:
+        campuses (Dict[str, PreprocessConfig]): Configuración de cada campus
+            (`PreprocessConfig.campus_configs()`)
+        func (Callable): Corrida de un campus; solo debe usar las rutas de su configuración
+        name (str): Nombre del grafo en el reporte de tiempos y en las métricas
+        max_workers (Optional[int]): Campus ejecutándose a la vez; por defecto todos
+
+    Returns:
+        Dict[str, Any]: Resultado de cada campus, en el orden de `campuses`
+    """
+    graph = StageGraph(name)
+    for campus, config in campuses.items():
+        graph.add(campus, lambda campus=campus, config=config: func(campus, config))
+    logger.info(f'🔄 {name}: {len(campuses)} campus en paralelo: {list(campuses)}')
+    return graph.run(list(campuses), max_workers=max_workers)
+
+
+def concat_campuses(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Une los resultados de cada campus con la columna CAMPUS_COL al inicio.
+
+    Con un solo campus (configuración sin `campuses`) el resultado no cambia de
+    columnas, de modo que las corridas de un solo campus conservan su formato.
+    """
+    if len(frames) == 1:
+        return next(iter(frames.values())).reset_index(drop=True)
+    df = pd.concat({campus: df.reset_index(drop=True) for campus, df in frames.items()}, names=[CAMPUS_COL, None])
+    return df.reset_index(level=CAMPUS_COL).reset_index(drop=True)
+
+
+def preprocess_campuses(config: PreprocessConfig, keep_target: bool = False) -> Dict[str, tuple]:
+    """Preprocesa todos los campus en paralelo.
+
+    Args:
+        config (PreprocessConfig): Configuración general (con o sin `campuses`)
+        keep_target (bool): Conservar la columna 'abandono'
+
+    Returns:
+        Dict[str, tuple]: (df_main, df_students_names) de `preprocess_pipeline` por campus
+    """
+    return run_per_campus(config.campus_configs(),
+                          lambda campus, cfg: pl_prep.preprocess_pipeline(cfg, keep_target=keep_target),
+                          name='preprocesamiento_campus')
+
+
+if __name__ == "__main__":
+    main_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    config = PreprocessConfig(**load_config(os.path.join(main_path, 'config', 'config.yaml')))
+    for campus, (df_main, _) in preprocess_campuses(config).items():
+        logger.info(f'✅ {campus}: {len(df_main)} alumnos preprocesados')
@@ -1,26 +1,66 @@
-from sklearn.preprocessing import MinMaxScaler
 from src.utils.logging_utils import config_logging
 import math
 import pandas as pd
 import numpy as np
 import logging
+from typing import Optional, Union
+from scipy import sparse as sp
 
 logger = config_logging()
 
+# Rol de cada variable numérica en la normalización: las binarias se dejan
+# igual; ordinales y continuas se escalan a [0, 1] con sus rangos (min-max)
+NUMERIC_ROLES = {
+    'binary': ['genero'],
+    'ordinal': ['period_ingreso', 'period_ultimo', 'period_conval', 'period_aut_comite', 'mat_aprob',
+                'mat_cursadas', 'mat_con_ac', 'edad', 'año_egreso'],
+    'continuous': ['cred_acum', 'calif_aprob', 'prom_ingreso', 'cod_postal', 'Algb_Lin', 'Calc_Dif',
+                   'Calc_Int', 'Estad', 'Fund_Inv', 'Quim', 'Etica'],
+}
+SCALED_ROLES = ('ordinal', 'continuous')
+# Filas por bloque en la reducción de mínimos y máximos
+NORMALIZE_CHUNK = 65_536
+
+# Celdas (filas x dummies) a partir de las cuales el bloque one-hot se entrega disperso
+DENSE_ONEHOT_LIMIT = 50_000_000
+
 class DataPreparationPipeline:
-    def __init__(self, df_processed: pd.DataFrame) -> None:
+    def __init__(self, df_processed: pd.DataFrame, artifact: Optional[dict] = None, sparse: bool = False) -> None:
         """Inicializa el pipeline de preparación de datos.
 
         Args:
             df_processed (pd.DataFrame): DataFrame que contiene los datos procesados
                                        provenientes de la pipeline de preprocesamiento.
+            artifact (Optional[dict]): Artefacto ajustado en el entrenamiento (categorías
+                                       conservadas, rangos de normalización y columnas
+                                       finales). Si es None se ajusta con los datos recibidos.
+            sparse (bool): Si es True el resultado se arma como matriz CSR (variables
+                                       numéricas + bloque one-hot) en lugar de DataFrame;
+                                       se obtiene con `get_prepared_matrix`.
 
         Returns:
             None: El constructor inicializa los atributos de la clase pero no retorna nada.
         """
         self.df_processed = df_processed
+        self.is_fitted = artifact is not None
+        self.artifact = artifact if artifact is not None else {}
+        self.sparse = sparse
+        self.onehot = None
+        self.onehot_names = []
+        self.X_prepared = None
         self.df_prepared = self.start_data_preparation(df_processed)
 
+    def get_artifact(self) -> dict:
+        """Retorna el artefacto de preparación para reutilizarlo al calificar.
+
+        Returns:
+            dict: 'categories' (categorías conservadas por variable), 'labels'
+                (etiquetas de las dummies por variable, la categoría base primero),
+                'scaler' (columnas, mínimos y máximos de la normalización) y
+                'columns' (orden final de las variables).
+        """
+        return self.artifact
+
     def get_prepared_data(self) -> pd.DataFrame:
         """Retorna el DataFrame procesado.
 
@@ -29,6 +69,17 @@ class DataPreparationPipeline:
         """
         return self.df_prepared
 
+    def get_prepared_matrix(self) -> tuple[Union[np.ndarray, sp.csr_matrix], list]:
+        """Retorna la matriz de variables lista para el modelo.
+
+        Returns:
+            tuple: (X, nombres de columnas); X es CSR float32 si el pipeline se creó
+                con `sparse=True` y un arreglo float32 denso en caso contrario.
+        """
+        if self.sparse:
+            return self.X_prepared, self.artifact['columns']
+        return self.df_prepared.to_numpy(dtype=np.float32), list(self.df_prepared.columns)
+
     def drop_useless_cols(self, df: pd.DataFrame) -> pd.DataFrame:
         """Elimina columnas innecesarias basadas en análisis exploratorio."""
         try:
@@ -134,19 +185,17 @@ class DataPreparationPipeline:
         try:
             logger.info('🔄 Iniciando codificación de variables categóricas.')
             cat_vars = df.select_dtypes(include="category").columns
-            
-            def data_discretization(df: pd.DataFrame, cols: list, threshold=0.05):
-                for col in cols:
-                    freq = df[col].value_counts(normalize=True).sort_values()
-                    cat_cum = freq.cumsum()
-                    cat_low_freq = cat_cum[cat_cum <= threshold].index
-                    df[col] = df[col].apply(lambda x: 'otros' if x in cat_low_freq else x)
-                return df
-
-            df = data_discretization(df, cat_vars)
-            dummies = pd.get_dummies(df[cat_vars], prefix_sep='>', drop_first=True, dtype=int)
-            df = pd.concat([df, dummies], axis=1)
+            onehot, names = self.encode_categories(df[cat_vars])
             df = df.drop(columns=cat_vars)
+            self.onehot_names = names
+            if self.sparse:
+                # El bloque one-hot se une con las numéricas al final, ya normalizadas
+                self.onehot = onehot
+            else:
+                # Un bloque grande se conserva disperso dentro del DataFrame (columnas Sparse[uint8])
+                dummies = (pd.DataFrame.sparse.from_spmatrix(onehot, index=df.index, columns=names)
+                           if sp.issparse(onehot) else pd.DataFrame(onehot, columns=names, index=df.index))
+                df = pd.concat([df, dummies], axis=1)
 
             logger.info(f'✅ Codificación de variables categóricas terminada.')
             return df
@@ -154,26 +203,174 @@ class DataPreparationPipeline:
             logger.error(f"❌ Error en la codificación de variables categóricas: {str(e)}")
             raise
 
+    def collapse_categories(self, col: str, values: pd.Series, threshold: float = 0.05) -> tuple[np.ndarray, list]:
+        """Agrupa categorías poco frecuentes en 'otros' operando sobre los códigos.
+
+        Equivale a reemplazar celda por celda las categorías poco frecuentes (o no
+        vistas en el entrenamiento) por 'otros' y codificar con `pd.get_dummies`,
+        pero el reemplazo se calcula una vez por categoría y se aplica a los códigos.
+        Con artefacto, las etiquetas (y la categoría base omitida) son las del
+        entrenamiento y no las presentes en el lote, para que cada dummy
+        corresponda a la misma categoría que vio el modelo.
+
+        Args:
+            col (str): Nombre de la variable
+            values (pd.Series): Variable categórica
+            threshold (float): Frecuencia acumulada máxima de las categorías agrupadas
+
+        Returns:
+            tuple: (código por fila en `labels`, -1 si es nulo; etiquetas en el orden de las dummies)
+        """
+        categories = self.artifact.setdefault('categories', {})
+        cats = values.cat.categories
+        if self.is_fitted:
+            # Categorías no vistas o poco frecuentes en el entrenamiento se agrupan en 'otros'
+            kept = set(categories.get(col, []))
+            mapped = cats.map(lambda x: x if x in kept else 'otros')
+        else:
+            freq = values.value_counts(normalize=True).sort_values()
+            cat_cum = freq.cumsum()
+            cat_low_freq = cat_cum[cat_cum <= threshold].index
+            categories[col] = [cat for cat in freq.index if cat not in cat_low_freq]
+            mapped = cats.map(lambda x: 'otros' if x in cat_low_freq else x)
+
+        codes = values.cat.codes.to_numpy()
+        if self.is_fitted:
+            # Una etiqueta que no existía en el entrenamiento queda en -1 (todas sus dummies en 0)
+            labels = pd.Index(self.fitted_labels(col), dtype=object)
+        elif mapped.is_unique and not mapped.hasnans:
+            # Reemplazo uno a uno: se conservan todas las categorías en su orden
+            labels = pd.Index(mapped)
+        else:
+            # Varias categorías se funden: etiquetas presentes, ordenadas como en get_dummies
+            present, first = np.unique(codes[codes >= 0], return_index=True)
+            in_order = mapped.take(present[np.argsort(first)]).unique()
+            labels = pd.Categorical(in_order).categories
+        if not self.is_fitted:
+            self.artifact.setdefault('labels', {})[col] = list(labels)
+        lookup = np.append(labels.get_indexer(mapped), -1)
+        return lookup[codes], list(labels)
+
+    def fitted_labels(self, col: str) -> list:
+        """Etiquetas de las dummies de `col` en el entrenamiento, la categoría base primero.
+
+        Los artefactos anteriores a 'labels' se reconstruyen con las dummies de
+        'columns'; su categoría base no se conoce y queda como None.
+        """
+        if col in self.artifact.get('labels', {}):
+            return self.artifact['labels'][col]
+        prefix = f'{col}>'
+        return [None] + [name[len(prefix):] for name in self.artifact['columns'] if name.startswith(prefix)]
+
+    def encode_categories(self, df_cat: pd.DataFrame) -> tuple[Union[np.ndarray, sp.csr_matrix], list]:
+        """Codificación one-hot (sin la primera categoría) de las variables categóricas.
+
+        Args:
+            df_cat (pd.DataFrame): Variables categóricas
+
+        Returns:
+            tuple: (bloque one-hot, nombres 'variable>categoría'); uint8 denso si cabe
+                en DENSE_ONEHOT_LIMIT celdas y CSR en caso contrario o en modo disperso.
+        """
+        rows, cols, names = [], [], []
+        for col in df_cat.columns:
+            codes, labels = self.collapse_categories(col, df_cat[col])
+            hit = np.flatnonzero(codes > 0)
+            rows.append(hit)
+            cols.append(len(names) + codes[hit] - 1)
+            names.extend(f'{col}>{label}' for label in labels[1:])
+        n_rows = len(df_cat)
+        rows = np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+        cols = np.concatenate(cols) if cols else np.array([], dtype=np.int64)
+        if self.sparse or n_rows * len(names) > DENSE_ONEHOT_LIMIT:
+            return sp.csr_matrix((np.ones(len(rows), dtype=np.uint8), (rows, cols)), shape=(n_rows, len(names))), names
+        onehot = np.zeros((n_rows, len(names)), dtype=np.uint8)
+        onehot[rows, cols] = 1
+        return onehot, names
+
     def normalize_vars(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Normaliza variables numéricas usando MinMaxScaler."""
+        """Normaliza variables numéricas a [0, 1] (min-max) según su rol en NUMERIC_ROLES.
+
+        Las variables a escalar se copian una sola vez a un bloque float32 contiguo;
+        mínimos y máximos se obtienen en una pasada por bloques de filas (o se
+        toman del artefacto) y el escalado se aplica sobre el mismo bloque.
+
+        Una variable numérica sin rol en NUMERIC_ROLES se escala como continua,
+        salvo que solo tome valores 0/1: esa se deja sin escalar como binaria (una
+        columna constante de 1 se volvería 0 con min-max). En ambos casos se avisa
+        para que la variable se declare en NUMERIC_ROLES.
+        """
         try:
             logger.info('🔄 Iniciando normalización de variables.')
-            numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns
-            binary_cols = [col for col in numeric_cols if set(df[col].unique()).issubset({0, 1})]
-            cols_to_norm = [col for col in numeric_cols if col not in binary_cols]
-            
-            if cols_to_norm:
-                scaler = MinMaxScaler()
-                df[cols_to_norm] = scaler.fit_transform(df[cols_to_norm])
-                logger.info(f'✅ Normalización completada para {len(cols_to_norm)} variables.')
+            if self.is_fitted:
+                # Se aplican los rangos del entrenamiento
+                scaler = self.artifact.get('scaler', {'columns': [], 'min': [], 'max': []})
+                cols_to_norm = scaler['columns']
             else:
+                scaled = {col for role in SCALED_ROLES for col in NUMERIC_ROLES[role]}
+                declared = scaled.union(NUMERIC_ROLES['binary'])
+                numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns
+                undeclared = [col for col in numeric_cols if col not in declared]
+                binary_like = [col for col in undeclared if df[col].dropna().isin([0, 1]).all()]
+                undeclared = [col for col in undeclared if col not in binary_like]
+                if binary_like:
+                    logger.warning(f'⚠️ Variables numéricas sin rol en NUMERIC_ROLES con valores 0/1, '
+                                   f'se dejan sin escalar como binarias: {binary_like}')
+                if undeclared:
+                    logger.warning(f'⚠️ Variables numéricas sin rol en NUMERIC_ROLES, se escalan como continuas: {undeclared}')
+                cols_to_norm = [col for col in numeric_cols if col in scaled or col in undeclared]
+            if not cols_to_norm:
                 logger.info('ℹ️ No se encontraron variables numéricas para normalizar.')
+                return df
 
+            block = df[cols_to_norm].to_numpy(dtype=np.float32, na_value=np.nan)
+            if self.is_fitted:
+                data_min = np.asarray(scaler['min'], dtype=np.float32)
+                data_max = np.asarray(scaler['max'], dtype=np.float32)
+            else:
+                data_min = np.full(len(cols_to_norm), np.inf, dtype=np.float32)
+                data_max = np.full(len(cols_to_norm), -np.inf, dtype=np.float32)
+                for start in range(0, len(block), NORMALIZE_CHUNK):
+                    chunk = block[start:start + NORMALIZE_CHUNK]
+                    np.fmin(data_min, np.nanmin(chunk, axis=0), out=data_min)
+                    np.fmax(data_max, np.nanmax(chunk, axis=0), out=data_max)
+                self.artifact['scaler'] = {'columns': cols_to_norm,
+                                           'min': data_min.tolist(),
+                                           'max': data_max.tolist()}
+            # Rango 0 se trata como 1 (mismo criterio que MinMaxScaler)
+            data_range = data_max - data_min
+            data_range[data_range == 0] = 1
+            block -= data_min
+            block /= data_range
+            df[cols_to_norm] = block
+            logger.info(f'✅ Normalización completada para {len(cols_to_norm)} variables.')
             return df
         except Exception as e:
             logger.error(f"❌ Error en la normalización de variables: {str(e)}")
             raise
 
+    def assemble_sparse(self, df: pd.DataFrame) -> sp.csr_matrix:
+        """Une las variables numéricas normalizadas con el bloque one-hot disperso.
+
+        Args:
+            df (pd.DataFrame): Variables numéricas ya normalizadas
+
+        Returns:
+            sp.csr_matrix: Matriz float32 con las columnas de `artifact['columns']`
+        """
+        X = sp.hstack([sp.csr_matrix(df.to_numpy(dtype=np.float32)), self.onehot], format='csr', dtype=np.float32)
+        names = list(df.columns) + self.onehot_names
+        if not self.is_fitted:
+            self.artifact['columns'] = names
+            return X
+        # Selección de columnas del entrenamiento; las que no existen quedan en 0
+        target = self.artifact['columns']
+        src = pd.Index(names).get_indexer(target)
+        found = np.flatnonzero(src >= 0)
+        selector = sp.csr_matrix((np.ones(len(found), dtype=np.float32), (src[found], found)),
+                                 shape=(len(names), len(target)))
+        return (X @ selector).tocsr()
+
     def start_data_preparation(self, df: pd.DataFrame) -> pd.DataFrame:
         """Inicia el pipeline de preparación de datos."""
         try:
@@ -182,6 +379,14 @@ class DataPreparationPipeline:
             df = self.imputation_of_missing_values(df)
             df = self.coding_cat_vars(df)
             df = self.normalize_vars(df)
+            if self.sparse:
+                self.X_prepared = self.assemble_sparse(df)
+                return None
+            if self.is_fitted:
+                # Mismas variables y en el mismo orden que en el entrenamiento
+                df = df.reindex(columns=self.artifact['columns'], fill_value=0)
+            else:
+                self.artifact['columns'] = list(df.columns)
             return df
         except Exception as e:
             logger.error(f"❌ Error en el pipeline de preparación de datos: {str(e)}")
@@ -1,8 +1,14 @@
 from altair import DataFormat
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+import warnings
+import numpy as np
 import pandas as pd
 import joblib
+from scipy import sparse
 from src.utils import load_config, config_logging, log_function
 from src.utils.config_utils import PreprocessConfig
+from src.utils.dag_utils import file_digest
 from src.utils.logging_utils import config_logging
 
 # Configuración global del logger
@@ -20,10 +26,30 @@ class Predictionpipeline:
         self.df_prepared = df_prepared
         self.df_predicted = self
         self.config = config
-        
+        self.model = None
+        self._explain_matrix = None
+
+    def load_model(self):
+        """Carga el modelo desde `files['model']` una sola vez por instancia.
+
+        Returns:
+            Modelo de scikit-learn deserializado con joblib.
+        """
+        if self.model is None:
+            self.model = joblib.load(open(self.config.files['model'], 'rb'))
+        return self.model
+
+    def get_model_version(self) -> str:
+        """Identifica el modelo usado por la versión de la app y el hash de su archivo.
+
+        Returns:
+            str: Versión con formato '<version>-<sha256[:12]>'; el hash se calcula una
+                sola vez por huella (tamaño y fecha) del archivo.
+        """
+        return f'{self.config.version}-{file_digest(self.config.files["model"])[:12]}'
 
     def get_predictions(self) -> tuple[pd.DataFrame, pd.DataFrame]:
-        model = joblib.load(open(self.config.files['model'], 'rb'))
+        model = self.load_model()
         df = self.df_prepared #creado solo para omitir el error de abajo  ELIMINAR DESPUES
         y_predicted = model.predict(df)
         y_predicted = pd.DataFrame(y_predicted, columns=['Prediccion'])
@@ -36,5 +62,328 @@ class Predictionpipeline:
         #print(f'Predicted proba: \n {y_predicted_proba}')
         return (y_predicted, y_predicted_proba['Probabilidad'])
 
+    def get_explanations(self, top_n: int = 3, batch_size: int = 50_000,
+                         artifact: Optional[dict] = None) -> pd.DataFrame:
+        """Explica la predicción de cada alumno con sus factores de mayor peso.
+
+        Usa la matriz dispersa de `decision_path` de todo el lote: cada nodo del
+        camino aporta la variación de la probabilidad de abandono respecto a su
+        nodo padre, atribuida a la variable de la división. Un solo producto
+        disperso (camino x nodos) @ (nodos x variables) entrega, para todos los
+        alumnos a la vez, la contribución por variable y los umbrales de las
+        divisiones recorridas.
+
+        Args:
+            top_n (int): Número de factores a reportar por alumno.
+            batch_size (int): Filas procesadas por bloque para acotar la memoria.
+            artifact (Optional[dict]): Artefacto de preparación de la matriz; con él
+                los umbrales se reportan en unidades originales (min + umbral * rango).
+                Sin él quedan en la escala normalizada.
+
+        Returns:
+            pd.DataFrame: Columnas 'Factor 1'..'Factor n' con textos como
+                'Calc_Dif <= 62.50 (+12.3%)', donde el umbral es el promedio de
+                las divisiones sobre esa variable en el camino del alumno y el
+                porcentaje es la contribución a la probabilidad de abandono.
+
+        Raises:
+            TypeError: Si el modelo no está basado en árboles de decisión.
+        """
+        logger.info('🔄 Generando explicaciones por alumno a partir de decision_path')
+        model = self.load_model()
+        df = self.df_prepared
+        n_features = df.shape[1]
+        top_n = max(1, min(top_n, n_features))
+        if self._explain_matrix is None:
+            self._explain_matrix = _build_explain_matrix(model, n_features)
+        node_matrix, n_trees = self._explain_matrix
+
+        feature_names = np.asarray(df.columns, dtype=object)
+        ranges = _scaler_ranges(artifact or {})
+        feat_min = np.array([ranges.get(col, (0.0, 1.0))[0] for col in df.columns], dtype=np.float64)
+        feat_span = np.array([ranges.get(col, (0.0, 1.0))[1] for col in df.columns], dtype=np.float64)
+        columns = [f'Factor {i+1}' for i in range(top_n)]
+        blocks = []
+        for start in range(0, len(df), batch_size):
+            df_batch = df.iloc[start:start + batch_size]
+            paths = model.decision_path(df_batch)
+            if isinstance(paths, tuple):
+                paths = paths[0]
+            # (alumnos x nodos) @ (nodos x 3*variables) -> contribución, suma de umbrales, conteo
+            stats = (paths.astype(np.float32) @ node_matrix).toarray()
+            contrib = stats[:, :n_features] / n_trees
+            thr_sum = stats[:, n_features:2 * n_features]
+            thr_count = stats[:, 2 * n_features:]
+
+            rows = np.arange(len(df_batch))[:, None]
+            top = np.argpartition(-np.abs(contrib), top_n - 1, axis=1)[:, :top_n]
+            order = np.argsort(-np.abs(contrib[rows, top]), axis=1)
+            top = top[rows, order]
+            top_contrib = contrib[rows, top]
+            count = thr_count[rows, top]
+            threshold = np.divide(thr_sum[rows, top], count, out=np.zeros_like(count), where=count > 0)
+            values = df_batch.to_numpy(dtype=np.float32)[rows, top]
+
+            # La comparación se hace en la escala del modelo; el texto, en unidades originales
+            text = _format_factors(feature_names[top], values > threshold,
+                                   feat_min[top] + threshold * feat_span[top], top_contrib)
+            blocks.append(pd.DataFrame(text, columns=columns))
+
+        if not blocks:
+            return pd.DataFrame(columns=columns)
+        df_explained = pd.concat(blocks, ignore_index=True)
+        logger.info(f'✅ Explicaciones generadas para {len(df_explained)} alumnos')
+        return df_explained
+
+
+    def score_scenarios(self, row: pd.Series, scenarios: Dict[str, Dict[str, Any]], artifact: dict) -> pd.DataFrame:
+        """Califica escenarios hipotéticos ("qué pasaría si") de un alumno en un solo lote.
+
+        Cada escenario modifica la fila preparada del alumno directamente en el
+        espacio de variables del modelo: las calificaciones se normalizan con los
+        rangos del artefacto y los cambios de tipo de calificación ('*_calcve')
+        reasignan sus dummies. Todos los escenarios se apilan en una matriz y se
+        califican con una sola llamada a `predict_proba`.
+
+        Args:
+            row (pd.Series): Fila del alumno en la salida de DataPreparationPipeline.
+            scenarios (Dict[str, Dict[str, Any]]): Nombre del escenario -> cambios en
+                unidades originales, p. ej. {'Calc_Dif': 85, 'Calc_Dif_calcve': 'Ord_1ra'}.
+            artifact (dict): Artefacto de preparación con el que se preparó la fila.
+
+        Returns:
+            pd.DataFrame: Una fila por escenario ('Actual' primero) con 'Escenario',
+                'Prediccion', 'Riesgo' (% de abandono) y 'Cambio' (puntos respecto a 'Actual').
+
+        Raises:
+            ValueError: Si un cambio hace referencia a una variable que el modelo no usa.
+        """
+        model = self.load_model()
+        columns = list(row.index)
+        names = ['Actual', *scenarios]
+        X = np.tile(row.to_numpy(dtype=np.float32), (len(names), 1))
+        (clear_rows, clear_cols), (set_rows, set_cols, set_values) = _compile_scenarios(
+            columns, artifact, list(scenarios.values()))
+        # Primero se apagan las dummies de las variables cambiadas y después se asignan los valores
+        X[clear_rows + 1, clear_cols] = 0
+        X[set_rows + 1, set_cols] = set_values
+        classes = list(model.classes_)
+        risk = model.predict_proba(pd.DataFrame(X, columns=columns))[:, classes.index(1) if 1 in classes else -1]
+        df_scenarios = pd.DataFrame({
+            'Escenario': names,
+            'Prediccion': np.where(risk > 0.5, 'Abandono', 'No abandono'),
+            'Riesgo': np.round(risk * 100, 2),
+            'Cambio': np.round((risk - risk[0]) * 100, 2),
+        })
+        logger.info(f'✅ {len(scenarios)} escenarios calificados')
+        return df_scenarios
+
+class MultiModelPipeline:
+    def __init__(self, df_prepared: pd.DataFrame, config: PreprocessConfig,
+                 model_paths: Optional[Dict[str, str]] = None) -> None:
+        """Compara varios modelos sobre una misma matriz de variables preparada.
+
+        Args:
+            df_prepared (pd.DataFrame): Salida de DataPreparationPipeline, preparada una sola vez.
+            config (PreprocessConfig): Configuración; si `model_paths` es None se usa `config.models`
+                y, en su defecto, `files['model']`.
+            model_paths (Optional[Dict[str, str]]): Modelos a comparar (nombre -> ruta).
+        """
+        self.df_prepared = df_prepared
+        self.config = config
+        self.model_paths = model_paths or config.models or {'modelo': config.files['model']}
+
+    def get_comparison(self, max_workers: Optional[int] = None) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """Califica todos los modelos en paralelo y resume su nivel de acuerdo.
+
+        La matriz se convierte una sola vez a float32 contiguo (el formato que usan
+        los árboles de scikit-learn) y se comparte entre hilos; el recorrido de los
+        árboles libera el GIL, por lo que los modelos se evalúan en paralelo.
+
+        Args:
+            max_workers (Optional[int]): Hilos a usar; por defecto uno por modelo.
+
+        Returns:
+            tuple: (df_comparison, df_agreement, df_summary)
+                - df_comparison: por alumno, predicción y riesgo (%) de cada modelo,
+                  fracción de modelos que coinciden con la mayoría y desviación del riesgo
+                - df_agreement: matriz de acuerdo entre pares de modelos (0-1)
+                - df_summary: por modelo, % de abandono, riesgo medio y acuerdo con la mayoría
+        """
+        names = list(self.model_paths)
+        logger.info(f'🔄 Comparando {len(names)} modelos: {names}')
+        columns = list(self.df_prepared.columns)
+        X = np.ascontiguousarray(self.df_prepared.to_numpy(dtype=np.float32))
+
+        def score(name: str) -> np.ndarray:
+            model = joblib.load(open(self.model_paths[name], 'rb'))
+            expected = getattr(model, 'feature_names_in_', None)
+            if expected is not None and list(expected) != columns:
+                raise ValueError(f'El modelo {name} espera otras variables de entrada')
+            proba = model.predict_proba(X)
+            classes = list(model.classes_)
+            return proba[:, classes.index(1) if 1 in classes else -1]
+
+        # Las columnas ya se validaron contra feature_names_in_, se omite el aviso de X sin nombres
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='X does not have valid feature names')
+            with ThreadPoolExecutor(max_workers=max_workers or len(names)) as pool:
+                risks = np.column_stack(list(pool.map(score, names)))
+
+        # Mismo criterio que predict(): clase con mayor probabilidad, empate a 'No abandono'
+        labels = risks > 0.5
+        majority = labels.mean(axis=1) >= 0.5
+        agrees = labels == majority[:, None]
+        df_comparison = pd.DataFrame(index=self.df_prepared.index)
+        for i, name in enumerate(names):
+            df_comparison[f'{name} Prediccion'] = np.where(labels[:, i], 'Abandono', 'No abandono')
+            df_comparison[f'{name} Riesgo'] = np.round(risks[:, i] * 100, 2)
+        df_comparison['Acuerdo'] = agrees.mean(axis=1).round(2)
+        df_comparison['Desv. riesgo'] = np.round(risks.std(axis=1) * 100, 2)
+        df_comparison = df_comparison.reset_index(drop=True)
+
+        agreement = (labels[:, :, None] == labels[:, None, :]).mean(axis=0)
+        df_agreement = pd.DataFrame(agreement.round(4), index=names, columns=names)
+        df_summary = pd.DataFrame({
+            '% Abandono': (labels.mean(axis=0) * 100).round(2),
+            'Riesgo medio': (risks.mean(axis=0) * 100).round(2),
+            'Acuerdo con mayoría': agrees.mean(axis=0).round(4),
+        }, index=pd.Index(names, name='Modelo')).reset_index()
+        logger.info(f'✅ Comparación terminada: {(df_comparison["Acuerdo"] == 1).mean():.1%} de alumnos con acuerdo total')
+        return df_comparison, df_agreement, df_summary
+
+
+def _compile_scenarios(columns: list, artifact: dict, scenarios: list) -> tuple:
+    """Traduce los cambios de cada escenario a posiciones de la matriz preparada.
+
+    Las variables escaladas se llevan a [0, 1] con el mínimo y máximo del
+    artefacto; las demás numéricas se asignan tal cual. En las categóricas se
+    apagan todas sus dummies y se enciende la de la categoría pedida, con el
+    mismo criterio que `collapse_categories`: una categoría no conservada en el
+    entrenamiento cuenta como 'otros', y la categoría base no tiene dummy.
+
+    Returns:
+        tuple: ((filas, columnas) a poner en 0, (filas, columnas, valores) a asignar)
+    """
+    position = {col: i for i, col in enumerate(columns)}
+    dummies: Dict[str, list] = {}
+    for i, col in enumerate(columns):
+        if '>' in col:
+            dummies.setdefault(col.split('>', 1)[0], []).append(i)
+    ranges = _scaler_ranges(artifact)
+    kept = artifact.get('categories', {})
+
+    clear_rows, clear_cols, set_rows, set_cols, set_values = [], [], [], [], []
+    for i, changes in enumerate(scenarios):
+        for col, value in changes.items():
+            if col in dummies:
+                label = value if value in kept.get(col, [value]) else 'otros'
+                clear_rows.extend([i] * len(dummies[col]))
+                clear_cols.extend(dummies[col])
+                target = position.get(f'{col}>{label}')
+                if target is not None:
+                    set_rows.append(i)
+                    set_cols.append(target)
+                    set_values.append(1.0)
+            elif col in position:
+                lo, span = ranges.get(col, (0.0, 1.0))
+                set_rows.append(i)
+                set_cols.append(position[col])
+                set_values.append((float(value) - lo) / span)
+            else:
+                raise ValueError(f'La variable {col} no forma parte de las variables del modelo')
+    return ((np.asarray(clear_rows, dtype=np.intp), np.asarray(clear_cols, dtype=np.intp)),
+            (np.asarray(set_rows, dtype=np.intp), np.asarray(set_cols, dtype=np.intp),
+             np.asarray(set_values, dtype=np.float32)))
+
+def _scaler_ranges(artifact: dict) -> Dict[str, tuple]:
+    """(mínimo, rango) de cada variable normalizada en el artefacto; rango 1 si es constante."""
+    scaler = artifact.get('scaler', {'columns': [], 'min': [], 'max': []})
+    return {col: (lo, (hi - lo) or 1) for col, lo, hi in zip(scaler['columns'], scaler['min'], scaler['max'])}
+
+def _build_explain_matrix(model, n_features: int) -> tuple[sparse.csr_matrix, int]:
+    """Construye la matriz (nodos x 3*variables) usada por `get_explanations`.
+
+    Por cada árbol se apilan tres bloques: la variación de probabilidad de
+    abandono de cada nodo hijo (atribuida a la variable de su padre), el umbral
+    de cada nodo de división y un indicador de división, de modo que el camino
+    de decisión multiplicado por esta matriz da contribuciones, sumas de
+    umbrales y conteos por variable.
+
+    Args:
+        model: Árbol o ensamble de árboles de scikit-learn ya entrenado.
+        n_features (int): Número de variables de entrada del modelo.
+
+    Returns:
+        tuple: (matriz dispersa apilada para todos los árboles, número de árboles)
+
+    Raises:
+        TypeError: Si el modelo no expone árboles de decisión.
+    """
+    if hasattr(model, 'tree_'):
+        estimators = [model]
+    elif hasattr(model, 'estimators_') and all(hasattr(est, 'tree_') for est in model.estimators_):
+        estimators = list(model.estimators_)
+    else:
+        raise TypeError(f'El modelo {type(model).__name__} no está basado en árboles de decisión')
+
+    classes = list(model.classes_)
+    pos_class = classes.index(1) if 1 in classes else len(classes) - 1
+    blocks = []
+    for est in estimators:
+        tree = est.tree_
+        n_nodes = tree.node_count
+        value = tree.value[:, 0, :]
+        prob = value[:, pos_class] / value.sum(axis=1)
+        split = np.flatnonzero(tree.children_left >= 0)
+        split_feat = tree.feature[split]
+        children = np.concatenate([tree.children_left[split], tree.children_right[split]])
+        parents = np.concatenate([split, split])
+        shape = (n_nodes, n_features)
+        delta = sparse.csr_matrix(
+            (prob[children] - prob[parents], (children, tree.feature[parents])), shape=shape)
+        thresholds = sparse.csr_matrix((tree.threshold[split], (split, split_feat)), shape=shape)
+        indicator = sparse.csr_matrix((np.ones(len(split)), (split, split_feat)), shape=shape)
+        blocks.append(sparse.hstack([delta, thresholds, indicator]))
+    node_matrix = sparse.vstack(blocks, format='csr', dtype=np.float32)
+    return node_matrix, len(estimators)
+
+
+def _format_factors(names: np.ndarray, above: np.ndarray, threshold: np.ndarray,
+                    contrib: np.ndarray) -> np.ndarray:
+    """Convierte los factores seleccionados en textos legibles.
+
+    Las variables dummy ('escuela>ESC1') se muestran como igualdad o diferencia
+    con la categoría; las numéricas con su umbral (ya en la escala a reportar).
+    Los textos se arman para todo el bloque con operaciones de cadenas de
+    pandas/NumPy sobre los arreglos aplanados, sin recorrer alumno por alumno.
+
+    Returns:
+        np.ndarray: Textos con la misma forma que `names`; '' si la contribución es 0.
+    """
+    shape = names.shape
+    above = above.ravel()
+    contrib = contrib.ravel()
+    shown = contrib != 0
+    # Las variables distintas son pocas: se separan 'base>categoría' una vez por variable
+    codes, uniques = pd.factorize(names.ravel())
+    parts = pd.Series(uniques, dtype=object).str.split('>', n=1, expand=True).reindex(columns=[0, 1])
+    base = parts[0].to_numpy(dtype=object)[codes]
+    category = parts[1].to_numpy(dtype=object)[codes]
+    is_dummy = pd.notna(category)
+
+    label = np.where(is_dummy, base, names.ravel()).astype(object)
+    relation = np.select([is_dummy & above, is_dummy, above], [' = ', ' != ', ' > '], ' <= ').astype(object)
+    # Solo se formatean los números que aparecen en el texto
+    value = np.where(is_dummy, category, '').astype(object)
+    numeric = shown & ~is_dummy
+    value[numeric] = pd.Series(threshold.ravel()[numeric]).map('{:.2f}'.format).to_numpy(dtype=object)
+    percent = np.full(len(contrib), '', dtype=object)
+    percent[shown] = pd.Series(contrib[shown] * 100).map(' ({:+.1f}%)'.format).to_numpy(dtype=object)
+    text = label + relation + value + percent
+    text[~shown] = ''
+    return text.reshape(shape)
+
+
 def printName():
     print(f'valor del atributo __name__:{__name__}')
@@ -1,15 +1,99 @@
 import pandas as pd
 import numpy as np
 import math
+import hashlib
 import os
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 from src.utils import load_config
 from src.utils.logging_utils import config_logging
 from src.utils.config_utils import PreprocessConfig
+from src.utils.dag_utils import StageGraph, file_digest, file_fingerprint
+from src.utils.metrics_utils import metrics
+from src.utils.key_utils import KeyDictionary
+from src.utils.remap_utils import compile_spec
+from src.utils.schema_utils import (SIS_SCHEMAS, SchemaValidationError, read_header, validate_frame,
+                                    validate_header, validate_table)
+from src.utils.warehouse_utils import SISWarehouse, quote
 import logging
 
 main_path = os.path.dirname(os.path.abspath(__file__))
 logger = config_logging()
 
+# Copy-on-Write: los DataFrames derivados (selecciones, drop, rename, astype, assign...)
+# comparten memoria con su origen y solo se copia una columna cuando alguno la modifica.
+# La opción es global del proceso: se activa al importar este módulo (corridas por línea de
+# comandos y benchmarks) y la app la fija también explícitamente al arrancar
+pd.set_option('mode.copy_on_write', True)
+
+# Contrato de las etapas de transformación (filter_order_data ... objToCat):
+# - reciben un DataFrame y devuelven uno nuevo; nunca modifican el que reciben,
+#   así que sus entradas pueden compartirse (p. ej. las memorizadas por `preprocess_graph`)
+# - no hacen copias defensivas: con Copy-on-Write el resultado solo ocupa memoria
+#   nueva en las columnas que la etapa cambia
+# - los cambios de columnas se agrupan en una sola operación por etapa
+#   (un `drop`, `rename`, `astype` o `assign` con todas las columnas)
+
+# Materias de tronco común necesarias para el modelo y su agrupación
+MATERIA_MAPPING = {
+    'AEC-1053': 'Estad', 'AEC-1081': 'Estad', 'AEF-1052': 'Estad', 'ASF-1010': 'Estad', 'GED-0921': 'Estad', 'GEF-0929': 'Estad', 
+    'ALC-1020': 'Estad', 'INC-1025': 'Quim', 'GEF-0910': 'Quim', 'AEF-1056': 'Quim', 'AEC-1058': 'Quim', 'ALF-1021': 'Quim', 
+    'GEF-0914': 'Quim', 'ALF-1022': 'Quim', 'ACF-0903': 'Algb_Lin', 'ACF-0902': 'Calc_Int', 'ACF-0901': 'Calc_Dif',
+    'ACA-0907': 'Etica', 'ACC-0906': 'Fund_Inv'
+}
+# Columnas de dkarde que usa el modelo
+GRADE_COLS = ['aluctr', 'matcve', 'karcal', 'tcacve']
+# Tablas del SIS que se guardan en el almacén y catálogos que se leen de archivo
+SIS_TABLES = ['dalumn', 'dcalum', 'dkarde']
+CODE_TABLES = ['ubicaciones', 'escuelas', 'plan_estudio', 'especialidad']
+# Columnas de dalumn que no se usan
+ALUMN_DROP_COLS = ['alurfc', 'alucur', 'aluseg']
+MATERIAS = ['Algb_Lin', 'Calc_Dif', 'Calc_Int', 'Estad', 'Fund_Inv', 'Quim', 'Etica']
+
+# Remapeo de códigos: columna -> (mapa de códigos, tipo de salida; None = categórica)
+CALCVE_MAP = {-2:'S/Cursar', -1:'Desrt',0:'S/Cal', 1:'Ord_1ra', 2:'Ord_2da', 3:'Global',
+              4:'RC_1ra', 5:'RC_2da', 6:'Esp_1ra', 7:'Esp_2da', 91:'Conval', 92:'Reval', 93:'Equiv'}
+REMAP_SPEC = {
+    'carcve': ({1:'ISIC', 2:'IIAL', 3:'IIND', 4:'IGEM', 6:'IIAS'}, None),
+    'calpri': ({'*':1, ' ':0}, 'int64'),
+    'alusex': ({1:1, 2:0}, 'int64'),
+    'alusme': ({1:"IMSS", 2:'PEMEX', 3:'ISSTE', 4:'ESTA', 5:'PART', 6:'SEG_POP'}, None),
+    'alueci': ({1:'Solt', 2:'Cas', 3:'Viu', 4:'Div', 5:'UnLib'}, None),
+    'aluare': ({1:'FisMat', 2:'QuimBio', 3:'EconAdmin', 4:'SocHum', 5:'Gral', 6:'Otro'}, None),
+    'alupadv': ({'S':1, 'N':0, ' ':np.nan}, 'Int64'),
+    'alumadv': ({'S':1, 'N':0, ' ':np.nan}, 'Int64'),
+    'alulexp': ({'S':1, 'N':0, ' ':np.nan}, 'Int64'),
+    'calingi': ({0:'None', 1:'Akate', 2:'Amuzgo', 52:'Tarau', 60:'Toton'}, None),
+    **{f'{mat}_calcve': (CALCVE_MAP, None) for mat in MATERIAS},
+}
+REMAP_RULES = compile_spec(REMAP_SPEC)
+# Situación del alumno (calsit) -> abandono
+DEP_VAR_MAP = {1:0, 2:1, 4:1, 5:0}
+
+# Orden final de las variables del modelo y su nombre descriptivo
+SORTED_COLS = ['carcve', 'placve', 'espcve', 'caling', 'calnpe', 'calcac', 'calnpec',
+   'caltcala', 'caltcalr', 'calmata', 'calmat', 'calmatac', 'calpri',
+   'calnpep', 'calingt', 'calingi', 'alusex', 'edad', 'alu_nac_est',
+   'alu_nac_mun', 'aluesc', 'aluegr', 'aluare', 'alu_dir_est', 'alu_dir_mun', 'aluescp',
+   'alucpo', 'alusme', 'alueci', 'alupadv', 'alumadv', 'alutcp', 'alutra',
+   'alulexp', 'alutecpo', 'alupexani', 'discve',
+   'alucen', 'Algb_Lin', 'Algb_Lin_calcve', 'Calc_Dif', 'Calc_Dif_calcve',
+   'Calc_Int', 'Calc_Int_calcve', 'Estad', 'Estad_calcve', 'Fund_Inv',
+   'Fund_Inv_calcve', 'Quim', 'Quim_calcve', 'Etica', 'Etica_calcve']
+RENAME_VARS = {
+'carcve':'cve_carrera', 'placve':'cve_plan_estud', 'espcve':'cve_esp', 'caling':'period_ingreso', 'calnpe':'period_ultimo',
+'calcac':'cred_acum', 'calnpec':'period_conval', 'caltcala':'calif_aprob', 'caltcalr':'calif_reprob', 'calmata':'mat_aprob',
+'calmat':'mat_cursadas', 'calmatac':'mat_con_ac', 'calpri':'opcn_estudios', 'calnpep':'period_aut_comite',
+'calingt':'tipo_ingreso', 'calingi':'leng_indig', 'alusex':'genero', 'alu_nac_est':'estado_nac', 'alu_nac_mun':'munic_nac',
+'aluesc':'escuela', 'aluegr':'año_egreso', 'aluare':'area_egreso', 'alu_dir_est':'estado_dir', 'alu_dir_mun':'munic_dir',
+'aluescp':'prom_ingreso', 'alucpo':'cod_postal', 'alusme':'serv_medico', 'alueci':'edo_civil', 'alupadv':'papa_vive',
+'alumadv':'mama_vive', 'alutcp':'cod_post_tutor', 'alutra':'empresa', 'alulexp':'exp_trabj', 'alutecpo':'cod_post_trabj',
+'alupexani':'score_exani', 'discve':'discapacidad', 'alucen':'cntro_trab'
+}
+# Datos de identificación del alumno que acompañan a los resultados
+NAME_COLS = {'aluctr':'# Control', 'aluapp':'Apellido Pat', 'aluapm':'Apellido Mat', 'alunom':'Nombre'}
+
 def load_data(path_dalumn, path_dcalum, path_dkarde):
     """Carga los archivos de datos iniciales y valida que contengan las columnas necesarias.
     
@@ -19,77 +103,82 @@ def load_data(path_dalumn, path_dcalum, path_dkarde):
         path_dkarde: Ruta al archivo CSV con datos de calificaciones
         
     Returns:
-        tuple: (df_cal, df_alumn, df_dcalumn) DataFrames con los datos cargados y validados
+        tuple: (df_cal, df_alumn, df_dcalumn) DataFrames con los datos cargados y validados;
+            df_cal ya viene procesado por `read_grades`
         
     Raises:
-        ValueError: Si algún archivo no contiene las columnas requeridas
+        SchemaValidationError: Si algún archivo no contiene las columnas requeridas
+            o tiene valores que no cumplen su esquema (ver `SIS_SCHEMAS`)
     """
     logger.info("🔄 Iniciando carga de archivos de datos")
-    # Definir columnas requeridas para cada DataFrame
-    cols_dkarde = ['aluctr', 'matcve', 'karcal', 'tcacve']
-    cols_dalumn = ['aluctr', 'aluapp', 'aluapm', 'alunom', 'alurfc', 'alucur', 'aluseg',
-                   'alunac', 'alusex', 'alulna', 'alumun', 'aluesc', 'aluegr', 'aluescp',
-                   'alucpo', 'alusme', 'alueci', 'aluare', 'alupadv', 'alumadv', 'alutcp',
-                   'alutra', 'alulexp', 'alutecpo', 'alupexani', 'discve', 'alucen']
-    cols_dcalum = ['aluctr', 'carcve', 'placve', 'espcve', 'caling', 'calter', 'calsit',
-                   'calnpe', 'calgpo', 'calcac', 'calnpec', 'calobs', 'caltcala', 'caltcalr',
-                   'calmata', 'calmat', 'calmatac', 'calpri', 'calnpep', 'calingt', 'calingi']
-    # Definir tipos de datos para dkarde que pandas podría mal interpretar
-    dtypes_dict = {
-        'aluctr': 'object', 
-        'mat_cve': object,
-        'karcal': 'Int64',
-        'tcacve': 'Int64',
-        'pdocve1': 'Int64',
-        'karnpe1': object
-    }
+    # Validación de encabezados antes de leer los archivos completos
+    logger.info("🔍 Validando encabezados de los archivos...")
+    validate_header(read_header(path_dkarde, encoding='utf-8'), SIS_SCHEMAS['dkarde'])
+    validate_header(read_header(path_dalumn), SIS_SCHEMAS['dalumn'])
+    validate_header(read_header(path_dcalum), SIS_SCHEMAS['dcalum'])
+    logger.info("✅ Encabezados completos en los tres archivos")
     logger.info("📂 Cargando archivo de calificaciones...")
     try:
-        df_cal = pd.read_csv(path_dkarde, dtype=dtypes_dict)
+        df_cal = read_grades(path_dkarde)
         logger.info(f"✅ Archivo de calificaciones cargado exitosamente - {len(df_cal)} registros")
+    except SchemaValidationError:
+        raise
     except Exception as e:
         logger.error(f"❌ Error al cargar archivo de calificaciones: {str(e)}")
         raise
-    logger.info("📂 Cargando archivo de datos personales...")
+    df_alumn = read_sis_table(path_dalumn, 'dalumn', validate=False)
+    df_dcalumn = read_sis_table(path_dcalum, 'dcalum', validate=False)
+    # Validación vectorizada de valores contra el esquema de cada tabla
+    # (las calificaciones se validan por lote durante la lectura)
+    validate_table(df_alumn, 'dalumn')
+    validate_table(df_dcalumn, 'dcalum')
+    logger.info("✨ Carga y validación de archivos completada exitosamente")
+    return df_cal, df_alumn, df_dcalumn
+
+# Descripción de cada tabla del SIS en los mensajes de carga
+TABLE_LABELS = {'dalumn': 'datos personales', 'dcalum': 'datos académicos', 'dkarde': 'calificaciones'}
+
+def read_sis_table(path, table, validate=True):
+    """Lee dalumn o dcalum y los valida contra su esquema.
+
+    Args:
+        path: Ruta al archivo CSV
+        table (str): 'dalumn' o 'dcalum'
+        validate (bool): Si es False solo se lee (`load_data` valida encabezados
+            y valores de las tres tablas por separado)
+
+    Returns:
+        pd.DataFrame: Tabla leída
+
+    Raises:
+        SchemaValidationError: Si el encabezado o algún valor no cumple el esquema
+    """
+    if validate:
+        validate_header(read_header(path), SIS_SCHEMAS[table])
+    logger.info(f"📂 Cargando archivo de {TABLE_LABELS[table]}...")
     try:
-        df_alumn = pd.read_csv(path_dalumn, encoding='latin1')
-        logger.info(f"✅ Archivo de datos personales cargado exitosamente - {len(df_alumn)} registros")
+        df = pd.read_csv(path, encoding='latin1')
+        logger.info(f"✅ Archivo de {TABLE_LABELS[table]} cargado exitosamente - {len(df)} registros")
     except Exception as e:
-        logger.error(f"❌ Error al cargar archivo de datos personales: {str(e)}")
+        logger.error(f"❌ Error al cargar archivo de {TABLE_LABELS[table]}: {str(e)}")
         raise
-    logger.info("📂 Cargando archivo de datos académicos...")
+    if validate:
+        validate_table(df, table)
+    return df
+
+def read_grades_validated(path_dkarde):
+    """Valida el encabezado de dkarde y lo lee con `read_grades`."""
+    validate_header(read_header(path_dkarde, encoding='utf-8'), SIS_SCHEMAS['dkarde'])
+    logger.info("📂 Cargando archivo de calificaciones...")
     try:
-        df_dcalumn = pd.read_csv(path_dcalum, encoding='latin1')
-        logger.info(f"✅ Archivo de datos académicos cargado exitosamente - {len(df_dcalumn)} registros")
+        df_cal = read_grades(path_dkarde)
+        logger.info(f"✅ Archivo de calificaciones cargado exitosamente - {len(df_cal)} registros")
+    except SchemaValidationError:
+        raise
     except Exception as e:
-        logger.error(f"❌ Error al cargar archivo de datos académicos: {str(e)}")
+        logger.error(f"❌ Error al cargar archivo de calificaciones: {str(e)}")
         raise
-    # Validar columnas en df_cal
-    logger.info("🔍 Validando columnas requeridas en archivo de calificaciones...")
-    missing_cols_cal = set(cols_dkarde) - set(df_cal.columns)
-    if missing_cols_cal:
-        error_msg = f"Faltan las siguientes columnas en el archivo de calificaciones: {missing_cols_cal}"
-        logger.error(f"❌ {error_msg}")
-        raise ValueError(error_msg)
-    logger.info("✅ Todas las columnas requeridas presentes en archivo de calificaciones")
-    # Validar columnas en df_alumn
-    logger.info("🔍 Validando columnas requeridas en archivo de datos personales...")
-    missing_cols_alumn = set(cols_dalumn) - set(df_alumn.columns)
-    if missing_cols_alumn:
-        error_msg = f"Faltan las siguientes columnas en el archivo de datos personales: {missing_cols_alumn}"
-        logger.error(f"❌ {error_msg}")
-        raise ValueError(error_msg)
-    logger.info("✅ Todas las columnas requeridas presentes en archivo de datos personales")
-    # Validar columnas en df_dcalumn
-    logger.info("🔍 Validando columnas requeridas en archivo de datos académicos...")
-    missing_cols_dcalumn = set(cols_dcalum) - set(df_dcalumn.columns)
-    if missing_cols_dcalumn:
-        error_msg = f"Faltan las siguientes columnas en el archivo de datos académicos: {missing_cols_dcalumn}"
-        logger.error(f"❌ {error_msg}")
-        raise ValueError(error_msg)
-    logger.info("✅ Todas las columnas requeridas presentes en archivo de datos académicos")
-    logger.info("✨ Carga y validación de archivos completada exitosamente")
-    return df_cal, df_alumn, df_dcalumn
+    return df_cal
 
 def process_grades(df_cal):
     """Procesa las calificaciones y materias del dataframe.
@@ -108,25 +197,116 @@ def process_grades(df_cal):
     """
     logger.info("🔄 Iniciando procesado de calificaciones")
     # estandarización de las claves de las materias
-    df_cal['matcve'] = df_cal['matcve'].str.replace(" ", "")
-    materias_tronco_comun = ['ACC-0906', 'ACA-0907', 'ACF-0901', 'ACF-0902', 'ACF-0903', 'AEC-1053',
-                         'AEC-1081', 'AEF-1052', 'ASF-1010', 'GED-0921', 'INC-1025', 'GEF-0910',
-                         'AEF-1056', 'AEC-1058', 'ALF-1021', 'GEF-0929', 'GEF-0914', 'ALF-1022', 'ALC-1020']
+    matcve = df_cal['matcve'].str.replace(" ", "")
     # filtrado de materias de tronco común necesarias para el modelo
-    df_cal = df_cal[df_cal['matcve'].isin(materias_tronco_comun)] 
+    keep = matcve.isin(MATERIA_MAPPING.keys())
     # Mapeo directo de materias (más eficiente)
-    materia_mapping = {
-        'AEC-1053': 'Estad', 'AEC-1081': 'Estad', 'AEF-1052': 'Estad', 'ASF-1010': 'Estad', 'GED-0921': 'Estad', 'GEF-0929': 'Estad', 
-        'ALC-1020': 'Estad', 'INC-1025': 'Quim', 'GEF-0910': 'Quim', 'AEF-1056': 'Quim', 'AEC-1058': 'Quim', 'ALF-1021': 'Quim', 
-        'GEF-0914': 'Quim', 'ALF-1022': 'Quim', 'ACF-0903': 'Algb_Lin', 'ACF-0902': 'Calc_Int', 'ACF-0901': 'Calc_Dif',
-        'ACA-0907': 'Etica', 'ACC-0906': 'Fund_Inv'
-    }
-    df_cal['matcve'] = df_cal['matcve'].map(materia_mapping)
+    df_cal = df_cal[keep].assign(matcve=matcve[keep].map(MATERIA_MAPPING))
     # Eliminar duplicados manteniendo el último registro
     df_cal = df_cal.drop_duplicates(subset=['aluctr', 'matcve'], keep='last')
     logger.info("✅  Procesado de calificaciones completado!")
     return df_cal
 
+def read_grades(path_dkarde, block_size=16 << 20):
+    """Lee el archivo de calificaciones por lotes y lo procesa durante la lectura.
+
+    Equivale a `pd.read_csv` seguido de `process_grades`, pero cada lote de pyarrow
+    se valida contra el esquema, se normaliza y filtra a las materias de tronco
+    común y se reduce al último registro por (aluctr, materia) antes de leer el
+    siguiente. La memoria depende del número de alumnos y no del historial.
+
+    Args:
+        path_dkarde: Ruta o archivo CSV con datos de calificaciones
+        block_size (int): Bytes del CSV por lote
+
+    Returns:
+        pd.DataFrame: Calificaciones procesadas (una fila por alumno y materia)
+
+    Raises:
+        SchemaValidationError: Si algún valor no cumple el esquema (se reportan los
+            errores de todos los lotes)
+    """
+    schema = SIS_SCHEMAS['dkarde']
+    reader = pa_csv.open_csv(
+        path_dkarde,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=GRADE_COLS,
+            column_types={'aluctr': pa.string(), 'matcve': pa.string(), 'karcal': pa.int64(), 'tcacve': pa.int64()},
+            strings_can_be_null=True,
+        ),
+    )
+    codes = pa.array(list(MATERIA_MAPPING.keys()))
+    to_pandas = {pa.int64(): pd.Int64Dtype()}.get
+    df_cal = pd.DataFrame(columns=GRADE_COLS)
+    n_rows = 0
+    problems = []
+    for batch in reader:
+        n_rows += batch.num_rows
+        summary = validate_frame(batch.to_pandas(types_mapper=to_pandas), schema)
+        if not summary.empty or problems:
+            # con errores ya no se reduce: solo se sigue validando para reportar todo el archivo
+            problems.append(summary)
+            continue
+        # estandarización de las claves y filtrado a tronco común antes de pasar a pandas
+        matcve = pc.replace_substring(batch.column('matcve'), ' ', '')
+        keep = pc.fill_null(pc.is_in(matcve, value_set=codes), False)
+        batch = batch.set_column(batch.schema.get_field_index('matcve'), 'matcve', matcve).filter(keep)
+        df_batch = batch.to_pandas(types_mapper=to_pandas)
+        df_batch = df_batch.assign(matcve=df_batch['matcve'].map(MATERIA_MAPPING))
+        # Reducción incremental: el registro más reciente por alumno y materia
+        df_cal = pd.concat([df_cal, df_batch], ignore_index=True) if len(df_cal) else df_batch
+        df_cal = df_cal.drop_duplicates(subset=['aluctr', 'matcve'], keep='last')
+    if problems:
+        raise_schema_problems(problems, schema)
+    logger.info(f'✅ Esquema válido en el archivo de {schema.name} ({n_rows} registros leídos)')
+    return df_cal.reset_index(drop=True)
+
+def raise_schema_problems(problems, schema):
+    """Une los resúmenes de validación de varios lotes y lanza `SchemaValidationError`."""
+    summary = (pd.concat(problems, ignore_index=True)
+               .groupby(['columna', 'regla'], sort=False, as_index=False)
+               .agg(errores=('errores', 'sum'), ejemplos=('ejemplos', lambda ex: sum(ex, [])[:5])))
+    logger.error(f'❌ Errores de esquema en el archivo de {schema.name}:\n{summary.to_string(index=False)}')
+    raise SchemaValidationError(schema.name, summary)
+
+def read_validated(path, table, chunksize=200_000):
+    """Lee un CSV del SIS validado contra su esquema, para cargarlo al almacén.
+
+    dalumn y dcalum se leen completos (una fila por alumno, con la misma inferencia
+    de tipos que `load_data`); dkarde se lee por lotes. Si algún lote no cumple el
+    esquema se sigue validando el resto y al final se lanza el error, de modo que
+    `SISWarehouse.upsert` descarta la carga completa.
+
+    Args:
+        path: Ruta o archivo CSV
+        table (str): 'dalumn', 'dcalum' o 'dkarde'
+        chunksize (int): Filas por lote de dkarde
+
+    Yields:
+        pd.DataFrame: Lotes válidos
+
+    Raises:
+        SchemaValidationError: Si algún valor no cumple el esquema
+    """
+    schema = SIS_SCHEMAS[table]
+    encoding = 'utf-8' if table == 'dkarde' else 'latin1'
+    validate_header(read_header(path, encoding=encoding), schema)
+    if table == 'dkarde':
+        chunks = pd.read_csv(path, encoding=encoding, chunksize=chunksize,
+                             dtype={'aluctr': str, 'matcve': str, 'karcal': 'Int64', 'tcacve': 'Int64'})
+    else:
+        chunks = [pd.read_csv(path, encoding=encoding)]
+    problems = []
+    for chunk in chunks:
+        summary = validate_frame(chunk, schema)
+        if not summary.empty or problems:
+            problems.append(summary)
+            continue
+        yield chunk
+    if problems:
+        raise_schema_problems(problems, schema)
+
 def merge_dataframes(df_cal, df_alumn, df_dcalumn):
     """Combina los dataframes de calificaciones y datos de alumnos.
     
@@ -136,41 +316,248 @@ def merge_dataframes(df_cal, df_alumn, df_dcalumn):
         df_dcalumn (pd.DataFrame): DataFrame con datos académicos
         
     Returns:
-        pd.DataFrame: DataFrame combinado con todos los datos fusionados
+        pd.DataFrame: DataFrame combinado con todos los datos fusionados; 'aluctr'
+            queda como categórica (identificador int32 + diccionario de llaves)
         
     Note:
         - Elimina columnas no necesarias
-        - Pivotea las calificaciones por materia
-        - Pivotea los tipos de calificación por materia
-        - Fusiona los dataframes usando el ID del alumno
+        - Codifica aluctr una sola vez en identificadores int32 compartidos (`KeyDictionary`)
+        - Pivotea las calificaciones y sus tipos por materia en arreglos indexados por identificador
+        - Fusiona los dataframes por indexación directa (sin cruces sobre texto)
+        - Cada paso es una etapa independiente del grafo de `preprocess_graph`
+    """
+    keys = KeyDictionary(df_dcalumn['aluctr'])
+    return assemble_merged(df_dcalumn, keys, pivot_grades(df_cal, keys), student_rows(df_alumn, keys))
+
+def pivot_grades(df_cal, keys):
+    """Pivotea calificaciones y tipos de calificación en matrices (alumno x materia).
+
+    Args:
+        df_cal (pd.DataFrame): Calificaciones procesadas por `read_grades`
+        keys (KeyDictionary): Diccionario de llaves de df_dcalumn
+
+    Returns:
+        tuple: ({'' / '_calcve': (valores int64, máscara de nulos)}, alumnos con calificaciones)
+    """
+    logger.info("🔄 Pivoteando calificaciones por materia")
+    codes_cal = keys.encode(df_cal['aluctr'])
+    subject = pd.Categorical(df_cal['matcve'], categories=MATERIAS).codes
+    valid = (codes_cal >= 0) & (subject >= 0)
+    cell = codes_cal[valid].astype(np.int64) * len(MATERIAS) + subject[valid]
+    last = ~pd.Series(cell).duplicated(keep='last').to_numpy()
+    rows, cols = codes_cal[valid][last], subject[valid][last]
+    pivots = {}
+    for name, suffix in [('karcal', ''), ('tcacve', '_calcve')]:
+        values = pd.array(df_cal[name].to_numpy()[valid][last], dtype='Int64')
+        data = np.zeros((len(keys), len(MATERIAS)), dtype=np.int64)
+        mask = np.ones((len(keys), len(MATERIAS)), dtype=bool)
+        data[rows, cols] = values.to_numpy(dtype=np.int64, na_value=0)
+        mask[rows, cols] = values.isna()
+        pivots[suffix] = (data, mask)
+    has_grades = np.zeros(len(keys), dtype=bool)
+    has_grades[rows] = True
+    return pivots, has_grades
+
+def student_rows(df_alumn, keys):
+    """Ubica el último registro de datos personales de cada alumno.
+
+    Args:
+        df_alumn (pd.DataFrame): Datos personales de alumnos
+        keys (KeyDictionary): Diccionario de llaves de df_dcalumn
+
+    Returns:
+        tuple: (df_alumn sin `ALUMN_DROP_COLS`, fila de cada identificador; -1 si no tiene datos personales)
     """
-    logger.info("🔄 Iniciando fusión de dataframes")
     # Eliminar columnas no necesarias de df_alumn
     #df_alumn = df_alumn.drop(columns=['aluapp', 'aluapm', 'alunom', 'alurfc','alucur', 'aluseg'])
-    df_alumn = df_alumn.drop(columns=['alurfc','alucur', 'aluseg'])
-    # Pivotear calificaciones
-    df_cal_pivot = df_cal.pivot(index='aluctr', columns=['matcve'], values='karcal')
-    df_cal_pivot = df_cal_pivot.reset_index()
-    # Pivoteo de tipos de calificación por materia
-    df_calcve_pivot = df_cal.pivot(index='aluctr', columns='matcve', values='tcacve')
-    df_calcve_pivot.columns = [f"{col}_calcve" for col in df_calcve_pivot.columns]
-    df_calcve_pivot = df_calcve_pivot.reset_index()
-    # Fusion de dataframes pivoteados y reordenamiento de columnas
-    df_pivots_temp = pd.merge(df_cal_pivot, df_calcve_pivot, on='aluctr', how='inner')
-    df_pivots_temp = df_pivots_temp.reindex(['aluctr','Algb_Lin', 'Algb_Lin_calcve','Calc_Dif', 'Calc_Dif_calcve','Calc_Int', 'Calc_Int_calcve',
-                        'Estad', 'Estad_calcve', 'Fund_Inv', 'Fund_Inv_calcve', 'Quim', 'Quim_calcve',
-                        'Etica', 'Etica_calcve'], axis=1)
-    # Eliminacion de duplicados de df_dcalumn
-    df_dcalumn = df_dcalumn.drop_duplicates(subset=['aluctr'], keep='last')
-    # Fusion de dataframes de datos de alumnos
-    df_main = pd.merge(df_dcalumn, df_alumn, on='aluctr', how='left')
-    # Se eliminan duplicados de df_main
-    df_main = df_main.drop_duplicates(subset=['aluctr'], keep='last')
-    # Fusion de dataframes de datos de alumnos y calificaciones
-    df_main = df_main.merge(df_pivots_temp, on='aluctr', how='inner')
+    df_alumn = df_alumn.drop(columns=ALUMN_DROP_COLS)
+    codes_alumn = keys.encode(df_alumn['aluctr'])
+    alumn_last = np.flatnonzero((codes_alumn >= 0) & ~pd.Series(codes_alumn).duplicated(keep='last').to_numpy())
+    alumn_row = np.full(len(keys), -1, dtype=np.int64)
+    alumn_row[codes_alumn[alumn_last]] = alumn_last
+    return df_alumn, alumn_row
+
+def assemble_merged(df_dcalumn, keys, grades, students):
+    """Ensambla el DataFrame combinado a partir del pivoteo y de las filas de alumnos.
+
+    Args:
+        df_dcalumn (pd.DataFrame): Datos académicos
+        keys (KeyDictionary): Diccionario de llaves de df_dcalumn
+        grades (tuple): Resultado de `pivot_grades`
+        students (tuple): Resultado de `student_rows`
+
+    Returns:
+        pd.DataFrame: Último registro de df_dcalumn de cada alumno con calificaciones,
+            con sus datos personales y sus calificaciones por materia
+    """
+    logger.info("🔄 Iniciando fusión de dataframes")
+    pivots, has_grades = grades
+    df_alumn, alumn_row = students
+    # Último registro por alumno en df_dcalumn, solo alumnos con calificaciones
+    codes_main = keys.encode(df_dcalumn['aluctr'])
+    keep = ~pd.Series(codes_main).duplicated(keep='last').to_numpy() & has_grades[codes_main]
+    positions = np.flatnonzero(keep)
+    codes = codes_main[positions]
+    alumn_take = alumn_row[codes]
+
+    # Ensamble por columnas (mismos nombres y sufijos que pd.merge)
+    alumn_cols = [col for col in df_alumn.columns if col != 'aluctr']
+    columns = {}
+    for col in df_dcalumn.columns:
+        name = f'{col}_x' if col in alumn_cols else col
+        columns[name] = keys.categorical(codes) if col == 'aluctr' else df_dcalumn[col].array.take(positions)
+    for col in alumn_cols:
+        name = f'{col}_y' if col in df_dcalumn.columns else col
+        values = df_alumn[col]
+        values = values.array if isinstance(values.dtype, pd.api.extensions.ExtensionDtype) else values.to_numpy()
+        columns[name] = pd.api.extensions.take(values, alumn_take, allow_fill=True)
+    for mat_idx, mat in enumerate(MATERIAS):
+        for suffix, (data, mask) in pivots.items():
+            columns[f'{mat}{suffix}'] = pd.arrays.IntegerArray(data[codes, mat_idx], mask[codes, mat_idx])
+    # Las columnas ya son arreglos nuevos: sin copia ni consolidación en bloques
+    df_main = pd.DataFrame(columns, copy=False)
     logger.info("✅ Fusión de dataframes completada!")
     return df_main
 
+def open_warehouse(config):
+    """Abre el almacén de tablas del SIS (`files['warehouse']`).
+
+    Las tablas se llenan desde los CSV de `files` la primera vez, así que el
+    almacén parte de los mismos datos que el modo 'csv'. Si después cambia un
+    CSV (su `file_fingerprint`), la tabla se reemplaza completa con él: un
+    extracto completo nuevo también quita a los alumnos que ya no vienen. Las
+    cargas desde la app (upsert por llave) no cambian el CSV y se conservan.
+
+    Args:
+        config (PreprocessConfig): Configuración del proyecto
+
+    Returns:
+        SISWarehouse: Almacén listo para consultar
+    """
+    warehouse = SISWarehouse(config.files['warehouse'])
+    for table in SIS_TABLES:
+        path = config.files.get(table)
+        if not (path and os.path.exists(path)):
+            continue
+        fingerprint = file_fingerprint(path)
+        if warehouse.origin(table) == fingerprint:
+            continue
+        if warehouse.revision(table) is None:
+            logger.info(f"📂 Cargando {table} al almacén desde {path}")
+        else:
+            logger.warning(f"⚠️ {path} cambió desde su última carga: {table} se reemplaza completa con el archivo")
+        warehouse.upsert(table, read_validated(path, table), replace=True, origin=fingerprint)
+    return warehouse
+
+def merge_dataframes_sql(warehouse, subset=None):
+    """Equivalente de `merge_dataframes` resuelto como una consulta indexada en el almacén.
+
+    El pivoteo de calificaciones (último registro por alumno y materia), la
+    unión con datos personales y el filtro de alumnos con calificaciones se
+    ejecutan dentro de SQLite; solo se leen las filas del subconjunto pedido.
+
+    Args:
+        warehouse (SISWarehouse): Almacén con dalumn, dcalum y dkarde
+        subset (dict): Columna -> valores permitidos ('aluctr', 'carcve' o 'caling'),
+            p. ej. {'carcve': [1]}; None para todos los alumnos
+
+    Returns:
+        pd.DataFrame: DataFrame combinado, con las mismas columnas que `merge_dataframes`
+    """
+    logger.info("🔄 Iniciando fusión de tablas en el almacén")
+    condition, params = SISWarehouse.subset_clause('c', subset)
+    calum_cols = warehouse.columns('dcalum')
+    alumn_cols = [col for col in warehouse.columns('dalumn') if col != 'aluctr' and col not in ALUMN_DROP_COLS]
+    # mismas reglas de nombres que pd.merge para columnas repetidas
+    select = [f'c.{quote(col)} AS {quote(col + "_x" if col in alumn_cols else col)}' for col in calum_cols]
+    select += [f'a.{quote(col)} AS {quote(col + "_y" if col in calum_cols else col)}' for col in alumn_cols]
+    pivot_cols = [col for mat in MATERIAS for col in (mat, f'{mat}_calcve')]
+    select += [f'p.{quote(col)}' for col in pivot_cols]
+    pivot = ', '.join(f"MAX(CASE WHEN materia = '{mat}' THEN karcal END) AS {quote(mat)}, "
+                      f"MAX(CASE WHEN materia = '{mat}' THEN tcacve END) AS {quote(mat + '_calcve')}"
+                      for mat in MATERIAS)
+    materias = ', '.join('(?, ?)' for _ in MATERIA_MAPPING)
+    sql = f"""
+        WITH materias(matcve, materia) AS (VALUES {materias}),
+        alumnos AS (SELECT c.aluctr FROM dcalum c WHERE {condition}),
+        ultimas AS (
+            SELECT k.aluctr, m.materia, k.karcal, k.tcacve,
+                   ROW_NUMBER() OVER (PARTITION BY k.aluctr, m.materia ORDER BY k.rowid DESC) AS n
+            FROM dkarde k JOIN materias m ON m.matcve = k.matcve
+            WHERE k.aluctr IN (SELECT aluctr FROM alumnos)
+        ),
+        pivote AS (SELECT aluctr, {pivot} FROM ultimas WHERE n = 1 GROUP BY aluctr)
+        SELECT {', '.join(select)}
+        FROM dcalum c
+        LEFT JOIN dalumn a ON a.aluctr = c.aluctr
+        JOIN pivote p ON p.aluctr = c.aluctr
+        WHERE {condition}
+        ORDER BY c.rowid
+    """
+    df_main = warehouse.query(sql, [v for item in MATERIA_MAPPING.items() for v in item] + params + params)
+    # las calificaciones conservan el tipo entero con nulos de `read_grades`
+    df_main = df_main.astype(dict.fromkeys(pivot_cols, 'Int64'))
+    logger.info(f"✅ Fusión en el almacén completada - {len(df_main)} alumnos")
+    return df_main
+
+def subset_rows(df_dcalumn, subset=None):
+    """Filtra dcalum al subconjunto pedido (modo 'csv'; en el almacén lo hace la consulta)."""
+    if not subset:
+        return df_dcalumn
+    mask = pd.Series(True, index=df_dcalumn.index)
+    for col, values in subset.items():
+        column = df_dcalumn[col].astype(str) if col == 'aluctr' else df_dcalumn[col]
+        mask &= column.isin([str(v) for v in values] if col == 'aluctr' else values)
+    return df_dcalumn[mask]
+
+def input_version(config):
+    """Huella del contenido de las tablas de entrada (para llaves de caché).
+
+    Con `source == 'warehouse'` las tablas del SIS aportan su revisión en el
+    almacén; los catálogos (y las tablas del SIS en modo 'csv') el hash de su
+    contenido, que se calcula una sola vez por huella del archivo (`file_digest`).
+
+    Args:
+        config (PreprocessConfig): Configuración del proyecto
+
+    Returns:
+        str: Hash SHA-256 (16 caracteres)
+    """
+    digest = hashlib.sha256(config.version.encode())
+    files = list(CODE_TABLES)
+    if config.source == 'warehouse':
+        warehouse = open_warehouse(config)
+        for table in SIS_TABLES:
+            digest.update(f'{table}:{warehouse.revision(table)}'.encode())
+    else:
+        files = SIS_TABLES + files
+    for table in files:
+        digest.update(file_digest(config.files[table]).encode())
+    return digest.hexdigest()[:16]
+
+def input_fingerprint(config):
+    """Huella barata de las tablas de entrada: tamaño y fecha de cada archivo y revisiones del almacén.
+
+    No lee el contenido de los archivos ni recarga el almacén, así que sirve para
+    deduplicar envíos desde la interfaz; la llave de caché exacta es `input_version`.
+
+    Args:
+        config (PreprocessConfig): Configuración del proyecto
+
+    Returns:
+        str: Hash SHA-256 (16 caracteres)
+    """
+    digest = hashlib.sha256(config.version.encode())
+    tables = list(CODE_TABLES) + SIS_TABLES
+    for table in tables:
+        path = config.files.get(table)
+        digest.update((file_fingerprint(path) if path and os.path.exists(path) else f'{table}:-').encode())
+    if config.source == 'warehouse':
+        warehouse = SISWarehouse(config.files['warehouse'])
+        for table in SIS_TABLES:
+            digest.update(f'{table}:{warehouse.revision(table)}'.encode())
+    return digest.hexdigest()[:16]
+
 def filter_order_data(df_main):
     """Filtra y reordena los datos del dataframe principal.
     
@@ -185,11 +572,10 @@ def filter_order_data(df_main):
         - Mueve la variable dependiente (abandono) al final
     """
     logger.info("🔄 Comienza filtrado de datos (3er semestre en adelante)")
-    # Filtro solo alumnos de 3er semestre cursado en adelante
-    df_main = df_main[df_main['calnpe'] >= 3]
-    # Se mueve la variable dependiente al final del dataframe
-    dependient_var = df_main.pop("calsit")
-    df_main.insert(loc=len(df_main.columns), column="abandono", value=dependient_var)
+    # Filtro solo alumnos de 3er semestre cursado en adelante y la variable
+    # dependiente al final del dataframe, en una sola selección
+    columns = [col for col in df_main.columns if col != 'calsit'] + ['calsit']
+    df_main = df_main.loc[df_main['calnpe'] >= 3, columns].rename(columns={'calsit': 'abandono'})
     logger.info("✅ Filtrado de datos completado!")
     return df_main
 
@@ -208,12 +594,8 @@ def handle_miss_matVals(df_main):
     """
     # Relleno de valores faltantes en materias y claves de materia (-1 y -2 respectivamente)
     logger.info("🔄 Rellenando valores faltantes en materias y claves de materia")
-    materias = ['Algb_Lin', 'Calc_Dif', 'Calc_Int', 'Estad',
-        'Fund_Inv', 'Quim', 'Etica']
-    mat_claves = ['Algb_Lin_calcve', 'Calc_Dif_calcve', 'Calc_Int_calcve', 'Estad_calcve',
-            'Fund_Inv_calcve', 'Quim_calcve', 'Etica_calcve']
-    df_main[materias] = df_main[materias].fillna(-1)
-    df_main[mat_claves] = df_main[mat_claves].fillna(-2)
+    fill = {**dict.fromkeys(MATERIAS, -1), **{f'{mat}_calcve': -2 for mat in MATERIAS}}
+    df_main = df_main.fillna(fill)
     logger.info("✅ Proceso terminado.")
     return df_main
 
@@ -238,13 +620,12 @@ def drop_useless_cols(df_main):
     'alutco', 'alutmu', 'alutci', 'alutte1', 'alutte2', 'alutmai', 'alufac', 'alutwi', 'alutce', 
     'alupasc', 'aluteotr', 'alutecll', 'alutenum', 'alutecol', 'aluteciu', 'alutemun', 'alutetel', 
     'alutepto', 'aluale', 'alupsi','aluoest', 'aluotra', 'alutinl', 'alutpot', 'alutsec']
-    df_main = df_main.drop(columns=useless_cols)
     # Descarte de variables con varianza 0 y datos irrelevantes para el modelo
     drop_cols = ['siscve', 'calplai', 'alulare', 'alulfde', 'alulfha', 'lincve', 'aluteanp', 
     'aluteotrt', 'aludch', 'calcari', 'id', 'aluescpd', 'aluescpa', 'alulemp', 'tbecve', 'aluest', 
     'alupes', 'gincve', 'aluteing', 'alupegel', 'aluptoefl', 'cve', 'alucll', 'alunum', 'alucol', 
     'aluciu','alumad', 'alumai', 'alupas']
-    df_main = df_main.drop(columns=drop_cols)
+    df_main = df_main.drop(columns=useless_cols + drop_cols)
     logger.info("✅ Purga de columnas innecesarias terminada.")
     return df_main
 
@@ -266,23 +647,21 @@ def change_dtypes(df_main):
     #cambio de tipo de dato de columnas conservando los valores nulos, esos se tratarán después
     logger.info("🔄 Ajustando tipos de datos de columnas")
     change_dtypes = ['aluesc', 'alusex', 'aluegr', 'aluescp', 'discve', 'alulna', 'alucpo', 'alumun', 'alutra', 'alucen', 'placve', 'caling', 'alutecpo', 'alupexani']
-    for col in change_dtypes:
-        df_main[col] = df_main[col].astype('Int64')
+    df_main = df_main.astype(dict.fromkeys(change_dtypes, 'Int64'))
+    converted = {}
     # Conversión de valores en blanco por nulos y reemplazo de valores extraños
     try:
             data_to_int = ['espcve', 'aluare', 'alusme', 'alueci']
             for col in data_to_int:
                 # Primero se hace reemplazo y conversion a float por que no se puede hacer la conversion directa a Int64
-                df_main[col] = df_main[col].replace(' ', np.nan).astype(float)
-                df_main[col] = df_main[col].astype('Int64')
+                converted[col] = df_main[col].replace(' ', np.nan).astype(float).astype('Int64')
     except Exception as e:
         logger.error(f"Error al convertir columnas a Int64: {e}")
     # tratamiento independiente a variable 'alutcp' por tener entradas con asteriscos ('*****')
-    df_main['alutcp'] = df_main['alutcp'].replace('*****', '0')
-    df_main['alutcp'] = df_main['alutcp'].astype('Int64')
-    df_main['alutcp'] = df_main['alutcp'].fillna(0)
+    converted['alutcp'] = df_main['alutcp'].replace('*****', '0').astype('Int64').fillna(0)
     # Ajuste de variable 'calingt' para reemplazar valor " " a "N" (normal)
-    df_main['calingt'] = df_main['calingt'].replace(' ', 'N')
+    converted['calingt'] = df_main['calingt'].replace(' ', 'N')
+    df_main = df_main.assign(**converted)
     logger.info("✅ Ajuste de tipos de datos de columnas completado.")
     return df_main
     
@@ -314,8 +693,6 @@ def handle_location_codes(df_main, loc_codes):
     
     code_municip = []
     code_state = []
-    df_main['alulna'] = df_main['alulna'].astype(str)
-    df_main['alumun'] = df_main['alumun'].astype(str)
 
     logger.info("🔍 Separando códigos de ubicación.")
     def separa_codigos(codigo):
@@ -337,57 +714,38 @@ def handle_location_codes(df_main, loc_codes):
                 code_state.append(codigo[:2])
                 code_municip.append(codigo[2:])
         else:
-            print(f"Código de ubicación inválido: {codigo}")
+            invalid.append(codigo)
             code_state.append(np.nan)
             code_municip.append(np.nan)
-    try:
-        logger.info('🔍 Decodificando codigos de alulna...')
-        df_main['alulna'].apply(separa_codigos)
-    except Exception as e:
-        logger.error(f"❌ Error al decodificar codigos de alulna: {e}")
-    # insertando variables nuevas al dataframe
-    try:
-        logger.info('🔍 Anexando nuevas variables')
-        df_main.insert(df_main.columns.get_loc('alulna')+1,"alulna_est", code_state)
-        df_main.insert(df_main.columns.get_loc('alulna')+2,"alulna_mun", code_municip)
-    except Exception as e:
-        logger.error(f"❌ Error al anexar nuevas variables: {e}")
-    # Reseteo de listas para volverlas a usar en otra columna
-    del code_state[:]
-    del code_municip[:]
-    try:
-        logger.info('🔍 Decodificando codigos de alumun...')
-        df_main['alumun'].apply(separa_codigos)
-    except Exception as e:
-        logger.error(f"❌ Error al decodificar codigos de alumun: {e}")
-    # insertando variables nuevas al dataframe
-    try:
-        logger.info('🔍 Anexando nuevas variables')
-        df_main.insert(df_main.columns.get_loc('alumun')+1,"alumun_est", code_state)
-        df_main.insert(df_main.columns.get_loc('alumun')+2,"alumun_mun", code_municip)
-    except Exception as e:
-        logger.error(f"❌ Error al anexar nuevas variables: {e}")
-
-    # Cambiando tipo de datos de las nuevas columnas
-    for col in ['alulna_est', 'alulna_mun', 'alumun_est', 'alumun_mun']:
-        df_main[col] = df_main[col].astype('Int64')
-    print('ok')        
+    # Llaves (estado, municipio) de nacimiento (alulna) y de vivienda (alumun)
+    location_keys = {}
+    for col in ['alulna', 'alumun']:
+        # Reseteo de listas para volverlas a usar en otra columna
+        del code_state[:]
+        del code_municip[:]
+        invalid = []
+        try:
+            logger.info(f'🔍 Decodificando codigos de {col}...')
+            df_main[col].astype(str).apply(separa_codigos)
+        except Exception as e:
+            logger.error(f"❌ Error al decodificar codigos de {col}: {e}")
+        location_keys[f'{col}_est'] = pd.Series(code_state, dtype=object).astype('Int64').array
+        location_keys[f'{col}_mun'] = pd.Series(code_municip, dtype=object).astype('Int64').array
+        if invalid:
+            metrics.incr('codigos_ubicacion_invalidos', len(invalid), label=col)
+            logger.debug(f'Códigos de ubicación inválidos en {col}: {len(invalid)} (p. ej. {invalid[:5]})')
     # Eliminando columnas originales
-    print(f'Eliminando columnas originales [alulna, alumun]')
-    df_main = df_main.drop(columns=['alulna', 'alumun'])
-    print('ok')
-    # Fusionar dataframe principal con códigos de municipio y estado de nacimiento
-    df_main = df_main.merge(loc_codes, left_on=['alulna_mun', 'alulna_est'], right_on=['muncve', 'estcve'], how='left')
-    # Renombrar nuevas columnas categóricas
-    df_main = df_main.rename(columns={'munnom':'alu_nac_mun', 'estnom':'alu_nac_est'})
+    df_main = df_main.drop(columns=['alulna', 'alumun']).assign(**location_keys)
+    logger.debug(f'Columnas originales [alulna, alumun] reemplazadas por sus códigos: {df_main.shape}')
+    # Fusionar dataframe principal con los códigos de municipio y estado de nacimiento
+    # y de vivienda; el catálogo se renombra antes de cada cruce, así que el resultado
+    # ya tiene los nombres finales de las columnas categóricas
+    for col, prefix in [('alulna', 'alu_nac'), ('alumun', 'alu_dir')]:
+        codes = loc_codes.drop(columns=['cve'], errors='ignore').rename(columns={
+            'muncve': f'{col}_mun', 'estcve': f'{col}_est', 'munnom': f'{prefix}_mun', 'estnom': f'{prefix}_est'})
+        df_main = df_main.merge(codes, on=[f'{col}_mun', f'{col}_est'], how='left')
     # Eliminar columnas con códigos numéricos que ya no se usarán
-    df_main = df_main.drop(columns=['muncve', 'estcve', 'cve', 'alulna_est', 'alulna_mun'])
-    # Fusionar dataframe principal con códigos de municipio y estado de vivienda
-    df_main = df_main.merge(loc_codes, left_on=['alumun_mun', 'alumun_est'], right_on=['muncve', 'estcve'], how='left')
-    # Renombrar nuevas columnas categóricas
-    df_main = df_main.rename(columns={'munnom':'alu_dir_mun', 'estnom':'alu_dir_est'})
-    # Eliminar columnas con códigos numericos que ya no se usarán
-    df_main = df_main.drop(columns=['muncve', 'estcve', 'cve', 'alumun_mun', 'alumun_est'])
+    df_main = df_main.drop(columns=list(location_keys))
     logger.info("✅ Proceso de códigos de ubicación completado.")   
     return df_main
 
@@ -412,7 +770,7 @@ def handle_school_codes(df_main, school_codes):
         raise ValueError(error_msg)
     try:
         schools_dict = school_codes.set_index('esccve')['escnomcto'].to_dict()
-        df_main['aluesc'] = df_main['aluesc'].map(schools_dict)
+        df_main = df_main.assign(aluesc=df_main['aluesc'].map(schools_dict))
     except Exception as e:
         logger.error(f"❌ Error al mapear códigos de escuelas: {e}")
     logger.info("✅ Proceso de códigos de escuelas completado.")
@@ -476,30 +834,28 @@ def handle_course_esp_plan(df_main, df_plan_codes, df_esp_codes):
             esp = 1
         return esp
 
-    df_main['espcve'] = df_main.apply(
+    df_main = df_main.assign(espcve=df_main.apply(
         lambda row: fill_esp(row['carcve'], row['placve']) if pd.isnull(row['espcve']) else row['espcve'],
-        axis=1)
+        axis=1))
 
-    # copia del dataframe original para usar en el remapeo de especialidad
-    df_copy = df_main.copy()
+    # Ambos mapeos usan los códigos originales de plan, por eso se asignan juntos al final
+    mapped = {}
     try:
         logger.info("🔍 Mapeo los códigos de plan de estudios")
         # Mapear los códigos de plan de estudios
         plan_dict = df_plan_codes.set_index(['carcve', 'placve'])['placof'].to_dict()
         # Aplicar el mapeo usando una función lambda
-        df_main['placve'] = df_main.apply(lambda row: plan_dict.get((row['carcve'], row['placve']), row['placve']), axis=1)
+        mapped['placve'] = df_main.apply(lambda row: plan_dict.get((row['carcve'], row['placve']), row['placve']), axis=1)
     except Exception as e:
         logger.error(f"❌ Error al mapear códigos de plan de estudios: {e}")
     try:
         logger.info("🔍 Mapeo los códigos de especialidad")
         # Mapear los códigos de especialidad
         esp_dict = df_esp_codes.set_index(['espcve', 'placve', 'carcve'])['espnco'].to_dict()
-        df_main['espcve'] = df_copy.apply(lambda row: esp_dict.get((row['espcve'], row['placve'], row['carcve'])), axis=1)
+        mapped['espcve'] = df_main.apply(lambda row: esp_dict.get((row['espcve'], row['placve'], row['carcve'])), axis=1)
     except Exception as e:
         logger.error(f"❌ Error al mapear códigos de especialidad: {e}")
-
-    # Eliminar la copia del dataframe original
-    del df_copy
+    df_main = df_main.assign(**mapped)
     logger.info("✅ Proceso de variables de especialidad y plan de estudios completado.")
     return df_main
 
@@ -513,34 +869,24 @@ def remap_variables(df_main):
         pd.DataFrame: DataFrame con variables remapeadas
         
     Note:
-        - Convierte códigos numéricos a etiquetas descriptivas
+        - Convierte códigos numéricos a etiquetas descriptivas (categóricas)
         - Estandariza valores binarios
         - Mapea tipos de calificación a descripciones
+        - Las reglas están en `REMAP_SPEC`; los valores sin mapeo se cuentan en
+          la métrica 'remap_sin_mapeo'
     """
     logger.info("🔄 Remapeando variables categóricas.")
-    def remap(df, col, map_dict):
-        """Remapea los valores de una columna usando un diccionario"""
-        print(f'convirtiendo datos de variable {col} {df[col].unique()}...')
-        df[col] = df[col].map(map_dict)
-        print(f'nuevos valores: {df[col].unique()}')
+    remapped, unmapped = {}, {}
     try:
-        remap(df_main, 'carcve', {1:'ISIC', 2:'IIAL', 3:'IIND', 4:'IGEM', 6:'IIAS'})
-        remap(df_main,'calpri', {'*':1, ' ':0})
-        remap(df_main,'alusex', {1:1, 2:0})
-        remap(df_main, 'alusme', {1:"IMSS", 2:'PEMEX', 3:'ISSTE', 4:'ESTA', 5:'PART', 6:'SEG_POP'})
-        remap(df_main, 'alueci', {1:'Solt', 2:'Cas', 3:'Viu', 4:'Div', 5:'UnLib'})
-        remap(df_main, 'aluare', {1:'FisMat', 2:'QuimBio', 3:'EconAdmin', 4:'SocHum', 5:'Gral', 6:'Otro'})
-        remap(df_main, 'alupadv', {'S':1, 'N':0, ' ':np.nan})
-        remap(df_main, 'alumadv', {'S':1, 'N':0, ' ':np.nan})
-        remap(df_main, 'alulexp', {'S':1, 'N':0, ' ':np.nan})
-        remap(df_main, 'calingi', {0:'None', 1:'Akate', 2:'Amuzgo', 52:'Tarau', 60:'Toton'})
-        df_main[['alupadv', 'alumadv', 'alulexp']] = df_main[['alupadv', 'alumadv', 'alulexp']].astype('Int64')
-        calcveMats = ['Algb_Lin_calcve', 'Calc_Dif_calcve', 'Calc_Int_calcve', 'Estad_calcve', 'Fund_Inv_calcve', 'Quim_calcve', 'Etica_calcve']
-        for mat in calcveMats:
-            remap(df_main, mat, {-2:'S/Cursar', -1:'Desrt',0:'S/Cal', 1:'Ord_1ra', 2:'Ord_2da', 3:'Global',
-                                4:'RC_1ra', 5:'RC_2da', 6:'Esp_1ra', 7:'Esp_2da', 91:'Conval', 92:'Reval', 93:'Equiv'})
+        for col, rule in REMAP_RULES.items():
+            remapped[col], unmapped[col] = rule.apply(df_main[col])
+            metrics.incr('remap_sin_mapeo', unmapped[col], label=col)
     except Exception as e:
         logger.error(f"❌ Error al remapear variables categóricas: {e}")
+    df_main = df_main.assign(**remapped)
+    unmapped = {col: n for col, n in unmapped.items() if n}
+    if unmapped:
+        logger.warning(f"⚠️ Valores sin mapeo (quedan nulos): {unmapped}")
     logger.info("✅ Proceso de remapeo de variables categóricas completado.")
     return df_main
 
@@ -560,12 +906,13 @@ def birthToAge(df_main):
     """
     logger.info("🔄 Calculando edad al último periodo cursado.")
     # Reemplazo de valores faltantes por nulos
-    df_main['alunac'] = df_main['alunac'].replace('/  /', np.nan)
+    births = df_main['alunac'].replace('/  /', np.nan)
     try:
         # Conversión de tipo de dato
-        df_main['alunac'] = pd.to_datetime(df_main['alunac'], format='%m/%d/%Y', errors='coerce')
+        births = pd.to_datetime(births, format='%m/%d/%Y', errors='coerce')
     except Exception as e:
         logger.error(f"❌ Error al convertir tipo de dato de fecha de nacimiento: {e}")
+    df_main = df_main.assign(alunac=births)
 
     def calculate_age(datebirth, ingress, period):
         """Calcula la edad de un alumno en base a su fecha de nacimiento, periodo de ingreso y periodo de estudio actual"""
@@ -574,23 +921,23 @@ def birthToAge(df_main):
         age_last_period = age_in + math.ceil(period/2)
         return age_last_period
     try:
-        df_main['edad'] = df_main.apply(
+        df_main = df_main.assign(edad=df_main.apply(
             lambda row: calculate_age(row['alunac'], row['caling'], row['calnpe']), axis=1
-        )
+        ))
     except Exception as e:
         logger.error(f"❌ Error al calcular edad: {e}")
-    # Eliminación de columna 'alunac' que ya no es necesaria
-    df_main = df_main.drop(columns=['alunac'])
-    # Conversión de edad a entero
-    df_main['edad'] =df_main['edad'].astype('Int64')
+    # Eliminación de columna 'alunac' que ya no es necesaria y conversión de edad a entero
+    df_main = df_main.drop(columns=['alunac']).astype({'edad': 'Int64'})
     logger.info("✅ Proceso de conversión de edad completado.")
     return df_main
 
-def reorder_and_rename_cols(df_main):
+def reorder_and_rename_cols(df_main, keep_target=False):
     """Reordena y renombra las columnas del DataFrame.
     
     Args:
         df_main (pd.DataFrame): DataFrame principal
+        keep_target (bool): Si es True conserva la variable 'abandono' al final
+            (necesaria para entrenamiento)
         
     Returns:
         pd.DataFrame: DataFrame con columnas reordenadas y renombradas
@@ -599,40 +946,22 @@ def reorder_and_rename_cols(df_main):
         ValueError: Si faltan columnas requeridas en el DataFrame
     """
     logger.info("🔄 Reordenando y renombrando columnas.")
-    print(df_main.columns)
-    sorted_cols = ['carcve', 'placve', 'espcve', 'caling', 'calnpe', 'calcac', 'calnpec',
-       'caltcala', 'caltcalr', 'calmata', 'calmat', 'calmatac', 'calpri',
-       'calnpep', 'calingt', 'calingi', 'alusex', 'edad', 'alu_nac_est',
-       'alu_nac_mun', 'aluesc', 'aluegr', 'aluare', 'alu_dir_est', 'alu_dir_mun', 'aluescp',
-       'alucpo', 'alusme', 'alueci', 'alupadv', 'alumadv', 'alutcp', 'alutra',
-       'alulexp', 'alutecpo', 'alupexani', 'discve',
-       'alucen', 'Algb_Lin', 'Algb_Lin_calcve', 'Calc_Dif', 'Calc_Dif_calcve',
-       'Calc_Int', 'Calc_Int_calcve', 'Estad', 'Estad_calcve', 'Fund_Inv',
-       'Fund_Inv_calcve', 'Quim', 'Quim_calcve', 'Etica', 'Etica_calcve']
-    dict_rename_vars = {
-    'carcve':'cve_carrera', 'placve':'cve_plan_estud', 'espcve':'cve_esp', 'caling':'period_ingreso', 'calnpe':'period_ultimo',
-    'calcac':'cred_acum', 'calnpec':'period_conval', 'caltcala':'calif_aprob', 'caltcalr':'calif_reprob', 'calmata':'mat_aprob',
-    'calmat':'mat_cursadas', 'calmatac':'mat_con_ac', 'calpri':'opcn_estudios', 'calnpep':'period_aut_comite',
-    'calingt':'tipo_ingreso', 'calingi':'leng_indig', 'alusex':'genero', 'alu_nac_est':'estado_nac', 'alu_nac_mun':'munic_nac',
-    'aluesc':'escuela', 'aluegr':'año_egreso', 'aluare':'area_egreso', 'alu_dir_est':'estado_dir', 'alu_dir_mun':'munic_dir',
-    'aluescp':'prom_ingreso', 'alucpo':'cod_postal', 'alusme':'serv_medico', 'alueci':'edo_civil', 'alupadv':'papa_vive',
-    'alumadv':'mama_vive', 'alutcp':'cod_post_tutor', 'alutra':'empresa', 'alulexp':'exp_trabj', 'alutecpo':'cod_post_trabj',
-    'alupexani':'score_exani', 'discve':'discapacidad', 'alucen':'cntro_trab'
-    }
-    df_students_names = df_main[['aluctr', 'aluapp', 'aluapm', 'alunom']]
-    df_students_names = df_students_names.rename(columns={'aluctr':'# Control', 'aluapp':'Apellido Pat', 'aluapm':'Apellido Mat', 'alunom':'Nombre'})
-    print(f'dataframe de datos de alumnos: {df_students_names}')
+    logger.debug(f'Dataframe principal: {df_main.shape}')
+    df_students_names = df_main[list(NAME_COLS)].rename(columns=NAME_COLS)
+    # el número de control solo se decodifica a texto para la salida
+    if isinstance(df_students_names['# Control'].dtype, pd.CategoricalDtype):
+        df_students_names = df_students_names.astype({'# Control': object})
+    logger.debug(f'Dataframe de datos de alumnos: {df_students_names.shape}')
     # verificar que las columnas estén en el dataframe sin importar el orden
-    missing_cols = set(sorted_cols) - set(df_main.columns)
+    missing_cols = set(SORTED_COLS) - set(df_main.columns)
     if len(missing_cols) > 0:
         logger.error(f'❌ Faltan columnas en el dataframe: {missing_cols}')
         raise ValueError(f'Faltan columnas en el dataframe: {missing_cols}')
     else:
         try:
             # Reordenamiento de columnas
-            df_main = df_main.drop(columns=['abandono'])
-            df_main = df_main.reindex(sorted_cols, axis=1)
-            df_main = df_main.rename(columns=dict_rename_vars)
+            target_cols = ['abandono'] if keep_target else []
+            df_main = df_main.reindex(SORTED_COLS + target_cols, axis=1).rename(columns=RENAME_VARS)
         except Exception as e:
             logger.error(f"❌ Error al reordenar y renombrar columnas: {e}")   
     logger.info("✅ Proceso de reordenamiento y renombramiento de columnas completado.")
@@ -648,50 +977,176 @@ def objToCat(df_main):
         pd.DataFrame: DataFrame con columnas convertidas a categorical
     """
     logger.info("🔄 Convirtiendo columnas de tipo object a categorical.")
-    for col in df_main.select_dtypes(include=['object']).columns:
-        df_main[col] = df_main[col].astype('category')
+    df_main = df_main.astype(dict.fromkeys(df_main.select_dtypes(include=['object']).columns, 'category'))
     logger.info("✅ Proceso de conversión de columnas de tipo object a categorical completado.")
     return df_main
 
-def preprocess_pipeline(config: PreprocessConfig) -> tuple[pd.DataFrame, pd.DataFrame]:
+def load_code_tables(config: PreprocessConfig) -> tuple:
+    """Carga y valida los catálogos de ubicaciones, escuelas, planes y especialidades.
+
+    Args:
+        config (PreprocessConfig): Configuración con las rutas de los catálogos
+
+    Returns:
+        tuple: (loc_codes, school_codes, plan_codes, esp_codes)
+    """
+    return tuple(read_code_table(config.files[table], table) for table in CODE_TABLES)
+
+def read_code_table(path, table):
+    """Lee un catálogo ('ubicaciones', 'escuelas', 'plan_estudio' o 'especialidad') y lo valida."""
+    df_codes = pd.read_csv(path, encoding='latin-1')
+    validate_table(df_codes, table)
+    return df_codes
+
+def transform_data(df_cal, df_alumn, df_dcalumn, code_tables, keep_target=False):
+    """Aplica las transformaciones del preprocesamiento a los datos ya cargados.
+
+    Args:
+        df_cal (pd.DataFrame): Calificaciones procesadas por `read_grades`
+        df_alumn (pd.DataFrame): Datos personales de alumnos
+        df_dcalumn (pd.DataFrame): Datos académicos
+        code_tables (tuple): Catálogos devueltos por `load_code_tables`
+        keep_target (bool): Conserva la variable 'abandono' como última columna
+
+    Returns:
+        tuple: (df_main, df_students_names)
+    """
+    df_main = merge_dataframes(df_cal, df_alumn, df_dcalumn)
+    return transform_merged(df_main, code_tables, keep_target=keep_target)
+
+def transform_merged(df_main, code_tables, keep_target=False):
+    """Transformaciones posteriores a la fusión (de `merge_dataframes` o `merge_dataframes_sql`).
+
+    Args:
+        df_main (pd.DataFrame): DataFrame combinado
+        code_tables (tuple): Catálogos devueltos por `load_code_tables`
+        keep_target (bool): Conserva la variable 'abandono' como última columna
+
+    Returns:
+        tuple: (df_main, df_students_names)
+    """
+    loc_codes, school_codes, plan_codes, esp_codes = code_tables
+    df_main = clean_merged(df_main)
+    df_main = handle_location_codes(df_main, loc_codes)
+    df_main = handle_school_codes(df_main, school_codes)
+    df_main = handle_course_esp_plan(df_main, plan_codes, esp_codes)
+    return finish_transform(df_main, keep_target=keep_target)
+
+def clean_merged(df_main):
+    """Limpieza que no depende de los catálogos: filtrado, faltantes, columnas y tipos."""
+    df_main = filter_order_data(df_main)
+    df_main = handle_miss_matVals(df_main)
+    df_main = drop_useless_cols(df_main)
+    df_main = df_main.assign(abandono=df_main['abandono'].map(DEP_VAR_MAP))
+    return change_dtypes(df_main)
+
+def finish_transform(df_main, keep_target=False):
+    """Remapeo, edad, orden y nombres finales y conversión a categóricas.
+
+    Returns:
+        tuple: (df_main, df_students_names)
+    """
+    df_main = remap_variables(df_main)
+    df_main = birthToAge(df_main)
+    df_main, df_students_names = reorder_and_rename_cols(df_main, keep_target=keep_target)
+    df_main = objToCat(df_main)
+    return df_main, df_students_names
+
+def load_inputs(config: PreprocessConfig, subset=None):
+    """Carga las tablas del SIS desde la fuente configurada (`config.source`).
+
+    Args:
+        config (PreprocessConfig): Configuración del preprocesamiento
+        subset (dict): Columna -> valores permitidos ('aluctr', 'carcve' o 'caling')
+
+    Returns:
+        tuple: ('almacen', df_main) con el DataFrame ya combinado en el almacén, o
+            ('csv', (df_cal, df_alumn, df_dcalumn)) con las tablas leídas de archivo
+    """
+    if config.source == 'warehouse':
+        return 'almacen', merge_dataframes_sql(open_warehouse(config), subset)
+    df_cal, df_alumn, df_dcalumn = load_data(
+        config.files['dalumn'],
+        config.files['dcalum'],
+        config.files['dkarde']
+    )
+    return 'csv', (df_cal, df_alumn, subset_rows(df_dcalumn, subset))
+
+def preprocess_graph(config: PreprocessConfig, keep_target: bool = False, subset: dict = None) -> StageGraph:
+    """Grafo de etapas del preprocesamiento con pandas.
+
+    Las lecturas de las tablas del SIS (o la consulta al almacén) y de los cuatro
+    catálogos son independientes y corren en paralelo; el pivoteo de calificaciones
+    y la ubicación de los datos personales solo esperan al diccionario de llaves, y
+    cada catálogo solo a su etapa `handle_*`. Las lecturas de archivo se memorizan
+    por la huella del archivo (ruta, tamaño y fecha de modificación).
+
+    Args:
+        config (PreprocessConfig): Configuración del preprocesamiento
+        keep_target (bool): Conserva la variable 'abandono' como última columna
+        subset (dict): Subconjunto de alumnos (ver `preprocess_pipeline`)
+
+    Returns:
+        StageGraph: Grafo que produce 'df_main' y 'df_students_names'
+    """
+    files = config.files
+    graph = StageGraph('preprocesamiento')
+    if config.source == 'warehouse':
+        graph.add('almacen', lambda: merge_dataframes_sql(open_warehouse(config), subset), outputs=['df_merged'])
+    else:
+        graph.add('dkarde', lambda: read_grades_validated(files['dkarde']), outputs=['df_cal'],
+                  memo_key=file_fingerprint(files['dkarde']))
+        graph.add('dalumn', lambda: read_sis_table(files['dalumn'], 'dalumn'), outputs=['df_alumn'],
+                  memo_key=file_fingerprint(files['dalumn']))
+        graph.add('dcalum', lambda: read_sis_table(files['dcalum'], 'dcalum'), outputs=['df_dcalum_raw'],
+                  memo_key=file_fingerprint(files['dcalum']))
+        graph.add('subconjunto', lambda df: subset_rows(df, subset), inputs=['df_dcalum_raw'], outputs=['df_dcalumn'])
+        graph.add('llaves', lambda df: KeyDictionary(df['aluctr']), inputs=['df_dcalumn'], outputs=['keys'])
+        graph.add('pivoteo', pivot_grades, inputs=['df_cal', 'keys'], outputs=['grades'])
+        graph.add('alumnos', student_rows, inputs=['df_alumn', 'keys'], outputs=['students'])
+        graph.add('fusion', assemble_merged, inputs=['df_dcalumn', 'keys', 'grades', 'students'],
+                  outputs=['df_merged'])
+    for table in CODE_TABLES:
+        graph.add(table, lambda path=files[table], table=table: read_code_table(path, table),
+                  memo_key=file_fingerprint(files[table]))
+    graph.add('limpieza', clean_merged, inputs=['df_merged'], outputs=['df_clean'])
+    graph.add('ubicacion', handle_location_codes, inputs=['df_clean', 'ubicaciones'], outputs=['df_loc'])
+    graph.add('escuela', handle_school_codes, inputs=['df_loc', 'escuelas'], outputs=['df_school'])
+    graph.add('plan', handle_course_esp_plan, inputs=['df_school', 'plan_estudio', 'especialidad'],
+              outputs=['df_plan'])
+    graph.add('final', lambda df: finish_transform(df, keep_target=keep_target), inputs=['df_plan'],
+              outputs=['df_main', 'df_students_names'])
+    return graph
+
+def preprocess_pipeline(config: PreprocessConfig, keep_target: bool = False,
+                        subset: dict = None) -> tuple[pd.DataFrame, pd.DataFrame]:
     """Ejecuta el pipeline completo de preprocesamiento.
     Args:
         config (PreprocessConfig): Configuración del preprocesamiento 
+        keep_target (bool): Conserva la variable 'abandono' (mapeada con `DEP_VAR_MAP`)
+            como última columna, para entrenamiento
+        subset (dict): Procesa solo un subconjunto de alumnos, p. ej. {'carcve': [1]},
+            {'caling': [2161]} o {'aluctr': ['E17000001']}; None para todos
     Returns:
         pd.DataFrame: DataFrame procesado y listo para entrenamiento  
     Note:
-        - Carga datos iniciales
-        - Procesa calificaciones
-        - Combina datos
+        - Carga datos iniciales (las calificaciones se procesan durante la lectura)
+        - Combina datos (en el almacén si `config.source == 'warehouse'`)
         - Limpia y transforma variables
+        - Con `config.backend == 'polars'` las transformaciones se ejecutan como un
+          solo plan de Polars (ver `pipeline_preprocessing_polars`) con el mismo resultado
     """
+    if config.backend == 'polars':
+        from src.pipelines.pipeline_preprocessing_polars import preprocess_pipeline_polars
+        return preprocess_pipeline_polars(config, keep_target=keep_target, subset=subset)
     logger.info("🚀 Iniciando pipeline de preprocesamiento")
     try:
-        df_cal, df_alumn, df_dcalumn = load_data(
-            config.files['dalumn'],
-            config.files['dcalum'],
-            config.files['dkarde']
-        )
-        loc_codes = pd.read_csv(config.files['ubicaciones'], encoding='latin-1')
-        school_codes = pd.read_csv(config.files['escuelas'], encoding='latin-1')
-        plan_codes = pd.read_csv(config.files['plan_estudio'], encoding='latin-1')
-        esp_codes = pd.read_csv(config.files['especialidad'], encoding='latin-1')
-
-        df_cal = process_grades(df_cal)
-        df_main = merge_dataframes(df_cal, df_alumn, df_dcalumn)
-        df_main = filter_order_data(df_main)
-        df_main = handle_miss_matVals(df_main)
-        df_main = drop_useless_cols(df_main)
-        dep_var_map = {1:0, 2:1, 4:1, 5:0}
-        df_main['abandono'] = df_main['abandono'].map(dep_var_map)
-        df_main = change_dtypes(df_main)
-        df_main = handle_location_codes(df_main, loc_codes)
-        df_main = handle_school_codes(df_main, school_codes)
-        df_main = handle_course_esp_plan(df_main, plan_codes, esp_codes)
-        df_main = remap_variables(df_main)
-        df_main = birthToAge(df_main)
-        df_main, df_students_names = reorder_and_rename_cols(df_main)
-        df_main = objToCat(df_main)
+        graph = preprocess_graph(config, keep_target=keep_target, subset=subset)
+        results = graph.run(['df_main', 'df_students_names'])
+        df_main, df_students_names = results['df_main'], results['df_students_names']
+        unmapped = metrics.snapshot().get('remap_sin_mapeo')
+        if unmapped:
+            logger.info(f"📊 Valores sin mapear acumulados por columna: {unmapped}")
         logger.info("🔄 Guardando dataset procesado")
         # df_main.to_csv(os.path.join(config.output_path, 'processed_data.csv'), index=False)
         logger.info("✅ Dataset procesado guardado")
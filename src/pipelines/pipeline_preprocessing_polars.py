@@ -0,0 +1,234 @@
+"""
+Motor alternativo del preprocesamiento sobre LazyFrames de Polars.
+Las mismas transformaciones de `pipeline_preprocessing` (fusión, filtrado,
+tipos, ubicaciones, escuelas, planes, remapeo, edad y renombrado) se expresan
+como un solo plan diferido: el optimizador de Polars descarta desde el inicio
+las columnas que no llegan al resultado, ejecuta los cruces en paralelo y no
+materializa ningún DataFrame intermedio. La carga y validación de archivos es
+la misma del motor de pandas, y el resultado se entrega como DataFrames de
+pandas idénticos a los de `preprocess_pipeline`. Única diferencia conocida: un
+plan de estudios sin equivalente en el catálogo queda como texto ('9') y no
+como entero dentro de la categoría.
+"""
+from typing import Dict
+
+import pandas as pd
+import polars as pl
+
+from src.pipelines.pipeline_preprocessing import (DEP_VAR_MAP, MATERIAS, NAME_COLS, REMAP_SPEC, RENAME_VARS,
+                                                  SORTED_COLS, load_code_tables, load_inputs)
+from src.utils.config_utils import PreprocessConfig
+from src.utils.logging_utils import config_logging
+from src.utils.metrics_utils import metrics
+
+logger = config_logging()
+
+# Columnas que el motor de pandas entrega como enteros con nulos (Int64)
+NULLABLE_INT_COLS = ['caling', 'aluegr', 'aluescp', 'alucpo', 'alutcp', 'alutra', 'alutecpo', 'alupexani',
+                     'discve', 'alucen', 'alupadv', 'alumadv', 'alulexp', 'edad', *MATERIAS]
+# Prefijo de las columnas auxiliares que marcan valores sin mapeo
+UNMAPPED_PREFIX = '__sin_mapeo__'
+
+
+def _keep_last(lf: pl.LazyFrame, keys) -> pl.LazyFrame:
+    """Equivale a `drop_duplicates(subset=keys, keep='last')`: conserva el orden de las filas."""
+    return lf.filter(pl.int_range(pl.len()).over(keys) == pl.len().over(keys) - 1)
+
+
+def _blank_to_int(col: str, dtype: pl.DataType) -> pl.Expr:
+    """Texto con blancos (' ') a entero con nulos, como en `change_dtypes`."""
+    expr = pl.col(col)
+    if dtype == pl.String:
+        expr = pl.when(expr == ' ').then(None).otherwise(expr).cast(pl.Float64)
+    return expr.cast(pl.Int64).alias(col)
+
+
+def _split_location(col: str) -> tuple:
+    """Separa un código de 4 o 5 dígitos en (estado, municipio), como `handle_location_codes`."""
+    code = pl.col(col).cast(pl.Int64).cast(pl.String)
+    valid = code.str.len_chars().is_in([4, 5])
+    state = pl.when(valid).then(code.str.slice(0, 2)).cast(pl.Int64).alias(f'{col}_est')
+    municip = pl.when(valid).then(code.str.slice(2)).cast(pl.Int64).alias(f'{col}_mun')
+    return state, municip
+
+
+def _fill_esp(carr: pl.Expr, plan: pl.Expr) -> pl.Expr:
+    """Especialidad por omisión según carrera y plan (misma regla que `fill_esp`)."""
+    return (pl.when(carr == 1).then(pl.when(plan <= 2).then(1).otherwise(2))
+            .when(carr == 2).then(pl.when((plan < 2) | (plan > 4)).then(1).otherwise(2))
+            .when(carr == 3).then(1)
+            .when(carr == 4).then(pl.when(plan < 2).then(1).otherwise(2))
+            .when(carr == 6).then(1)
+            .otherwise(0)
+            .cast(pl.Int64))
+
+
+def _remap(col: str, mapping: Dict, dtype) -> tuple:
+    """Regla de `REMAP_SPEC` como expresión: (valor remapeado, marca de valor sin mapeo)."""
+    old = list(mapping.keys())
+    new = [None if pd.isna(value) else value for value in mapping.values()]
+    return_dtype = pl.String if dtype is None else pl.Int64
+    remapped = pl.col(col).replace_strict(old, new, default=None, return_dtype=return_dtype)
+    unmapped = (pl.col(col).is_not_null() & ~pl.col(col).is_in(old)).alias(f'{UNMAPPED_PREFIX}{col}')
+    return remapped, unmapped
+
+
+def merge_plan(df_cal: pd.DataFrame, df_alumn: pd.DataFrame, df_dcalumn: pd.DataFrame) -> pl.LazyFrame:
+    """Fusión de las tablas del SIS (equivalente de `merge_dataframes`) como plan diferido."""
+    # Pivoteo de calificaciones y tipos de calificación: una fila por alumno
+    pivots = pl.from_pandas(df_cal).lazy().group_by('aluctr').agg(
+        *[expr for mat in MATERIAS for expr in (
+            pl.col('karcal').filter(pl.col('matcve') == mat).last().cast(pl.Int64).alias(mat),
+            pl.col('tcacve').filter(pl.col('matcve') == mat).last().cast(pl.Int64).alias(f'{mat}_calcve'))])
+    # Último registro por alumno
+    alumn = _keep_last(pl.from_pandas(df_alumn).lazy(), 'aluctr')
+    return (_keep_last(pl.from_pandas(df_dcalumn).lazy(), 'aluctr')
+            .join(alumn, on='aluctr', how='left', maintain_order='left')
+            .join(pivots, on='aluctr', how='inner', maintain_order='left'))
+
+
+def build_plan(lf: pl.LazyFrame, loc_codes: pd.DataFrame, school_codes: pd.DataFrame, plan_codes: pd.DataFrame,
+               esp_codes: pd.DataFrame, keep_target: bool = False) -> pl.LazyFrame:
+    """Construye el plan diferido del preprocesamiento a partir de las tablas fusionadas.
+
+    Args:
+        lf (pl.LazyFrame): Tablas fusionadas (`merge_plan`, o la consulta del almacén)
+        loc_codes, school_codes, plan_codes, esp_codes (pd.DataFrame): Catálogos validados
+        keep_target (bool): Incluye la variable 'abandono' al final
+
+    Returns:
+        pl.LazyFrame: Plan con las variables finales (ya renombradas), los datos de
+            identificación del alumno y las marcas de valores sin mapeo
+    """
+    # Filtro de 3er semestre en adelante
+    lf = lf.filter(pl.col('calnpe') >= 3)
+    schema = lf.collect_schema()
+
+    # Faltantes en materias, tipos de dato y ajustes de valores
+    lf = lf.with_columns(
+        *[pl.col(mat).fill_null(-1) for mat in MATERIAS],
+        *[pl.col(f'{mat}_calcve').fill_null(-2) for mat in MATERIAS],
+        *[pl.col(col).cast(pl.Int64) for col in ['aluesc', 'alusex', 'aluegr', 'aluescp', 'discve', 'alulna',
+                                                 'alucpo', 'alumun', 'alutra', 'alucen', 'placve', 'caling',
+                                                 'alutecpo', 'alupexani']],
+        *[_blank_to_int(col, schema[col]) for col in ['espcve', 'aluare', 'alusme', 'alueci']],
+        (pl.col('alutcp').replace('*****', '0') if schema['alutcp'] == pl.String else pl.col('alutcp'))
+            .cast(pl.Int64).fill_null(0),
+        pl.col('calingt').replace(' ', 'N') if schema['calingt'] == pl.String else pl.col('calingt'),
+        pl.col('calsit').replace_strict(DEP_VAR_MAP, default=None, return_dtype=pl.Int64).alias('abandono'),
+    )
+
+    # Ubicaciones de nacimiento y de vivienda
+    locs = (pl.from_pandas(loc_codes[['muncve', 'estcve', 'munnom', 'estnom']]).lazy()
+            .with_columns(pl.col('muncve').cast(pl.Int64), pl.col('estcve').cast(pl.Int64)))
+    lf = lf.with_columns(*_split_location('alulna'), *_split_location('alumun'))
+    for col, prefix in [('alulna', 'alu_nac'), ('alumun', 'alu_dir')]:
+        lf = lf.join(locs.rename({'munnom': f'{prefix}_mun', 'estnom': f'{prefix}_est'}),
+                     left_on=[f'{col}_mun', f'{col}_est'], right_on=['muncve', 'estcve'],
+                     how='left', maintain_order='left')
+
+    # Escuelas, planes y especialidades (el mapeo de especialidad usa el plan original)
+    schools_dict = school_codes.set_index('esccve')['escnomcto'].to_dict()
+    plans = (_keep_last(pl.from_pandas(plan_codes[['carcve', 'placve', 'placof']]).lazy(), ['carcve', 'placve'])
+             .with_columns(pl.col('carcve').cast(pl.Int64), pl.col('placve').cast(pl.Int64),
+                           pl.col('placof').cast(pl.String)))
+    esps = (_keep_last(pl.from_pandas(esp_codes[['espcve', 'placve', 'carcve', 'espnco']]).lazy(),
+                       ['espcve', 'placve', 'carcve'])
+            .with_columns(pl.col('espcve').cast(pl.Int64), pl.col('placve').cast(pl.Int64),
+                          pl.col('carcve').cast(pl.Int64), pl.col('espnco').cast(pl.String)))
+    lf = (lf.with_columns(pl.col('aluesc').replace_strict(schools_dict, default=None, return_dtype=pl.String),
+                          pl.col('carcve').cast(pl.Int64),
+                          pl.coalesce(pl.col('espcve'), _fill_esp(pl.col('carcve'), pl.col('placve'))))
+          .join(plans, on=['carcve', 'placve'], how='left', maintain_order='left')
+          .join(esps, on=['espcve', 'placve', 'carcve'], how='left', maintain_order='left')
+          .with_columns(pl.coalesce(pl.col('placof'), pl.col('placve').cast(pl.String)).alias('placve'),
+                        pl.col('espnco').alias('espcve')))
+
+    # Remapeo de códigos y edad al último periodo cursado
+    rules = [_remap(col, mapping, dtype) for col, (mapping, dtype) in REMAP_SPEC.items()]
+    birth_year = pl.col('alunac').str.to_date('%m/%d/%Y', strict=False).dt.year().cast(pl.Int64)
+    lf = lf.with_columns(
+        *[remapped for remapped, _ in rules],
+        *[unmapped for _, unmapped in rules],
+        ((pl.col('caling') // 10 + 1800) - birth_year
+         + (pl.col('calnpe') / 2).ceil().cast(pl.Int64)).alias('edad'),
+    )
+
+    # Orden y nombres finales
+    target = [pl.col('abandono')] if keep_target else []
+    return lf.select(
+        *[pl.col(col).alias(RENAME_VARS.get(col, col)) for col in SORTED_COLS], *target,
+        *[pl.col(col).alias(name) for col, name in NAME_COLS.items()],
+        pl.col(f'^{UNMAPPED_PREFIX}.*$'),
+    )
+
+
+def to_pandas_frames(df: pl.DataFrame, keep_target: bool = False) -> tuple:
+    """Separa el resultado del plan en (df_main, df_students_names) con los tipos del motor de pandas."""
+    main_cols = [RENAME_VARS.get(col, col) for col in SORTED_COLS] + (['abandono'] if keep_target else [])
+    nullable_int = {RENAME_VARS.get(col, col) for col in NULLABLE_INT_COLS}
+    df_main = df.select(main_cols).to_pandas()
+    for col in df_main.columns:
+        if df.schema[col] == pl.String:
+            df_main[col] = df_main[col].astype('category')
+        elif col in nullable_int:
+            df_main[col] = df_main[col].astype('Int64')
+    df_students_names = df.select(list(NAME_COLS.values())).to_pandas()
+    return df_main, df_students_names
+
+
+def transform_data_polars(df_cal: pd.DataFrame, df_alumn: pd.DataFrame, df_dcalumn: pd.DataFrame,
+                          code_tables: tuple, keep_target: bool = False) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Equivalente de `transform_data` que ejecuta el plan de Polars.
+
+    Args:
+        df_cal (pd.DataFrame): Calificaciones procesadas por `read_grades`
+        df_alumn (pd.DataFrame): Datos personales de alumnos
+        df_dcalumn (pd.DataFrame): Datos académicos
+        code_tables (tuple): Catálogos devueltos por `load_code_tables`
+        keep_target (bool): Conserva la variable 'abandono' como última columna
+
+    Returns:
+        tuple: (df_main, df_students_names)
+    """
+    return run_plan(merge_plan(df_cal, df_alumn, df_dcalumn), code_tables, keep_target=keep_target)
+
+
+def run_plan(lf: pl.LazyFrame, code_tables: tuple, keep_target: bool = False) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Ejecuta el plan sobre las tablas fusionadas y registra los valores sin mapeo."""
+    logger.info("🔄 Ejecutando plan de transformaciones (polars)")
+    df = build_plan(lf, *code_tables, keep_target=keep_target).collect()
+
+    unmapped_cols = [col for col in df.columns if col.startswith(UNMAPPED_PREFIX)]
+    unmapped = {col[len(UNMAPPED_PREFIX):]: int(n) for col, n in df.select(unmapped_cols).sum().row(0, named=True).items()}
+    for col, n in unmapped.items():
+        metrics.incr('remap_sin_mapeo', n, label=col)
+    unmapped = {col: n for col, n in unmapped.items() if n}
+    if unmapped:
+        logger.warning(f"⚠️ Valores sin mapeo (quedan nulos): {unmapped}")
+    return to_pandas_frames(df.drop(unmapped_cols), keep_target=keep_target)
+
+
+def preprocess_pipeline_polars(config: PreprocessConfig, keep_target: bool = False,
+                               subset: dict = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Ejecuta el preprocesamiento completo como un plan de Polars.
+
+    Args:
+        config (PreprocessConfig): Configuración del preprocesamiento
+        keep_target (bool): Conserva la variable 'abandono' como última columna
+        subset (dict): Subconjunto de alumnos (ver `preprocess_pipeline`)
+
+    Returns:
+        tuple: (df_main, df_students_names), iguales a los de `preprocess_pipeline`
+    """
+    logger.info("🚀 Iniciando pipeline de preprocesamiento (polars)")
+    try:
+        source, data = load_inputs(config, subset)
+        code_tables = load_code_tables(config)
+        lf = pl.from_pandas(data).lazy() if source == 'almacen' else merge_plan(*data)
+        df_main, df_students_names = run_plan(lf, code_tables, keep_target=keep_target)
+        logger.info(f"✅ Preprocesamiento (polars) completado - {len(df_main)} alumnos")
+        return (df_main, df_students_names)
+    except Exception as e:
+        logger.error(f"❌ Error en el pipeline de preprocesamiento (polars): {str(e)}")
+        raise
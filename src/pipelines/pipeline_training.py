@@ -0,0 +1,168 @@
+"""
+Pipeline de reentrenamiento del modelo de abandono.
+Reutiliza las etapas de preprocesamiento y preparación, guarda la matriz de
+variables preparada en un almacén mapeado en memoria (FeatureStore) y ejecuta
+una búsqueda de hiperparámetros con validación cruzada agrupada por cohorte de
+ingreso, en paralelo.
+
+Con `campuses` en config.yaml se entrena un modelo por campus, cada uno con
+sus propias entradas y en `training.output_dir/<campus>/`.
+
+Uso:
+    python -m src.pipelines.pipeline_training
+"""
+import json
+import os
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import GridSearchCV, GroupKFold
+
+from src.utils import load_config
+from src.utils.config_utils import PreprocessConfig, TrainingConfig
+from src.utils.logging_utils import config_logging
+from src.pipelines import pipeline_preprocessing as pl_prep
+from src.pipelines.pipeline_data_preparation import DataPreparationPipeline
+from src.utils.feature_store import FeatureStore
+from src.utils.drift_utils import FeatureSketch
+
+logger = config_logging()
+
+SCORING = ['f1', 'roc_auc', 'accuracy', 'precision', 'recall']
+
+
+class TrainingPipeline:
+    def __init__(self, config: PreprocessConfig) -> None:
+        """Inicializa el pipeline de entrenamiento.
+
+        Args:
+            config (PreprocessConfig): Configuración del proyecto; la sección
+                `training` define directorios, paralelismo y rejilla de búsqueda.
+        """
+        self.config = config
+        self.training = config.training or TrainingConfig()
+
+    def features_key(self) -> str:
+        """Calcula la llave de la caché a partir del contenido de las tablas de entrada.
+
+        Returns:
+            str: Hash SHA-256 (16 caracteres) de la versión y de las tablas de entrada
+                (ver `pipeline_preprocessing.input_version`).
+        """
+        return pl_prep.input_version(self.config)
+
+    def load_features(self) -> tuple[pd.DataFrame, pd.Series, np.ndarray, dict]:
+        """Obtiene la matriz preparada, la variable objetivo y las cohortes.
+
+        Si las tablas de entrada no cambiaron desde el último entrenamiento la
+        matriz se lee de la caché en disco en lugar de repetir el preprocesamiento.
+
+        Returns:
+            tuple: (X, y, groups, artifact)
+                - X: variables preparadas
+                - y: 'abandono' (0/1)
+                - groups: cohorte de ingreso de cada alumno, para las particiones
+                - artifact: artefacto ajustado de DataPreparationPipeline
+        """
+        cache_path = os.path.join(self.training.cache_dir, f'features_{self.features_key()}')
+        target_path = os.path.join(cache_path, 'objetivo.joblib')
+        if FeatureStore.exists(cache_path) and os.path.exists(target_path):
+            logger.info(f'📂 Cargando matriz de variables desde caché: {cache_path}')
+            cached = joblib.load(target_path)
+            return FeatureStore(cache_path).to_frame(), cached['y'], cached['groups'], cached['artifact']
+
+        logger.info('🔄 Preparando matriz de variables para entrenamiento')
+        df_processed, df_students_names = pl_prep.preprocess_pipeline(self.config, keep_target=True)
+        # Solo se entrena con alumnos cuya situación final es conocida
+        known = df_processed['abandono'].notna().to_numpy()
+        df_processed = df_processed[known]
+        controls = pd.Series(df_students_names['# Control'].to_numpy()[known], index=df_processed.index)
+        y = df_processed.pop('abandono').astype(int)
+        groups = df_processed['period_ingreso'].ffill()
+        prep = DataPreparationPipeline(df_processed)
+        X = prep.get_prepared_data()
+        # El almacén indexa por posición: objetivo y controles se alinean a las filas de X
+        y = y.loc[X.index].reset_index(drop=True)
+        controls = controls.loc[X.index]
+        groups = groups.loc[X.index].to_numpy()
+        artifact = prep.get_artifact()
+        # El objetivo se escribe primero: el manifiesto del almacén marca la caché como completa
+        os.makedirs(cache_path, exist_ok=True)
+        joblib.dump({'y': y, 'groups': groups, 'artifact': artifact}, target_path)
+        X = FeatureStore.write(cache_path, X, controls).to_frame()
+        logger.info(f'✅ Matriz de variables guardada en caché: {cache_path}')
+        return X, y, groups, artifact
+
+    def train(self) -> str:
+        """Entrena el modelo con búsqueda de hiperparámetros y guarda los resultados.
+
+        Returns:
+            str: Carpeta con 'modelo_abandono.joblib', 'preparacion.joblib', 'metricas.json'
+                y 'linea_base_deriva.json' (resumen de la matriz de entrenamiento para el monitor de deriva).
+
+        Raises:
+            ValueError: Si no hay al menos dos cohortes para la validación agrupada.
+        """
+        logger.info('🚀 Iniciando pipeline de entrenamiento')
+        start = time.perf_counter()
+        X, y, groups, artifact = self.load_features()
+        n_splits = min(self.training.cv_folds, len(np.unique(groups)))
+        if n_splits < 2:
+            raise ValueError('Se requieren al menos dos cohortes de ingreso para la validación cruzada')
+
+        search = GridSearchCV(
+            RandomForestClassifier(random_state=self.training.random_state, n_jobs=1),
+            param_grid=self.training.param_grid,
+            scoring=SCORING,
+            refit=self.training.scoring,
+            cv=GroupKFold(n_splits=n_splits),
+            n_jobs=self.training.n_jobs,
+        )
+        logger.info(f'🔍 Búsqueda de hiperparámetros: {n_splits} particiones por cohorte, n_jobs={self.training.n_jobs}')
+        search.fit(X, y, groups=groups)
+
+        best = search.best_index_
+        metrics = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'version': self.config.version,
+            'features_key': self.features_key(),
+            'n_alumnos': int(len(y)),
+            'n_variables': int(X.shape[1]),
+            'tasa_abandono': round(float(y.mean()), 4),
+            'particiones': n_splits,
+            'mejores_parametros': search.best_params_,
+            'metricas_cv': {
+                metric: {'media': round(float(search.cv_results_[f'mean_test_{metric}'][best]), 4),
+                         'desv': round(float(search.cv_results_[f'std_test_{metric}'][best]), 4)}
+                for metric in SCORING
+            },
+            'duracion_seg': None,
+        }
+
+        output_dir = os.path.join(self.training.output_dir, datetime.now().strftime('%Y%m%d_%H%M%S'))
+        os.makedirs(output_dir, exist_ok=True)
+        joblib.dump(search.best_estimator_, os.path.join(output_dir, 'modelo_abandono.joblib'))
+        joblib.dump(artifact, os.path.join(output_dir, 'preparacion.joblib'))
+        FeatureSketch.from_frame(X).save(os.path.join(output_dir, 'linea_base_deriva.json'))
+        metrics['duracion_seg'] = round(time.perf_counter() - start, 1)
+        with open(os.path.join(output_dir, 'metricas.json'), 'w', encoding='utf-8') as f:
+            json.dump(metrics, f, ensure_ascii=False, indent=2, default=str)
+
+        logger.info(f"✅ Modelo entrenado ({self.training.scoring}={metrics['metricas_cv'][self.training.scoring]['media']}) "
+                    f"y guardado en {output_dir}")
+        logger.info("ℹ️ Actualice files['model'], files['prep_artifact'] y files['drift_baseline'] en config.yaml "
+                    "para usarlo en la app")
+        return output_dir
+
+
+if __name__ == "__main__":
+    main_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    config = PreprocessConfig(**load_config(os.path.join(main_path, 'config', 'config.yaml')))
+    # Uno tras otro: la búsqueda de hiperparámetros ya usa los núcleos de `training.n_jobs`
+    for campus, campus_config in config.campus_configs().items():
+        logger.info(f'🏫 Campus {campus}')
+        TrainingPipeline(campus_config).train()
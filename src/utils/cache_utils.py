@@ -0,0 +1,223 @@
+"""
+Caché de resultados de etapas compartida entre réplicas.
+Dos niveles: un LRU en memoria por proceso y un directorio compartido (disco
+local o volumen de red) donde cada resultado se guarda con escritura atómica.
+Un candado de archivo por llave evita que dos réplicas calculen lo mismo a la
+vez, y un contador de generación en el directorio compartido invalida las
+entradas de todas las réplicas al limpiar la caché.
+"""
+import functools
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator
+
+import joblib
+import pandas as pd
+from pydantic import BaseModel
+
+from src.utils.logging_utils import config_logging
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = config_logging()
+
+GENERATION_FILE = 'generacion'
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Candado exclusivo entre procesos sobre `path` (se crea si no existe)."""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_dump(value: Any, path: str) -> None:
+    """Escribe `value` con joblib en un temporal y lo renombra sobre `path`."""
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        joblib.dump(value, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def hash_value(value: Any, digest=None):
+    """Agrega al hash el contenido de un argumento (DataFrames por valores, no por identidad)."""
+    digest = digest or hashlib.sha256()
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr((list(value.columns), [str(t) for t in value.dtypes])).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        digest.update(repr((value.name, str(value.dtype))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, BaseModel):
+        digest.update(value.model_dump_json().encode())
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            hash_value(item, digest)
+    elif isinstance(value, dict):
+        for key in sorted(value, key=str):
+            digest.update(str(key).encode())
+            hash_value(value[key], digest)
+    else:
+        digest.update(pickle.dumps(value))
+    return digest
+
+
+class TieredCache:
+    """Caché en memoria (LRU) respaldada por un directorio compartido.
+
+    Attributes:
+        shared_dir: Directorio compartido por todas las réplicas
+        memory_items: Entradas que conserva el LRU en memoria de cada proceso
+    """
+
+    _instances: Dict[str, 'TieredCache'] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, shared_dir: str, memory_items: int = 8) -> None:
+        self.shared_dir = shared_dir
+        self.memory_items = memory_items
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(shared_dir, exist_ok=True)
+
+    @classmethod
+    def for_path(cls, shared_dir: str, memory_items: int = 8) -> 'TieredCache':
+        """Instancia única por directorio dentro del proceso (sobrevive a las re-ejecuciones de Streamlit)."""
+        with cls._instances_lock:
+            if shared_dir not in cls._instances:
+                cls._instances[shared_dir] = cls(shared_dir, memory_items)
+            return cls._instances[shared_dir]
+
+    def generation(self) -> int:
+        """Generación vigente, compartida por todas las réplicas."""
+        try:
+            with open(os.path.join(self.shared_dir, GENERATION_FILE), 'r') as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Devuelve el valor de `key` desde memoria, desde el directorio compartido o calculándolo.
+
+        Args:
+            key (str): Llave del valor (ya incluye el nombre de la etapa)
+            compute (Callable): Función sin argumentos que calcula el valor
+
+        Returns:
+            Any: Valor cacheado; el objeto en memoria se comparte entre sesiones y no debe modificarse
+        """
+        generation = self.generation()
+        memory_key = (generation, key)
+        with self._lock:
+            if memory_key in self._memory:
+                self._memory.move_to_end(memory_key)
+                return self._memory[memory_key]
+
+        path = os.path.join(self.shared_dir, f'g{generation}', f'{key}.joblib')
+        computed = []
+        def compute_once():
+            computed.append(True)
+            return compute()
+        try:
+            value = self._shared(path, key, compute_once)
+        except OSError as e:
+            # p. ej. otra réplica invalidó la caché y borró la generación mientras se usaba
+            if computed:
+                raise
+            logger.warning(f'⚠️ Caché compartida no disponible ({e}), se calcula sin guardar')
+            value = compute()
+        self._remember(memory_key, value)
+        return value
+
+    def _shared(self, path: str, key: str, compute: Callable[[], Any]) -> Any:
+        """Nivel compartido: lee el archivo o lo calcula y escribe bajo candado."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            logger.info(f'📂 Resultado en caché compartida: {key}')
+            return joblib.load(path)
+        # Una sola réplica calcula; las demás esperan el candado y leen el archivo
+        with file_lock(f'{path}.lock'):
+            if os.path.exists(path):
+                return joblib.load(path)
+            value = compute()
+            try:
+                atomic_dump(value, path)
+            except OSError as e:
+                logger.warning(f'⚠️ No se pudo guardar {key} en la caché compartida: {e}')
+            return value
+
+    def _remember(self, memory_key: tuple, value: Any) -> None:
+        with self._lock:
+            self._memory[memory_key] = value
+            self._memory.move_to_end(memory_key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        """Invalida la caché en todas las réplicas: avanza la generación y borra las anteriores."""
+        with file_lock(os.path.join(self.shared_dir, f'{GENERATION_FILE}.lock')):
+            generation = self.generation() + 1
+            tmp_path = os.path.join(self.shared_dir, f'{GENERATION_FILE}.{uuid.uuid4().hex}.tmp')
+            with open(tmp_path, 'w') as f:
+                f.write(str(generation))
+            os.replace(tmp_path, os.path.join(self.shared_dir, GENERATION_FILE))
+        with self._lock:
+            self._memory.clear()
+        for name in os.listdir(self.shared_dir):
+            if name.startswith('g') and name[1:].isdigit() and int(name[1:]) < generation:
+                shutil.rmtree(os.path.join(self.shared_dir, name), ignore_errors=True)
+        logger.info(f'✅ Caché compartida invalidada (generación {generation})')
+
+    def cached(self, name: str) -> Callable:
+        """Decorador: cachea la función por el contenido de sus argumentos.
+
+        Los argumentos cuyo nombre empieza con '_' no forman parte de la llave
+        (misma convención que `st.cache_data`).
+        """
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                names = func.__code__.co_varnames[:func.__code__.co_argcount]
+                bound = {**dict(zip(names, args)), **kwargs}
+                digest = hash_value({k: v for k, v in bound.items() if not k.startswith('_')})
+                key = f'{name}-{digest.hexdigest()[:24]}'
+                return self.get_or_compute(key, lambda: func(*args, **kwargs))
+            wrapper.clear = self.clear
+            return wrapper
+        return decorator
+
+    @classmethod
+    def cached_by(cls, name: str, shared_dir: Callable[..., str]) -> Callable:
+        """Como `cached`, pero la caché se elige en cada llamada con `shared_dir(*args, **kwargs)`
+        (p. ej. el directorio de la caché de etapas de cada campus)."""
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return cls.for_path(shared_dir(*args, **kwargs)).cached(name)(func)(*args, **kwargs)
+            return wrapper
+        return decorator
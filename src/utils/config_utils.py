@@ -3,10 +3,57 @@ Utilidades para la carga y manejo de configuraciones del proyecto
 """
 import yaml
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List, Literal, Optional
 from pydantic import BaseModel, FilePath
 from pathlib import Path
 
+# Nombre del campus cuando la configuración no define `campuses`
+DEFAULT_CAMPUS = 'general'
+
+class TrainingConfig(BaseModel):
+    """Configuración del reentrenamiento del modelo.
+
+    Attributes:
+        output_dir: Directorio donde se crea una carpeta por entrenamiento con el
+            modelo, el artefacto de preparación y el reporte de métricas
+        cache_dir: Directorio de la caché en disco de la matriz de variables preparada
+        n_jobs: Núcleos usados por la búsqueda de hiperparámetros (-1 = todos)
+        cv_folds: Número de particiones de la validación cruzada agrupada por cohorte
+        scoring: Métrica usada para elegir el mejor modelo
+        random_state: Semilla para reproducibilidad
+        param_grid: Rejilla de hiperparámetros del RandomForestClassifier
+    """
+    output_dir: str = './src/models/'
+    cache_dir: str = './data/processed/cache/'
+    n_jobs: int = -1
+    cv_folds: int = 5
+    scoring: str = 'f1'
+    random_state: int = 42
+    param_grid: Dict[str, List[Any]] = {'n_estimators': [200], 'max_depth': [None]}
+
+class CampusConfig(BaseModel):
+    """Particiones de datos y modelo de un campus.
+
+    Attributes:
+        input_path: Directorio con los archivos de entrada del campus
+        output_path: Directorio de los archivos procesados, cachés y resultados del campus
+        files: Rutas propias del campus (p. ej. 'model', 'prep_artifact',
+            'drift_baseline'); reemplazan a las de `files` general
+        models: Modelos candidatos del campus; por defecto su `files['model']`
+    """
+    input_path: str
+    output_path: str
+    files: Dict[str, str] = {}
+    models: Optional[Dict[str, str]] = None
+
+def _rebase(path: str, old_root: str, new_root: str) -> Optional[str]:
+    """Traslada `path` de `old_root` a `new_root`; None si `path` no está dentro de `old_root`."""
+    relative = os.path.relpath(os.path.normpath(path), os.path.normpath(old_root))
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        return None
+    # Se conserva la diagonal final de los directorios ('./data/processed/cache/')
+    return os.path.join(new_root, relative) + ('/' if path.endswith('/') else '')
+
 class PreprocessConfig(BaseModel):
     """Configuración para el preprocesamiento de datos.
     
@@ -14,11 +61,64 @@ class PreprocessConfig(BaseModel):
         input_path: Directorio que contiene los archivos de entrada
         output_path: Directorio donde se guardarán los archivos procesados
         files: Configuración de los archivos de entrada
+        models: Modelos candidatos para el análisis comparativo (nombre -> ruta)
+        training: Configuración del reentrenamiento
+        backend: Motor del preprocesamiento: 'pandas' (paso a paso) o 'polars'
+            (un solo plan diferido, mismo resultado)
+        source: Origen de las tablas del SIS: 'csv' (archivos de `files`) o
+            'warehouse' (almacén SQLite `files['warehouse']`, con cargas por upsert)
+        campuses: Campus atendidos por la instancia (nombre -> particiones y modelo);
+            None para un solo campus con las rutas generales
+        campus: Campus al que corresponde la configuración (ver `for_campus`)
     """
     input_path: str
     output_path: str
     version: str
     files: Dict[str, str]
+    backend: Literal['pandas', 'polars'] = 'pandas'
+    source: Literal['csv', 'warehouse'] = 'csv'
+    models: Optional[Dict[str, str]] = None
+    training: Optional[TrainingConfig] = None
+    campuses: Optional[Dict[str, CampusConfig]] = None
+    campus: Optional[str] = None
+
+    def for_campus(self, name: str) -> 'PreprocessConfig':
+        """Configuración de un solo campus.
+
+        Las rutas de `files` dentro de `input_path` u `output_path` se trasladan
+        a las particiones del campus (entradas, almacén, cachés, historial y
+        resultados quedan separados por campus); las demás (imágenes, acceso,
+        modelo general) se comparten salvo que el campus las reemplace en su `files`.
+
+        Raises:
+            KeyError: Si el campus no está en `campuses`.
+        """
+        if not self.campuses or name not in self.campuses:
+            raise KeyError(f'El campus {name} no está configurado')
+        campus = self.campuses[name]
+
+        def rebase(path: str) -> str:
+            return (_rebase(path, self.input_path, campus.input_path)
+                    or _rebase(path, self.output_path, campus.output_path) or path)
+
+        files = {key: rebase(path) for key, path in self.files.items()}
+        files.update(campus.files)
+        models = campus.models or ({'abandono': files['model']} if 'model' in campus.files else self.models)
+        training = None
+        if self.training is not None:
+            training = self.training.model_copy(update={
+                'output_dir': os.path.join(self.training.output_dir, name) + '/',
+                'cache_dir': rebase(self.training.cache_dir)})
+        return self.model_copy(update={'input_path': campus.input_path, 'output_path': campus.output_path,
+                                       'files': files, 'models': models, 'training': training,
+                                       'campuses': None, 'campus': name})
+
+    def campus_configs(self) -> Dict[str, 'PreprocessConfig']:
+        """Configuración de cada campus; sin `campuses`, un solo campus con las rutas generales."""
+        if not self.campuses:
+            name = self.campus or DEFAULT_CAMPUS
+            return {name: self.model_copy(update={'campus': name})}
+        return {name: self.for_campus(name) for name in self.campuses}
 
 def load_config(config_path: str) -> Dict[str, Any]:
     """Carga la configuración desde un archivo YAML.
@@ -0,0 +1,283 @@
+"""
+Ejecutor de etapas como grafo de dependencias (DAG).
+Cada etapa declara los valores que recibe y los que produce; las etapas cuyas
+entradas ya están disponibles se ejecutan en paralelo en un pool de hilos, de
+modo que la latencia total tiende a la cadena de dependencias más larga y no a
+la suma de las etapas. Las etapas con `memo_key` (p. ej. la huella de un
+archivo) guardan su resultado en memoria del proceso y se reutilizan mientras
+la llave no cambie; la memoria está acotada por número de resultados y por
+bytes (`MEMO_MAX_BYTES`) y se libera con `clear_memo`. Al terminar se registra
+un reporte de tiempos con la ruta crítica.
+"""
+import functools
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from src.utils.logging_utils import config_logging
+from src.utils.metrics_utils import metrics
+
+logger = config_logging()
+
+# Resultados memorizados por (etapa, memo_key) en el proceso; un preprocesamiento
+# memoriza hasta 7 tablas, así que alcanza para varios campus sin desalojarse.
+# Además del número de resultados se acota su tamaño: se desalojan los menos
+# recientes al rebasar MEMO_MAX_BYTES, y un resultado mayor no se memoriza
+MEMO_ITEMS = 32
+MEMO_MAX_BYTES = 256 * 2**20
+_memo: OrderedDict = OrderedDict()
+_memo_sizes: Dict[tuple, int] = {}
+_memo_lock = threading.Lock()
+
+
+def file_fingerprint(path: str) -> str:
+    """Llave de memorización de un archivo: ruta, tamaño y fecha de modificación."""
+    stat = os.stat(path)
+    return f'{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}'
+
+
+@functools.lru_cache(maxsize=256)
+def _digest(fingerprint: str) -> str:
+    path = fingerprint.rsplit('|', 2)[0]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 del contenido de un archivo; se calcula una sola vez por `file_fingerprint`."""
+    return _digest(file_fingerprint(path))
+
+
+def clear_memo() -> None:
+    """Olvida todos los resultados memorizados."""
+    with _memo_lock:
+        _memo.clear()
+        _memo_sizes.clear()
+
+
+def memo_bytes() -> int:
+    """Bytes ocupados por los resultados memorizados."""
+    with _memo_lock:
+        return sum(_memo_sizes.values())
+
+
+def _sizeof(value: Any) -> int:
+    """Tamaño aproximado de un resultado (DataFrames con el contenido de sus columnas de texto)."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(index=True, deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, (tuple, list)):
+        return sum(_sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_sizeof(item) for item in value.values())
+    return int(getattr(value, 'nbytes', sys.getsizeof(value)))
+
+
+def _memoize(key: tuple, result: Any) -> None:
+    """Guarda un resultado y desaloja los menos recientes hasta cumplir MEMO_ITEMS y MEMO_MAX_BYTES."""
+    size = _sizeof(result)
+    if size > MEMO_MAX_BYTES:
+        return
+    with _memo_lock:
+        _memo[key] = result
+        _memo.move_to_end(key)
+        _memo_sizes[key] = size
+        while len(_memo) > MEMO_ITEMS or sum(_memo_sizes.values()) > MEMO_MAX_BYTES:
+            old, _ = _memo.popitem(last=False)
+            _memo_sizes.pop(old, None)
+
+
+class Stage:
+    """Etapa del grafo.
+
+    Attributes:
+        name: Nombre de la etapa (aparece en el reporte de tiempos)
+        func: Función que recibe los valores de `inputs` en ese orden
+        inputs: Nombres de los valores que consume
+        outputs: Nombres de los valores que produce; con más de uno la función devuelve una tupla
+        memo_key: Llave de memorización (None = siempre se ejecuta)
+    """
+
+    def __init__(self, name: str, func: Callable, inputs: Sequence[str] = (),
+                 outputs: Optional[Sequence[str]] = None, memo_key: Optional[str] = None) -> None:
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs) if outputs is not None else (name,)
+        self.memo_key = memo_key
+
+
+class StageGraph:
+    """Grafo de etapas con ejecución concurrente y reporte de la ruta crítica.
+
+    Attributes:
+        name: Nombre del grafo (prefijo de las métricas 'etapa_seg')
+        stages: Etapas por nombre
+        report: Reporte de tiempos de la última ejecución (ver `run`)
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.stages: Dict[str, Stage] = {}
+        self._producers: Dict[str, Stage] = {}
+        self.report: Optional[pd.DataFrame] = None
+
+    def add(self, name: str, func: Callable, inputs: Sequence[str] = (),
+            outputs: Optional[Sequence[str]] = None, memo_key: Optional[str] = None) -> None:
+        """Agrega una etapa (ver `Stage`).
+
+        Raises:
+            ValueError: Si la etapa o alguno de sus valores ya existe en el grafo.
+        """
+        stage = Stage(name, func, inputs, outputs, memo_key)
+        if name in self.stages:
+            raise ValueError(f'La etapa {name} ya existe en el grafo {self.name}')
+        for output in stage.outputs:
+            if output in self._producers:
+                raise ValueError(f'El valor {output} ya lo produce la etapa {self._producers[output].name}')
+        self.stages[name] = stage
+        for output in stage.outputs:
+            self._producers[output] = stage
+
+    def _required(self, targets: Sequence[str]) -> List[Stage]:
+        """Etapas necesarias para producir `targets`, validando que el grafo no tenga ciclos."""
+        required: Dict[str, Stage] = {}
+        visiting = set()
+
+        def visit(value: str) -> None:
+            if value not in self._producers:
+                raise ValueError(f'Ninguna etapa del grafo {self.name} produce {value}')
+            stage = self._producers[value]
+            if stage.name in required:
+                return
+            if stage.name in visiting:
+                raise ValueError(f'El grafo {self.name} tiene un ciclo en la etapa {stage.name}')
+            visiting.add(stage.name)
+            for dep in stage.inputs:
+                visit(dep)
+            visiting.discard(stage.name)
+            required[stage.name] = stage
+
+        for target in targets:
+            visit(target)
+        return list(required.values())
+
+    def run(self, targets: Sequence[str], max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """Ejecuta las etapas necesarias para `targets`.
+
+        Args:
+            targets (Sequence[str]): Valores a obtener
+            max_workers (Optional[int]): Hilos del pool; por defecto uno por etapa
+
+        Returns:
+            Dict[str, Any]: Valor de cada elemento de `targets`
+
+        Raises:
+            Exception: La primera excepción de una etapa; las etapas pendientes se cancelan.
+            ValueError: Si una etapa devuelve un número de valores distinto de sus `outputs`.
+            RuntimeError: Si quedan etapas pendientes sin ninguna lista ni en ejecución.
+        """
+        stages = self._required(targets)
+        values: Dict[str, Any] = {}
+        timings: Dict[str, dict] = {}
+        pending = {stage.name: stage for stage in stages}
+        running = {}
+        start = time.perf_counter()
+
+        def execute(stage: Stage) -> tuple:
+            began = time.perf_counter()
+            result = stage.func(*(values[dep] for dep in stage.inputs))
+            return result, began, time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(stages), thread_name_prefix=f'dag-{self.name}') as pool:
+            try:
+                while pending or running:
+                    for name, stage in list(pending.items()):
+                        if not all(dep in values for dep in stage.inputs):
+                            continue
+                        del pending[name]
+                        memo = (stage.name, stage.memo_key)
+                        with _memo_lock:
+                            hit = stage.memo_key is not None and memo in _memo
+                            if hit:
+                                _memo.move_to_end(memo)
+                                result = _memo[memo]
+                        if hit:
+                            now = time.perf_counter()
+                            self._store(stage, result, values)
+                            timings[name] = {'inicio': now - start, 'fin': now - start, 'memo': True}
+                        else:
+                            running[pool.submit(execute, stage)] = stage
+                    if not running:
+                        if pending:
+                            missing = {dep for stage in pending.values() for dep in stage.inputs if dep not in values}
+                            raise RuntimeError(f'El grafo {self.name} no puede continuar: {list(pending)} '
+                                               f'esperan valores que no se produjeron: {sorted(missing)}')
+                        continue
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage = running.pop(future)
+                        result, began, ended = future.result()
+                        self._store(stage, result, values)
+                        timings[stage.name] = {'inicio': began - start, 'fin': ended - start, 'memo': False}
+                        if stage.memo_key is not None:
+                            _memoize((stage.name, stage.memo_key), result)
+            except Exception:
+                for future in running:
+                    future.cancel()
+                raise
+        self.report = self._timing_report(stages, timings, time.perf_counter() - start)
+        return {target: values[target] for target in targets}
+
+    @staticmethod
+    def _store(stage: Stage, result: Any, values: Dict[str, Any]) -> None:
+        """Asigna el resultado de una etapa a sus `outputs`.
+
+        Raises:
+            ValueError: Si la etapa devuelve un número de valores distinto de sus `outputs`.
+        """
+        if len(stage.outputs) == 1:
+            values[stage.outputs[0]] = result
+            return
+        if not isinstance(result, (tuple, list)) or len(result) != len(stage.outputs):
+            count = len(result) if isinstance(result, (tuple, list)) else 1
+            raise ValueError(f'La etapa {stage.name} devolvió {count} valores; se esperaban '
+                             f'{len(stage.outputs)}: {list(stage.outputs)}')
+        values.update(zip(stage.outputs, result))
+
+    def _timing_report(self, stages: List[Stage], timings: Dict[str, dict], wall: float) -> pd.DataFrame:
+        """Tiempos por etapa y ruta crítica: la cadena de dependencias con mayor duración acumulada."""
+        duration = {name: t['fin'] - t['inicio'] for name, t in timings.items()}
+        finish, previous = {}, {}
+        for stage in stages:  # `stages` ya está en orden topológico
+            deps = [self._producers[dep].name for dep in stage.inputs]
+            slowest = max(deps, key=lambda dep: finish[dep], default=None)
+            finish[stage.name] = duration[stage.name] + (finish[slowest] if slowest else 0.0)
+            previous[stage.name] = slowest
+        last = max(finish, key=finish.get)
+        path = []
+        while last is not None:
+            path.append(last)
+            last = previous[last]
+        path.reverse()
+
+        report = pd.DataFrame([{'etapa': stage.name, 'inicio': timings[stage.name]['inicio'],
+                                'fin': timings[stage.name]['fin'], 'duracion': duration[stage.name],
+                                'memo': timings[stage.name]['memo'], 'ruta_critica': stage.name in path}
+                               for stage in stages]).round({'inicio': 3, 'fin': 3, 'duracion': 3})
+        for name, seconds in duration.items():
+            metrics.set('etapa_seg', round(seconds, 4), label=f'{self.name}.{name}')
+        critical = sum(duration[name] for name in path)
+        logger.info(f'✅ {self.name}: {wall:.2f} s (suma de etapas {sum(duration.values()):.2f} s, '
+                    f'ruta crítica {critical:.2f} s: {" → ".join(path)})')
+        return report
@@ -0,0 +1,210 @@
+"""
+Monitor de deriva de las variables de entrada del modelo.
+Resume la salida de DataPreparationPipeline en una sola pasada por bloques de
+filas: un histograma de bins fijos por variable numérica (ya normalizada con los
+rangos del entrenamiento, por lo que los bins son los mismos en cualquier corrida
+y los resúmenes se pueden sumar) y una tabla de frecuencias por variable
+categórica, reconstruida de sus dummies. La línea base se calcula al entrenar y
+cada corrida se compara contra ella con PSI y KS.
+"""
+import json
+import os
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.utils.logging_utils import config_logging
+from src.utils.metrics_utils import metrics
+
+logger = config_logging()
+
+# Bins en [0, 1] más un bin por debajo y otro por encima del rango del entrenamiento
+N_BINS = 20
+# Filas por bloque en la pasada de resumen
+SKETCH_CHUNK = 65_536
+# Umbrales habituales de PSI: < 0.1 estable, 0.1-0.25 moderada, > 0.25 significativa
+PSI_WARN = 0.1
+PSI_ALERT = 0.25
+# Proporción mínima al calcular PSI (evita log(0) en bins vacíos)
+PSI_EPS = 1e-4
+# Categoría omitida por la codificación one-hot (fila sin ninguna dummy de la variable)
+BASE_CATEGORY = '(base)'
+
+
+class FeatureSketch:
+    """Resumen compacto de una matriz preparada, acumulable por bloques.
+
+    Attributes:
+        n_rows: Filas resumidas
+        numeric: Variable -> {'hist': conteos por bin, 'nulos', 'suma'}
+        categorical: Variable -> {categoría: conteo}; las dummies 'variable>categoría'
+            se agrupan por variable y BASE_CATEGORY cuenta las filas sin dummy activa
+    """
+
+    def __init__(self) -> None:
+        self.n_rows = 0
+        self.numeric: Dict[str, dict] = {}
+        self.categorical: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, chunk_rows: int = SKETCH_CHUNK) -> 'FeatureSketch':
+        """Resume un DataFrame preparado en una pasada por bloques de filas."""
+        sketch = cls()
+        for start in range(0, len(df), chunk_rows):
+            sketch.update(df.iloc[start:start + chunk_rows])
+        return sketch
+
+    def update(self, block: pd.DataFrame) -> None:
+        """Agrega un bloque de filas al resumen.
+
+        Args:
+            block (pd.DataFrame): Filas de la salida de DataPreparationPipeline; las
+                columnas con '>' son dummies y las demás variables numéricas en [0, 1]
+        """
+        dummy_cols = [col for col in block.columns if '>' in col]
+        numeric_cols = [col for col in block.columns if '>' not in col]
+        n = len(block)
+        self.n_rows += n
+        # Columna por columna: cada bloque es una vista de la columna, sin copiar el DataFrame
+        for col in numeric_cols:
+            values = block[col].to_numpy(dtype=np.float32, na_value=np.nan)
+            valid = values[~np.isnan(values)]
+            # bin 0: < 0, bins 1..N_BINS: [0, 1], bin N_BINS+1: > 1
+            bins = np.floor(np.clip(valid * N_BINS, -1, N_BINS + 1)) + 1
+            bins[valid == 1.0] = N_BINS
+            entry = self.numeric.setdefault(col, {'hist': np.zeros(N_BINS + 2, dtype=np.int64), 'nulos': 0, 'suma': 0.0})
+            entry['hist'] = entry['hist'] + np.bincount(bins.astype(np.intp), minlength=N_BINS + 2)
+            entry['nulos'] += len(values) - len(valid)
+            entry['suma'] += float(valid.sum(dtype=np.float64))
+        # Cada fila activa a lo más una dummy de la variable: las demás son de la categoría omitida
+        for var in dict.fromkeys(col.split('>', 1)[0] for col in dummy_cols):
+            freq = self.categorical.setdefault(var, {})
+            freq[BASE_CATEGORY] = freq.get(BASE_CATEGORY, 0) + n
+        for col in dummy_cols:
+            var, category = col.split('>', 1)
+            freq = self.categorical[var]
+            total = int(np.add.reduce(block[col].to_numpy(), dtype=np.int64))
+            freq[category] = freq.get(category, 0) + total
+            freq[BASE_CATEGORY] -= total
+
+    def to_dict(self) -> dict:
+        numeric = {col: {**entry, 'hist': [int(v) for v in entry['hist']]} for col, entry in self.numeric.items()}
+        return {'n_rows': self.n_rows, 'n_bins': N_BINS, 'numeric': numeric, 'categorical': self.categorical}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'FeatureSketch':
+        if data.get('n_bins') != N_BINS:
+            raise ValueError(f"La línea base usa {data.get('n_bins')} bins y el monitor {N_BINS}")
+        sketch = cls()
+        sketch.n_rows = data['n_rows']
+        sketch.numeric = {col: {**entry, 'hist': np.asarray(entry['hist'], dtype=np.int64)}
+                          for col, entry in data['numeric'].items()}
+        sketch.categorical = data['categorical']
+        return sketch
+
+    def save(self, path: str) -> None:
+        """Guarda el resumen como JSON (unos cuantos KB)."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> 'FeatureSketch':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Índice de estabilidad poblacional entre dos vectores de conteos."""
+    e = np.maximum(expected / max(expected.sum(), 1), PSI_EPS)
+    a = np.maximum(actual / max(actual.sum(), 1), PSI_EPS)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def ks(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Estadístico KS aproximado: máxima diferencia entre las distribuciones acumuladas en los bordes de los bins."""
+    e = np.cumsum(expected) / max(expected.sum(), 1)
+    a = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.max(np.abs(a - e))) if len(e) else 0.0
+
+
+def drift_status(value: float) -> str:
+    if value > PSI_ALERT:
+        return 'significativa'
+    if value > PSI_WARN:
+        return 'moderada'
+    return 'estable'
+
+
+def compare_sketches(baseline: FeatureSketch, current: FeatureSketch) -> pd.DataFrame:
+    """Compara cada variable de la corrida contra la línea base.
+
+    Args:
+        baseline (FeatureSketch): Resumen de la matriz de entrenamiento
+        current (FeatureSketch): Resumen de la corrida actual
+
+    Returns:
+        pd.DataFrame: Una fila por variable, ordenadas por PSI descendente, con
+            'variable', 'tipo', 'psi', 'ks' (solo numéricas), 'media_base',
+            'media_actual' (en la escala normalizada), 'fuera_de_rango' (% de la
+            corrida fuera del rango del entrenamiento; en categóricas, % de
+            categorías no vistas en la línea base) y 'estado'.
+    """
+    rows = []
+    for col, base in baseline.numeric.items():
+        cur = current.numeric.get(col)
+        if cur is None:
+            continue
+        e, a = np.asarray(base['hist'], dtype=np.float64), np.asarray(cur['hist'], dtype=np.float64)
+        outside = (a[0] + a[-1]) / max(a.sum(), 1)
+        rows.append({'variable': col, 'tipo': 'numérica', 'psi': psi(e, a), 'ks': ks(e, a),
+                     'media_base': base['suma'] / max(e.sum(), 1), 'media_actual': cur['suma'] / max(a.sum(), 1),
+                     'fuera_de_rango': outside * 100})
+    for var, base in baseline.categorical.items():
+        cur = current.categorical.get(var)
+        if cur is None:
+            continue
+        categories = list(dict.fromkeys([*base, *cur]))
+        e = np.array([base.get(c, 0) for c in categories], dtype=np.float64)
+        a = np.array([cur.get(c, 0) for c in categories], dtype=np.float64)
+        unseen = sum(cur[c] for c in cur if c not in base) / max(a.sum(), 1)
+        rows.append({'variable': var, 'tipo': 'categórica', 'psi': psi(e, a), 'ks': np.nan,
+                     'media_base': np.nan, 'media_actual': np.nan, 'fuera_de_rango': unseen * 100})
+    columns = ['variable', 'tipo', 'psi', 'ks', 'media_base', 'media_actual', 'fuera_de_rango', 'estado']
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    df_report = pd.DataFrame(rows)
+    df_report['estado'] = df_report['psi'].map(drift_status)
+    df_report = df_report.sort_values('psi', ascending=False, ignore_index=True)
+    return df_report[columns].round({'psi': 4, 'ks': 4, 'media_base': 4, 'media_actual': 4, 'fuera_de_rango': 2})
+
+
+def check_drift(df_prepared: pd.DataFrame, baseline_path: Optional[str]) -> Optional[pd.DataFrame]:
+    """Resume la corrida, la compara con la línea base y publica el resultado en métricas y logs.
+
+    Args:
+        df_prepared (pd.DataFrame): Salida de DataPreparationPipeline
+        baseline_path (Optional[str]): Ruta de la línea base (JSON) guardada al entrenar
+
+    Returns:
+        Optional[pd.DataFrame]: Reporte de `compare_sketches`; None si no hay línea base
+    """
+    if not baseline_path or not os.path.exists(baseline_path):
+        logger.info('ℹ️ Sin línea base de deriva, se omite el monitoreo')
+        return None
+    logger.info('🔍 Comparando la distribución de las variables con la línea base del entrenamiento')
+    df_report = compare_sketches(FeatureSketch.load(baseline_path), FeatureSketch.from_frame(df_prepared))
+    metrics.reset('deriva_psi')
+    metrics.reset('deriva_ks')
+    for row in df_report.itertuples(index=False):
+        metrics.set('deriva_psi', row.psi, label=row.variable)
+        if not np.isnan(row.ks):
+            metrics.set('deriva_ks', row.ks, label=row.variable)
+    drifted = df_report[df_report['estado'] != 'estable']
+    if drifted.empty:
+        logger.info(f'✅ Sin deriva en {len(df_report)} variables')
+    else:
+        detail = ', '.join(f'{r.variable} (PSI={r.psi:.2f})' for r in drifted.itertuples(index=False))
+        logger.warning(f'⚠️ Deriva en {len(drifted)} variables: {detail}')
+    return df_report
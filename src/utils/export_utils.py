@@ -0,0 +1,119 @@
+"""
+Exportación de resultados bajo demanda.
+Los archivos se generan por bloques directamente a un archivo temporal en CSV,
+Parquet o XLSX, de modo que exportar no requiere una copia completa del
+DataFrame ni del archivo en memoria.
+"""
+import os
+import tempfile
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from src.utils.logging_utils import config_logging
+
+logger = config_logging()
+
+# formato -> (extensión, tipo MIME)
+EXPORT_FORMATS: Dict[str, tuple[str, str]] = {
+    'csv': ('.csv', 'text/csv'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'xlsx': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+CSV_ENCODINGS = {'UTF-8 (Excel)': 'utf-8-sig', 'Latin-1': 'latin-1'}
+EXCEL_MAX_ROWS = 1_048_576
+
+
+def export_results(
+    df: pd.DataFrame,
+    fmt: str,
+    encoding: str = 'utf-8-sig',
+    chunk_size: int = 50_000,
+    include_explanations: bool = True,
+    enrich_chunk: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None
+) -> str:
+    """Escribe los resultados a un archivo temporal en el formato indicado.
+
+    Args:
+        df (pd.DataFrame): Resultados de la corrida
+        fmt (str): 'csv', 'parquet' o 'xlsx'
+        encoding (str): Codificación del CSV ('utf-8-sig' agrega BOM para Excel;
+            con 'latin-1' los caracteres no representables se reemplazan por '?')
+        chunk_size (int): Filas escritas por bloque
+        include_explanations (bool): Si se incluyen las columnas 'Factor n'
+        enrich_chunk (Optional[Callable]): Función que agrega columnas a cada bloque
+            (por ejemplo, el historial del alumno) antes de escribirlo
+
+    Returns:
+        str: Ruta del archivo temporal generado; el llamador decide cuándo borrarlo
+
+    Raises:
+        ValueError: Si el formato no está soportado o excede los límites de Excel
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'Formato de exportación no soportado: {fmt}')
+    if fmt == 'xlsx' and len(df) >= EXCEL_MAX_ROWS:
+        raise ValueError(f'XLSX admite como máximo {EXCEL_MAX_ROWS - 1} filas; use CSV o Parquet')
+    if not include_explanations:
+        df = df.drop(columns=[col for col in df.columns if col.startswith('Factor ')])
+
+    suffix = EXPORT_FORMATS[fmt][0]
+    fd, path = tempfile.mkstemp(prefix='edutrack_export_', suffix=suffix)
+    os.close(fd)
+    logger.info(f'🔄 Exportando {len(df)} filas a {fmt} en {path}')
+
+    def chunks():
+        for start in range(0, max(len(df), 1), chunk_size):
+            chunk = df.iloc[start:start + chunk_size]
+            yield enrich_chunk(chunk) if enrich_chunk is not None else chunk
+
+    try:
+        if fmt == 'csv':
+            _write_csv(chunks(), path, encoding)
+        elif fmt == 'parquet':
+            _write_parquet(chunks(), path)
+        else:
+            _write_xlsx(chunks(), path)
+    except Exception as e:
+        os.remove(path)
+        logger.error(f'❌ Error al exportar resultados: {str(e)}')
+        raise
+    logger.info(f'✅ Exportación terminada: {os.path.getsize(path)} bytes')
+    return path
+
+
+def _write_csv(chunks, path: str, encoding: str) -> None:
+    with open(path, 'w', encoding=encoding, errors='replace', newline='') as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, header=(i == 0), index=False)
+
+
+def _write_parquet(chunks, path: str) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False,
+                                         schema=writer.schema if writer else None)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_xlsx(chunks, path: str) -> None:
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Predicciones')
+    for i, chunk in enumerate(chunks):
+        if i == 0:
+            ws.append([str(col) for col in chunk.columns])
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            ws.append(row)
+    wb.save(path)
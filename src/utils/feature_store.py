@@ -0,0 +1,146 @@
+"""
+Almacén en disco de la matriz de variables preparada.
+La salida de DataPreparationPipeline se guarda como un arreglo float32 contiguo
+(.npy) acompañado de un índice número de control -> fila y de un manifiesto de
+columnas. Al abrirlo se mapea en memoria sin copiar, de modo que varios
+procesos o réplicas comparten las mismas páginas del sistema operativo.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.utils.logging_utils import config_logging
+
+logger = config_logging()
+
+MATRIX_FILE = 'features.npy'
+INDEX_FILE = 'index.npy'
+MANIFEST_FILE = 'manifest.json'
+
+
+class FeatureStore:
+    """Matriz de variables float32 mapeada en memoria.
+
+    Attributes:
+        path: Directorio del almacén
+        manifest: Columnas, dimensiones y fecha de creación de la matriz
+    """
+
+    def __init__(self, path: str) -> None:
+        """Abre un almacén existente.
+
+        Args:
+            path (str): Directorio creado previamente con `FeatureStore.write`.
+
+        Raises:
+            FileNotFoundError: Si el directorio no contiene un almacén completo.
+        """
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self._matrix = None
+        self._index = None
+
+    @staticmethod
+    def key_for(df_prepared: pd.DataFrame) -> str:
+        """Llave de contenido de una matriz preparada (columnas y valores)."""
+        digest = hashlib.sha256('|'.join(map(str, df_prepared.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(df_prepared, index=False).to_numpy().tobytes())
+        return digest.hexdigest()[:16]
+
+    @classmethod
+    def write(cls, path: str, df_prepared: pd.DataFrame, controls: Sequence[str],
+              block_size: int = 65_536) -> 'FeatureStore':
+        """Escribe la matriz preparada, su índice y su manifiesto.
+
+        La matriz se copia por bloques de filas directamente al archivo, sin
+        construir una copia float32 completa en memoria. El manifiesto se escribe
+        al final, así que un lector nunca ve un almacén a medio escribir.
+
+        Args:
+            path (str): Directorio destino
+            df_prepared (pd.DataFrame): Salida de DataPreparationPipeline
+            controls (Sequence[str]): Número de control de cada fila, en el mismo orden
+            block_size (int): Filas copiadas por bloque
+
+        Returns:
+            FeatureStore: Almacén recién escrito, abierto en modo lectura
+        """
+        if len(controls) != len(df_prepared):
+            raise ValueError('El índice de números de control no coincide con el número de filas')
+        os.makedirs(path, exist_ok=True)
+        n_rows, n_cols = df_prepared.shape
+        logger.info(f'🔄 Escribiendo almacén de variables ({n_rows}x{n_cols}) en {path}')
+
+        tmp_matrix = os.path.join(path, f'.{MATRIX_FILE}.tmp')
+        matrix = np.lib.format.open_memmap(tmp_matrix, mode='w+', dtype=np.float32, shape=(n_rows, n_cols))
+        for start in range(0, n_rows, block_size):
+            matrix[start:start + block_size] = df_prepared.iloc[start:start + block_size].to_numpy(dtype=np.float32)
+        matrix.flush()
+        del matrix
+        os.replace(tmp_matrix, os.path.join(path, MATRIX_FILE))
+
+        tmp_index = os.path.join(path, f'.{INDEX_FILE}.tmp')
+        with open(tmp_index, 'wb') as f:
+            np.save(f, np.asarray(pd.Series(controls).astype(str), dtype=str))
+        os.replace(tmp_index, os.path.join(path, INDEX_FILE))
+
+        manifest = {
+            'columns': [str(col) for col in df_prepared.columns],
+            'n_rows': n_rows,
+            'dtype': 'float32',
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        tmp_manifest = os.path.join(path, f'.{MANIFEST_FILE}.tmp')
+        with open(tmp_manifest, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_manifest, os.path.join(path, MANIFEST_FILE))
+        logger.info('✅ Almacén de variables escrito')
+        return cls(path)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """Indica si el directorio contiene un almacén completo."""
+        return os.path.exists(os.path.join(path, MANIFEST_FILE))
+
+    @property
+    def columns(self) -> list:
+        return self.manifest['columns']
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Matriz (filas x columnas) float32 mapeada en memoria, solo lectura."""
+        if self._matrix is None:
+            self._matrix = np.load(os.path.join(self.path, MATRIX_FILE), mmap_mode='r')
+        return self._matrix
+
+    @property
+    def index(self) -> pd.Index:
+        """Números de control en el orden de las filas."""
+        if self._index is None:
+            self._index = pd.Index(np.load(os.path.join(self.path, INDEX_FILE)), name='# Control')
+        return self._index
+
+    def rows(self, controls: Sequence[str]) -> np.ndarray:
+        """Desplazamientos de fila de los números de control dados (-1 si no existen)."""
+        return self.index.get_indexer(pd.Index(controls).astype(str))
+
+    def to_frame(self, controls: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """DataFrame sobre la matriz mapeada.
+
+        Args:
+            controls (Optional[Sequence[str]]): Si se indica, solo esas filas (copia pequeña);
+                si es None, toda la matriz sin copiar.
+
+        Returns:
+            pd.DataFrame: Variables con las columnas del manifiesto
+        """
+        if controls is None:
+            return pd.DataFrame(self.matrix, columns=self.columns, copy=False)
+        rows = self.rows(controls)
+        return pd.DataFrame(self.matrix[rows[rows >= 0]], columns=self.columns)
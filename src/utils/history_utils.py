@@ -0,0 +1,163 @@
+"""
+Historial local de predicciones respaldado por SQLite.
+Cada corrida de Predictionpipeline se registra con su identificador, versión del
+modelo, etiqueta y probabilidad por alumno, con índices para consultar por
+alumno, cohorte (period_ingreso) y carrera (cve_carrera).
+"""
+import os
+import sqlite3
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional
+
+import pandas as pd
+
+from src.utils.logging_utils import config_logging
+
+logger = config_logging()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id        TEXT PRIMARY KEY,
+    created_at    TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    n_students    INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    control        TEXT NOT NULL,
+    run_id         TEXT NOT NULL REFERENCES runs(run_id),
+    period_ingreso INTEGER,
+    cve_carrera    TEXT,
+    prediccion     TEXT,
+    probabilidad   REAL,
+    prob_abandono  REAL,
+    PRIMARY KEY (control, run_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_predictions_run ON predictions(run_id);
+CREATE INDEX IF NOT EXISTS idx_predictions_cohort ON predictions(period_ingreso, run_id);
+CREATE INDEX IF NOT EXISTS idx_predictions_career ON predictions(cve_carrera, run_id);
+"""
+
+_SELECT = """
+SELECT p.control AS "# Control", p.run_id, r.created_at, r.model_version,
+       p.period_ingreso, p.cve_carrera, p.prediccion AS "Prediccion",
+       p.probabilidad AS "Probabilidad", p.prob_abandono
+FROM predictions p JOIN runs r ON r.run_id = p.run_id
+"""
+
+
+class PredictionHistoryStore:
+    """Almacén de historial de predicciones en un archivo SQLite local.
+
+    Attributes:
+        db_path: Ruta al archivo SQLite donde se guarda el historial
+    """
+
+    def __init__(self, db_path: str) -> None:
+        """Crea (si no existe) la base de datos y sus índices.
+
+        Args:
+            db_path (str): Ruta al archivo SQLite del historial.
+        """
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Abre una conexión por operación; SQLite serializa a los escritores."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record_run(self, df_results: pd.DataFrame, model_version: str,
+                   run_id: Optional[str] = None) -> str:
+        """Registra todas las predicciones de una corrida.
+
+        Args:
+            df_results (pd.DataFrame): Resultados con columnas '# Control',
+                'Prediccion', 'Probabilidad', 'period_ingreso' y 'cve_carrera'.
+            model_version (str): Identificador de la versión del modelo usado.
+            run_id (Optional[str]): Identificador de la corrida; se genera uno si es None.
+
+        Returns:
+            str: Identificador de la corrida registrada.
+        """
+        run_id = run_id or f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        logger.info(f'🔄 Registrando corrida {run_id} en el historial de predicciones')
+        proba = df_results['Probabilidad'].astype(float)
+        # 'Probabilidad' es la confianza de la etiqueta; se guarda también el riesgo de abandono
+        prob_abandono = proba.where(df_results['Prediccion'] == 'Abandono', 100 - proba)
+        records = pd.DataFrame({
+            'control': df_results['# Control'].astype(str),
+            'run_id': run_id,
+            'period_ingreso': pd.to_numeric(df_results['period_ingreso'], errors='coerce').astype('Int64'),
+            'cve_carrera': df_results['cve_carrera'].astype('string'),
+            'prediccion': df_results['Prediccion'].astype('string'),
+            'probabilidad': proba,
+            'prob_abandono': prob_abandono,
+        })
+        rows = records.astype(object).where(records.notna(), None).itertuples(index=False, name=None)
+        with self._connect() as conn:
+            conn.execute('INSERT INTO runs VALUES (?, ?, ?, ?)',
+                         (run_id, datetime.now().isoformat(timespec='milliseconds'), model_version, len(records)))
+            conn.executemany('INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        logger.info(f'✅ Corrida {run_id} registrada con {len(records)} predicciones')
+        return run_id
+
+    def _query(self, where: str, params: tuple) -> pd.DataFrame:
+        with self._connect() as conn:
+            return pd.read_sql_query(f'{_SELECT} WHERE {where} ORDER BY r.created_at, p.run_id', conn, params=params)
+
+    def student_timeline(self, control: str) -> pd.DataFrame:
+        """Trayectoria de riesgo de un alumno a lo largo de las corridas."""
+        return self._query('p.control = ?', (str(control),))
+
+    def by_cohort(self, period_ingreso: int) -> pd.DataFrame:
+        """Predicciones históricas de una cohorte de ingreso."""
+        return self._query('p.period_ingreso = ?', (int(period_ingreso),))
+
+    def by_career(self, cve_carrera: str) -> pd.DataFrame:
+        """Predicciones históricas de una carrera."""
+        return self._query('p.cve_carrera = ?', (str(cve_carrera),))
+
+    def by_run(self, run_id: str) -> pd.DataFrame:
+        """Predicciones de una corrida específica."""
+        return self._query('p.run_id = ?', (run_id,))
+
+    def previous_summary(self, exclude_run_id: Optional[str] = None) -> pd.DataFrame:
+        """Resume el historial de cada alumno sin contar una corrida dada.
+
+        Args:
+            exclude_run_id (Optional[str]): Corrida a excluir (normalmente la actual).
+
+        Returns:
+            pd.DataFrame: Indexado por número de control, con el riesgo de la
+                corrida previa más reciente y el número de corridas previas.
+        """
+        query = """
+        SELECT control, prob_abandono AS "Riesgo previo", n AS "Corridas previas" FROM (
+            SELECT p.control, p.prob_abandono,
+                   COUNT(*) OVER (PARTITION BY p.control) AS n,
+                   ROW_NUMBER() OVER (PARTITION BY p.control
+                                      ORDER BY r.created_at DESC, p.run_id DESC) AS rn
+            FROM predictions p JOIN runs r ON r.run_id = p.run_id
+            WHERE p.run_id != ?
+        ) WHERE rn = 1
+        """
+        with self._connect() as conn:
+            df = pd.read_sql_query(query, conn, params=(exclude_run_id or '',))
+        return df.set_index('control')
+
+    def list_runs(self) -> pd.DataFrame:
+        """Lista las corridas registradas, de la más reciente a la más antigua."""
+        with self._connect() as conn:
+            return pd.read_sql_query('SELECT * FROM runs ORDER BY created_at DESC', conn)
@@ -0,0 +1,285 @@
+"""
+Cola local de trabajos en segundo plano respaldada por SQLite.
+Las corridas largas (preprocesamiento, preparación y predicción) se ejecutan en
+un pool de hilos fuera del hilo de la sesión de Streamlit. Cada trabajo queda
+registrado con su estado, el avance por etapa y la ubicación de sus resultados;
+la interfaz solo envía el trabajo y consulta su avance. Dos envíos idénticos
+(misma llave) mientras el primero sigue activo se resuelven con el mismo trabajo.
+
+Cada trabajo registra el proceso que lo ejecuta (`owner`) y un latido periódico
+en `updated_at`; un trabajo activo cuyo proceso terminó (reinicio o caída del
+servidor) o que dejó de latir se marca con error en vez de quedar en curso.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, Optional
+
+import pandas as pd
+
+from src.utils.logging_utils import config_logging
+
+logger = config_logging()
+
+PENDING, RUNNING, DONE, FAILED = 'pendiente', 'en_proceso', 'terminado', 'error'
+ACTIVE = (PENDING, RUNNING)
+
+# Intervalo del latido de los trabajos activos de un proceso
+HEARTBEAT = timedelta(seconds=15)
+ABANDONED = 'Trabajo abandonado: el proceso que lo ejecutaba terminó'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    job_key     TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    stage       TEXT,
+    progress    TEXT NOT NULL,
+    result      TEXT,
+    error       TEXT,
+    created_at  TEXT NOT NULL,
+    updated_at  TEXT NOT NULL,
+    owner       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs(job_key, status);
+"""
+
+# Firma de la función de avance que recibe cada trabajo: progress(etapa, estado)
+ProgressFn = Callable[[str, str], None]
+
+
+def shared_progress(progress: ProgressFn, n_parts: int) -> ProgressFn:
+    """Avance de un trabajo dividido en partes paralelas (p. ej. una por campus).
+
+    Una etapa se reporta en proceso cuando la empieza la primera parte y
+    terminada cuando la terminan todas; los reportes se serializan, así que las
+    partes no se pisan al actualizar el avance.
+    """
+    lock = threading.Lock()
+    started, finished = set(), {}
+
+    def report(stage: str, status: str = RUNNING) -> None:
+        with lock:
+            if status == DONE:
+                finished[stage] = finished.get(stage, 0) + 1
+                if finished[stage] < n_parts:
+                    return
+            elif stage in started:
+                return
+            started.add(stage)
+            progress(stage, status)
+    return report
+
+
+def _pid_alive(pid: int) -> bool:
+    """True si el proceso existe (o no se puede comprobar)."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (OSError, ValueError):
+        return True
+    return True
+
+
+class JobQueue:
+    """Pool de trabajadores con tabla de trabajos en SQLite.
+
+    Attributes:
+        db_path: Ruta al archivo SQLite con la tabla de trabajos
+        stages: Etapas, en orden, en que se reporta el avance
+        stale_after: Tiempo sin latido tras el cual un trabajo activo se
+            considera abandonado (se marca con error y ya no se reutiliza)
+        owner: Proceso dueño de los trabajos de esta cola ('host:pid')
+    """
+
+    def __init__(self, db_path: str, stages: list, max_workers: int = 2,
+                 stale_after: timedelta = timedelta(minutes=2)) -> None:
+        """Crea (si no existe) la tabla de trabajos y el pool de trabajadores.
+
+        Los trabajos activos que dejó un proceso terminado se marcan con error, y
+        un hilo de latido mantiene al día `updated_at` de los trabajos propios
+        mientras esperan o se ejecutan, aunque una etapa dure más que `stale_after`.
+
+        Args:
+            db_path (str): Ruta al archivo SQLite de trabajos.
+            stages (list): Nombres de las etapas de cada trabajo.
+            max_workers (int): Trabajos ejecutándose a la vez.
+            stale_after (timedelta): Antigüedad máxima del latido de un trabajo activo;
+                debe ser varias veces HEARTBEAT.
+        """
+        self.db_path = db_path
+        self.stages = list(stages)
+        self.stale_after = stale_after
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}
+            if 'owner' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN owner TEXT')
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='edutrack-job')
+        self._lock = threading.Lock()
+        self._active = set()
+        self._recover_orphans()
+        self._heartbeat = threading.Thread(target=self._beat, name='edutrack-job-latido', daemon=True)
+        self._heartbeat.start()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Abre una conexión por operación; SQLite serializa a los escritores."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().isoformat(timespec='milliseconds')
+
+    def _fresh(self) -> str:
+        """Latido más antiguo de un trabajo activo que sigue vivo."""
+        return (datetime.now() - self.stale_after).isoformat(timespec='milliseconds')
+
+    def _is_orphan(self, owner: Optional[str], updated_at: str) -> bool:
+        """Un trabajo activo es huérfano si su proceso (en este host) ya no existe o dejó de latir."""
+        if updated_at < self._fresh():
+            return True
+        host, _, pid = (owner or '').rpartition(':')
+        return (host == socket.gethostname() and pid.isdigit() and owner != self.owner
+                and not _pid_alive(int(pid)))
+
+    def _recover_orphans(self) -> None:
+        """Marca con error los trabajos activos que ya no ejecuta ningún proceso."""
+        with self._lock, self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute(f'SELECT job_id, owner, updated_at FROM jobs '
+                                f'WHERE status IN ({",".join("?" * len(ACTIVE))})', ACTIVE).fetchall()
+            orphans = [job_id for job_id, owner, updated_at in rows if self._is_orphan(owner, updated_at)]
+            conn.executemany('UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?',
+                             [(FAILED, ABANDONED, self._now(), job_id) for job_id in orphans])
+        if orphans:
+            logger.warning(f'⚠️ {len(orphans)} trabajos abandonados marcados con error: {orphans}')
+
+    def _beat(self) -> None:
+        """Renueva `updated_at` de los trabajos propios en espera o en ejecución."""
+        while True:
+            time.sleep(HEARTBEAT.total_seconds())
+            with self._lock:
+                job_ids = list(self._active)
+            if not job_ids:
+                continue
+            try:
+                with self._connect() as conn:
+                    conn.execute(f'UPDATE jobs SET updated_at = ? WHERE job_id IN ({",".join("?" * len(job_ids))}) '
+                                 f'AND status IN ({",".join("?" * len(ACTIVE))})',
+                                 (self._now(), *job_ids, *ACTIVE))
+            except sqlite3.Error as e:
+                logger.warning(f'⚠️ No se pudo registrar el latido de {len(job_ids)} trabajos: {e}')
+
+    def submit(self, job_key: str, fn: Callable[[str, ProgressFn], dict]) -> str:
+        """Encola un trabajo, o devuelve el trabajo activo con la misma llave.
+
+        Args:
+            job_key (str): Llave de contenido del trabajo (datos de entrada, modelo...).
+            fn (Callable): Función `fn(job_id, progress) -> dict` que ejecuta el trabajo
+                y devuelve la ubicación de sus resultados (serializable a JSON).
+
+        Returns:
+            str: Identificador del trabajo
+        """
+        fresh = self._fresh()
+        with self._lock, self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                f'SELECT job_id FROM jobs WHERE job_key = ? AND status IN ({",".join("?" * len(ACTIVE))}) '
+                'AND updated_at >= ? ORDER BY created_at DESC LIMIT 1',
+                (job_key, *ACTIVE, fresh)).fetchone()
+            if row:
+                logger.info(f'ℹ️ Trabajo idéntico en curso, se reutiliza {row[0]}')
+                return row[0]
+            job_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+            now = self._now()
+            conn.execute('INSERT INTO jobs (job_id, job_key, status, stage, progress, created_at, updated_at, owner) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         (job_id, job_key, PENDING, None, json.dumps({s: PENDING for s in self.stages}),
+                          now, now, self.owner))
+            self._active.add(job_id)
+        logger.info(f'🔄 Trabajo {job_id} encolado')
+        self._executor.submit(self._run, job_id, fn)
+        return job_id
+
+    def _run(self, job_id: str, fn: Callable[[str, ProgressFn], dict]) -> None:
+        """Ejecuta un trabajo en un hilo del pool y registra su resultado."""
+        def progress(stage: str, status: str = RUNNING) -> None:
+            self._set_stage(job_id, stage, status)
+
+        self._update(job_id, status=RUNNING)
+        try:
+            result = fn(job_id, progress)
+            self._update(job_id, status=DONE, stage=None, result=json.dumps(result))
+            logger.info(f'✅ Trabajo {job_id} terminado')
+        except Exception as e:
+            logger.error(f'❌ Trabajo {job_id} con error: {e}\n{traceback.format_exc()}')
+            self._update(job_id, status=FAILED, error=str(e))
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields['updated_at'] = self._now()
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self._connect() as conn:
+            conn.execute(f'UPDATE jobs SET {assignments} WHERE job_id = ?', (*fields.values(), job_id))
+
+    def _set_stage(self, job_id: str, stage: str, status: str) -> None:
+        with self._connect() as conn:
+            (progress,) = conn.execute('SELECT progress FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+            progress = json.loads(progress)
+            progress[stage] = status
+            conn.execute('UPDATE jobs SET stage = ?, progress = ?, updated_at = ? WHERE job_id = ?',
+                         (stage, json.dumps(progress), self._now(), job_id))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Estado de un trabajo.
+
+        Returns:
+            Optional[dict]: 'job_id', 'status', 'stage', 'progress' (estado por etapa),
+                'fraction' (etapas terminadas / total), 'result' y 'error';
+                None si el trabajo no existe. Un trabajo activo huérfano se
+                devuelve (y queda registrado) con error.
+        """
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job['status'] in ACTIVE and self._is_orphan(job['owner'], job['updated_at']):
+            self._update(job_id, status=FAILED, error=ABANDONED)
+            job.update(status=FAILED, error=ABANDONED)
+        job['progress'] = json.loads(job['progress'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        done = sum(status == DONE for status in job['progress'].values())
+        job['fraction'] = 1.0 if job['status'] == DONE else done / max(len(job['progress']), 1)
+        return job
+
+    def list_jobs(self, limit: int = 20) -> pd.DataFrame:
+        """Trabajos más recientes (sin el detalle de avance)."""
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                'SELECT job_id, status, stage, created_at, updated_at, error FROM jobs '
+                'ORDER BY created_at DESC LIMIT ?', conn, params=(limit,))
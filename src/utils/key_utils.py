@@ -0,0 +1,50 @@
+"""
+Llaves sustitutas enteras para el número de control (aluctr).
+El número de control llega como texto en las tres tablas del SIS. Se codifica
+una sola vez en identificadores int32 densos (0..n-1) compartidos por todas las
+tablas; los cruces y pivoteos trabajan con esos enteros, o directamente como
+índices de arreglos, y el texto solo se recupera para la salida ('# Control').
+"""
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+
+class KeyDictionary:
+    """Diccionario llave de texto <-> identificador int32 denso.
+
+    Attributes:
+        keys: Llaves en el orden de su identificador
+    """
+
+    def __init__(self, values: Iterable) -> None:
+        """Construye el diccionario con las llaves distintas de `values` (en orden de aparición).
+
+        Args:
+            values (Iterable): Llaves de la tabla de referencia (p. ej. dcalum['aluctr'])
+        """
+        self.keys = pd.Index(pd.unique(normalize_keys(values)))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def encode(self, values: Iterable) -> np.ndarray:
+        """Identificadores de `values`; -1 para llaves que no están en el diccionario."""
+        return self.keys.get_indexer(normalize_keys(values)).astype(np.int32)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Llaves de texto de los identificadores dados."""
+        return self.keys.to_numpy()[codes]
+
+    def categorical(self, codes: np.ndarray) -> pd.Categorical:
+        """Columna con los identificadores como códigos y el diccionario como categorías (sin copiar el texto)."""
+        return pd.Categorical.from_codes(codes, categories=self.keys)
+
+
+def normalize_keys(values: Iterable) -> np.ndarray:
+    """Llaves como texto: una tabla leída con números de control solo numéricos se iguala a las demás."""
+    values = pd.Series(values) if not isinstance(values, pd.Series) else values
+    if values.dtype != object:
+        values = values.astype(str)
+    return values.to_numpy()
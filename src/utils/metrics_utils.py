@@ -0,0 +1,51 @@
+"""
+Registro de métricas de proceso en memoria.
+Los pipelines acumulan aquí contadores (valores sin mapear, filas descartadas,
+etc.) en lugar de imprimirlos; la app y los logs los consultan con `snapshot`.
+"""
+import threading
+from collections import defaultdict
+from typing import Dict, Optional
+
+import pandas as pd
+
+
+class MetricsRegistry:
+    """Contadores y valores etiquetados, seguros entre hilos."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: Dict[str, Dict[str, float]] = defaultdict(dict)
+
+    def incr(self, name: str, value: float = 1, label: Optional[str] = None) -> None:
+        """Suma `value` al contador `name` (opcionalmente por etiqueta, p. ej. la columna)."""
+        with self._lock:
+            series = self._values[name]
+            series[label or ''] = series.get(label or '', 0) + value
+
+    def set(self, name: str, value: float, label: Optional[str] = None) -> None:
+        """Fija el valor actual de `name`."""
+        with self._lock:
+            self._values[name][label or ''] = value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Copia de todas las métricas: {nombre: {etiqueta: valor}}."""
+        with self._lock:
+            return {name: dict(series) for name, series in self._values.items()}
+
+    def reset(self, name: Optional[str] = None) -> None:
+        """Borra una métrica o todas si `name` es None."""
+        with self._lock:
+            if name is None:
+                self._values.clear()
+            else:
+                self._values.pop(name, None)
+
+
+def snapshot_frame(snapshot: Dict[str, Dict[str, float]]) -> pd.DataFrame:
+    """Tabla de un `snapshot` con una fila por métrica y etiqueta."""
+    rows = [(name, label, value) for name, series in snapshot.items() for label, value in series.items()]
+    return pd.DataFrame(rows, columns=['metrica', 'etiqueta', 'valor'])
+
+
+metrics = MetricsRegistry()
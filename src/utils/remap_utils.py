@@ -0,0 +1,61 @@
+"""
+Remapeo declarativo de códigos del SIS.
+Cada regla (columna -> mapa de códigos -> tipo de salida) se compila una sola
+vez en un índice de búsqueda; aplicarla es una búsqueda de enteros sobre la
+columna completa que produce directamente categóricos (o enteros) y cuenta los
+valores que no tienen mapeo.
+"""
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class CompiledRemap:
+    """Regla de remapeo compilada.
+
+    Attributes:
+        column: Columna a la que se aplica
+        dtype: 'category' o un tipo numérico de pandas ('int64', 'Int64', ...)
+    """
+
+    def __init__(self, column: str, mapping: Dict[Any, Any], dtype: str = 'category') -> None:
+        self.column = column
+        self.dtype = dtype
+        self._keys = pd.Index(list(mapping.keys()))
+        targets = list(mapping.values())
+        if dtype == 'category':
+            # vocabulario ordenado, igual al que produciría astype('category')
+            self.categories = pd.Index(sorted({t for t in targets if not pd.isna(t)}))
+            self._codes = np.array([-1 if pd.isna(t) else self.categories.get_loc(t) for t in targets] + [-1],
+                                   dtype=np.int16)
+        else:
+            self.categories = None
+            self._codes = np.array([np.nan if pd.isna(t) else t for t in targets] + [np.nan], dtype=float)
+
+    def apply(self, series: pd.Series) -> Tuple[pd.Series, int]:
+        """Remapea una columna.
+
+        Args:
+            series (pd.Series): Valores originales
+
+        Returns:
+            tuple: (valores remapeados, número de valores no nulos sin mapeo)
+        """
+        # -1 (sin mapeo) indexa la última posición de la tabla, que vale nulo
+        positions = self._keys.get_indexer(series.to_numpy())
+        n_unmapped = int(((positions == -1) & series.notna().to_numpy()).sum())
+        values = self._codes[positions]
+        if self.dtype == 'category':
+            result = pd.Categorical.from_codes(values, categories=self.categories).remove_unused_categories()
+            return pd.Series(result, index=series.index, name=series.name), n_unmapped
+        result = pd.Series(values, index=series.index, name=series.name)
+        if self.dtype == 'int64' and result.isna().any():
+            # mismo criterio que Series.map: con nulos el resultado queda en float
+            return result, n_unmapped
+        return result.astype(self.dtype), n_unmapped
+
+
+def compile_spec(spec: Dict[str, Tuple[Dict[Any, Any], Optional[str]]]) -> Dict[str, CompiledRemap]:
+    """Compila una especificación {columna: (mapa, tipo)}; tipo None equivale a 'category'."""
+    return {col: CompiledRemap(col, mapping, dtype or 'category') for col, (mapping, dtype) in spec.items()}
@@ -0,0 +1,97 @@
+"""
+Utilidades para consultar el DataFrame de resultados del lado del servidor.
+Permiten filtrar, ordenar, paginar y resumir las predicciones para que al
+navegador solo se envíe la página visible.
+"""
+import math
+from typing import Dict, Optional, Sequence, Tuple
+
+import pandas as pd
+
+# Columnas del DataFrame procesado que acompañan a cada predicción en la tabla de resultados
+RESULT_CONTEXT_COLS = ['cve_carrera', 'cve_plan_estud', 'period_ingreso', 'period_ultimo']
+
+
+def filter_results(
+    df: pd.DataFrame,
+    carreras: Optional[Sequence[str]] = None,
+    planes: Optional[Sequence[str]] = None,
+    prob_range: Optional[Tuple[float, float]] = None,
+    labels: Optional[Sequence[str]] = None,
+    campuses: Optional[Sequence[str]] = None
+) -> pd.DataFrame:
+    """Filtra los resultados con una sola máscara booleana vectorizada.
+
+    Args:
+        df (pd.DataFrame): Resultados de la corrida
+        carreras (Optional[Sequence[str]]): Carreras a conservar; todas si es None o vacío
+        planes (Optional[Sequence[str]]): Planes de estudio a conservar
+        prob_range (Optional[Tuple[float, float]]): Rango inclusivo de 'Probabilidad'
+        labels (Optional[Sequence[str]]): Etiquetas de 'Prediccion' a conservar
+        campuses (Optional[Sequence[str]]): Campus a conservar (resultados de varios campus)
+
+    Returns:
+        pd.DataFrame: Subconjunto filtrado (vista sobre las filas seleccionadas)
+    """
+    mask = pd.Series(True, index=df.index)
+    if carreras:
+        mask &= df['cve_carrera'].isin(carreras)
+    if planes:
+        mask &= df['cve_plan_estud'].isin(planes)
+    if prob_range is not None:
+        mask &= df['Probabilidad'].between(prob_range[0], prob_range[1])
+    if labels:
+        mask &= df['Prediccion'].isin(labels)
+    if campuses:
+        mask &= df['Campus'].isin(campuses)
+    return df[mask]
+
+
+def sort_results(df: pd.DataFrame, by: Optional[str], ascending: bool = True) -> pd.DataFrame:
+    """Ordena los resultados por una columna; no hace nada si `by` es None."""
+    if not by:
+        return df
+    return df.sort_values(by=by, ascending=ascending, kind='stable')
+
+
+def paginate(df: pd.DataFrame, page: int, page_size: int) -> Tuple[pd.DataFrame, int]:
+    """Obtiene una página de resultados.
+
+    Args:
+        df (pd.DataFrame): Resultados ya filtrados y ordenados
+        page (int): Número de página, empezando en 1
+        page_size (int): Filas por página
+
+    Returns:
+        Tuple[pd.DataFrame, int]: (filas de la página, número total de páginas)
+    """
+    n_pages = max(1, math.ceil(len(df) / page_size))
+    page = min(max(1, page), n_pages)
+    start = (page - 1) * page_size
+    return df.iloc[start:start + page_size], n_pages
+
+
+def compute_kpis(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Calcula los indicadores agregados de riesgo de una corrida.
+
+    Args:
+        df (pd.DataFrame): Resultados completos de la corrida
+
+    Returns:
+        Dict[str, pd.DataFrame]: Conteos de 'Prediccion' por carrera ('por_carrera')
+            y por semestre cursado ('por_semestre'), con el porcentaje de abandono;
+            con resultados de varios campus, también por campus ('por_campus').
+    """
+    kpis = {}
+    groups = [('por_carrera', 'cve_carrera'), ('por_semestre', 'period_ultimo')]
+    if 'Campus' in df.columns:
+        groups.append(('por_campus', 'Campus'))
+    for name, col in groups:
+        counts = df.groupby([col, 'Prediccion'], observed=True).size().unstack(fill_value=0)
+        for label in ['Abandono', 'No abandono']:
+            if label not in counts.columns:
+                counts[label] = 0
+        counts['Total'] = counts['Abandono'] + counts['No abandono']
+        counts['% Abandono'] = (counts['Abandono'] / counts['Total'] * 100).round(2)
+        kpis[name] = counts.reset_index()
+    return kpis
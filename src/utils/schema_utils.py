@@ -0,0 +1,227 @@
+"""
+Esquemas declarativos de las tablas del SIS y su validación vectorizada.
+Cada tabla declara sus columnas con tipo, valores permitidos, rangos, política
+de nulos y los marcadores conocidos de dato faltante ('*****', '/  /', ' ').
+La validación revisa primero los encabezados (sin leer el archivo completo) y
+después los valores, columna por columna, con operaciones vectorizadas.
+"""
+from typing import Dict, List, Literal, Optional, Union
+
+import pandas as pd
+from pydantic import BaseModel
+
+from src.utils.logging_utils import config_logging
+
+logger = config_logging()
+
+
+class ColumnSchema(BaseModel):
+    """Reglas de una columna.
+
+    Attributes:
+        name: Nombre de la columna en el archivo
+        dtype: Tipo esperado ('int', 'float', 'str' o 'date')
+        nullable: Si se permiten valores nulos (los marcadores cuentan como nulos)
+        allowed: Valores permitidos, si el dominio es cerrado
+        min_value: Valor mínimo permitido para columnas numéricas
+        max_value: Valor máximo permitido para columnas numéricas
+        sentinels: Marcadores de dato faltante usados por el SIS
+        date_format: Formato de fecha para columnas 'date'
+    """
+    name: str
+    dtype: Literal['int', 'float', 'str', 'date'] = 'str'
+    nullable: bool = True
+    allowed: Optional[List[Union[int, str]]] = None
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    sentinels: List[str] = []
+    date_format: Optional[str] = None
+
+
+class TableSchema(BaseModel):
+    """Esquema de una tabla del SIS.
+
+    Attributes:
+        name: Nombre descriptivo de la tabla
+        columns: Reglas de cada columna requerida
+        key: Columna usada para reportar ejemplos de filas con errores
+    """
+    name: str
+    columns: List[ColumnSchema]
+    key: Optional[str] = 'aluctr'
+
+    @property
+    def column_names(self) -> List[str]:
+        return [col.name for col in self.columns]
+
+
+class SchemaValidationError(ValueError):
+    """Error de validación con el resumen por columna de los problemas encontrados."""
+
+    def __init__(self, table: str, summary: pd.DataFrame) -> None:
+        self.table = table
+        self.summary = summary
+        details = '; '.join(f"{row.columna}: {row.regla} ({row.errores})" for row in summary.itertuples())
+        super().__init__(f'El archivo {table} no cumple el esquema: {details}')
+
+
+def _int(name: str, **kwargs) -> ColumnSchema:
+    return ColumnSchema(name=name, dtype='int', **kwargs)
+
+
+def _str(name: str, **kwargs) -> ColumnSchema:
+    return ColumnSchema(name=name, dtype='str', **kwargs)
+
+
+_ALUCTR = _str('aluctr', nullable=False)
+_BLANK = [' ']
+
+SIS_SCHEMAS: Dict[str, TableSchema] = {
+    'dkarde': TableSchema(name='calificaciones', columns=[
+        _ALUCTR,
+        _str('matcve', nullable=False),
+        _int('karcal', min_value=0, max_value=100),
+        _int('tcacve'),
+    ]),
+    'dalumn': TableSchema(name='datos personales', columns=[
+        _ALUCTR, _str('aluapp'), _str('aluapm'), _str('alunom'), _str('alurfc'), _str('alucur'), _str('aluseg'),
+        ColumnSchema(name='alunac', dtype='date', date_format='%m/%d/%Y', sentinels=['/  /']),
+        _int('alusex', allowed=[1, 2]), _int('alulna'), _int('alumun'), _int('aluesc'),
+        _int('aluegr', min_value=0), _int('aluescp', min_value=0, max_value=100), _int('alucpo', min_value=0),
+        _int('alusme', allowed=[1, 2, 3, 4, 5, 6], sentinels=_BLANK),
+        _int('alueci', allowed=[1, 2, 3, 4, 5], sentinels=_BLANK),
+        _int('aluare', allowed=[1, 2, 3, 4, 5, 6], sentinels=_BLANK),
+        _str('alupadv', allowed=['S', 'N'], sentinels=_BLANK),
+        _str('alumadv', allowed=['S', 'N'], sentinels=_BLANK),
+        _int('alutcp', min_value=0, sentinels=['*****']),
+        _int('alutra'),
+        _str('alulexp', allowed=['S', 'N'], sentinels=_BLANK),
+        _int('alutecpo'), _int('alupexani'), _int('discve'), _int('alucen'),
+    ]),
+    'dcalum': TableSchema(name='datos académicos', columns=[
+        _ALUCTR,
+        _int('carcve', nullable=False, allowed=[1, 2, 3, 4, 6]),
+        _int('placve'),
+        _int('espcve', sentinels=_BLANK),
+        _int('caling', nullable=False, min_value=0),
+        _str('calter'), _int('calsit'),
+        _int('calnpe', nullable=False, min_value=0),
+        _str('calgpo'), _int('calcac', min_value=0), _int('calnpec', min_value=0), _str('calobs'),
+        ColumnSchema(name='caltcala', dtype='float', min_value=0),
+        ColumnSchema(name='caltcalr', dtype='float', min_value=0),
+        _int('calmata', min_value=0), _int('calmat', min_value=0), _int('calmatac', min_value=0),
+        _str('calpri', allowed=['*'], sentinels=_BLANK),
+        _int('calnpep', min_value=0),
+        _str('calingt', sentinels=_BLANK),
+        _int('calingi'),
+    ]),
+    'ubicaciones': TableSchema(name='códigos de ubicación', key='muncve', columns=[
+        _int('muncve', nullable=False), _int('estcve', nullable=False), _str('munnom'), _str('estnom'),
+    ]),
+    'escuelas': TableSchema(name='códigos de escuelas', key='esccve', columns=[
+        _int('esccve', nullable=False), _str('escnomcto'),
+    ]),
+    'plan_estudio': TableSchema(name='códigos de planes', key='placve', columns=[
+        _int('carcve', nullable=False), _int('placve', nullable=False), _str('placof'),
+    ]),
+    'especialidad': TableSchema(name='códigos de especialidades', key='espcve', columns=[
+        _int('espcve', nullable=False), _int('placve', nullable=False), _int('carcve', nullable=False), _str('espnco'),
+    ]),
+}
+
+
+def read_header(source, encoding: str = 'latin1') -> List[str]:
+    """Lee solo la fila de encabezados de un CSV (ruta o archivo abierto)."""
+    header = pd.read_csv(source, nrows=0, encoding=encoding)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return list(header.columns)
+
+
+def validate_header(columns: List[str], schema: TableSchema) -> None:
+    """Valida que estén todas las columnas requeridas antes de leer los datos.
+
+    Raises:
+        SchemaValidationError: Si falta alguna columna requerida
+    """
+    missing = [col for col in schema.column_names if col not in set(columns)]
+    if missing:
+        summary = pd.DataFrame({'columna': missing, 'regla': 'columna faltante', 'errores': 1, 'ejemplos': None})
+        logger.error(f'❌ Faltan columnas en el archivo de {schema.name}: {missing}')
+        raise SchemaValidationError(schema.name, summary)
+
+
+def validate_frame(df: pd.DataFrame, schema: TableSchema, max_samples: int = 5) -> pd.DataFrame:
+    """Valida los valores de un DataFrame contra su esquema.
+
+    Cada regla se evalúa como una máscara booleana sobre la columna completa.
+
+    Args:
+        df (pd.DataFrame): Datos ya leídos
+        schema (TableSchema): Esquema de la tabla
+        max_samples (int): Número de claves de ejemplo a reportar por regla
+
+    Returns:
+        pd.DataFrame: Resumen con columnas 'columna', 'regla', 'errores' y
+            'ejemplos' (claves de las filas con error); vacío si todo es válido
+    """
+    problems = []
+    key = df[schema.key].astype(str) if schema.key in df.columns else pd.Series(df.index.astype(str), index=df.index)
+
+    def report(col: str, rule: str, mask: pd.Series) -> None:
+        n_errors = int(mask.sum())
+        if n_errors:
+            problems.append({'columna': col, 'regla': rule, 'errores': n_errors,
+                             'ejemplos': key[mask].head(max_samples).tolist()})
+
+    for col in schema.columns:
+        if col.name not in df.columns:
+            report(col.name, 'columna faltante', pd.Series(True, index=df.index[:1]))
+            continue
+        values = df[col.name]
+        is_sentinel = values.isin(col.sentinels) if col.sentinels else pd.Series(False, index=df.index)
+        values = values.mask(is_sentinel)
+        is_null = values.isna()
+        if not col.nullable:
+            report(col.name, 'valor nulo', is_null)
+
+        if col.dtype in ('int', 'float'):
+            numbers = pd.to_numeric(values, errors='coerce')
+            bad_type = numbers.isna() & ~is_null
+            if col.dtype == 'int':
+                bad_type |= numbers.notna() & (numbers % 1 != 0)
+            report(col.name, f'no es {"entero" if col.dtype == "int" else "numérico"}', bad_type)
+            values = numbers
+        elif col.dtype == 'date':
+            dates = pd.to_datetime(values, format=col.date_format, errors='coerce')
+            report(col.name, f'fecha inválida ({col.date_format})', dates.isna() & ~is_null)
+
+        valid = values.notna()
+        if col.allowed is not None:
+            report(col.name, f'valor fuera de {col.allowed}', valid & ~values.isin(col.allowed))
+        if col.min_value is not None:
+            report(col.name, f'menor que {col.min_value}', valid & (values < col.min_value))
+        if col.max_value is not None:
+            report(col.name, f'mayor que {col.max_value}', valid & (values > col.max_value))
+
+    return pd.DataFrame(problems, columns=['columna', 'regla', 'errores', 'ejemplos'])
+
+
+def validate_table(df: pd.DataFrame, table: str) -> None:
+    """Valida encabezados y valores de una tabla del SIS.
+
+    Args:
+        df (pd.DataFrame): Datos de la tabla
+        table (str): Clave de la tabla en SIS_SCHEMAS (igual a la de `files` en config)
+
+    Raises:
+        SchemaValidationError: Si algún valor no cumple el esquema
+    """
+    schema = SIS_SCHEMAS[table]
+    logger.info(f'🔍 Validando esquema del archivo de {schema.name}...')
+    validate_header(list(df.columns), schema)
+    summary = validate_frame(df, schema)
+    if not summary.empty:
+        logger.error(f'❌ Errores de esquema en el archivo de {schema.name}:\n{summary.to_string(index=False)}')
+        raise SchemaValidationError(schema.name, summary)
+    logger.info(f'✅ Esquema válido en el archivo de {schema.name}')
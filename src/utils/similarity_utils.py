@@ -0,0 +1,252 @@
+"""
+Índice de alumnos similares sobre la matriz de variables preparada.
+Búsqueda exacta de k vecinos más cercanos (distancia euclidiana en el espacio
+normalizado de DataPreparationPipeline) por fuerza bruta en bloques float32.
+Los alumnos se reparten en fragmentos por un hash estable del número de
+control; cada fragmento se guarda en un archivo nombrado por su contenido, así
+que al reconstruir solo se reescriben los fragmentos donde algún alumno cambió,
+entró o salió. El manifiesto (escrito al final) indica los fragmentos vigentes.
+"""
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.utils.cache_utils import file_lock
+from src.utils.logging_utils import config_logging
+
+logger = config_logging()
+
+MANIFEST_FILE = 'manifest.json'
+# Fragmentos del índice (cada uno es un bloque de la búsqueda)
+N_SHARDS = 16
+# Consultas por bloque en las búsquedas en lote (acota la matriz de distancias)
+QUERY_CHUNK = 256
+# Filas por bloque al calcular las huellas de las filas
+FINGERPRINT_CHUNK = 65_536
+
+
+def _atomic_save(path: str, save) -> None:
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            save(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def row_fingerprints(df: pd.DataFrame, chunk_rows: int = FINGERPRINT_CHUNK) -> np.ndarray:
+    """Huella de cada fila: su proyección (float64) sobre dos vectores aleatorios fijos.
+
+    Cualquier cambio en una variable cambia la proyección, y se calcula con un
+    producto de matrices por bloque en lugar de un hash por celda.
+    """
+    weights = np.random.default_rng(0).standard_normal((df.shape[1], 2))
+    prints = np.empty((len(df), 2), dtype=np.float64)
+    for start in range(0, len(df), chunk_rows):
+        prints[start:start + chunk_rows] = df.iloc[start:start + chunk_rows].to_numpy(dtype=np.float64) @ weights
+    return prints
+
+
+class SimilarityIndex:
+    """Índice k-NN exacto de una matriz preparada, persistido por fragmentos.
+
+    Attributes:
+        path: Directorio del índice
+        manifest: Columnas, fragmentos vigentes y fecha de construcción
+    """
+
+    def __init__(self, path: str) -> None:
+        """Abre el índice vigente del directorio.
+
+        Raises:
+            FileNotFoundError: Si el directorio no contiene un índice.
+        """
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.shards = []
+        for name in self.manifest['shards']:
+            meta = np.load(os.path.join(path, f'{name}.npz'))
+            vectors = np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+            self.shards.append({'vectors': vectors, 'norms': meta['norms'], 'outcomes': meta['outcomes'],
+                                'controls': meta['controls']})
+        controls = [shard['controls'] for shard in self.shards]
+        self.controls = pd.Index(np.concatenate(controls) if controls else np.array([], dtype=str), name='# Control')
+        self.offsets = np.cumsum([0] + [len(c) for c in controls])
+        self.outcomes = np.concatenate([s['outcomes'] for s in self.shards]) if self.shards else np.array([])
+
+    @property
+    def revision(self) -> str:
+        return self.manifest['revision']
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, MANIFEST_FILE))
+
+    @staticmethod
+    def current_revision(path: str) -> Optional[str]:
+        """Revisión vigente del índice sin abrir sus fragmentos (None si no existe)."""
+        try:
+            with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)['revision']
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def build(cls, path: str, df_prepared: pd.DataFrame, controls: Sequence[str],
+              outcomes: Optional[Sequence[float]] = None) -> 'SimilarityIndex':
+        """Construye o actualiza el índice; solo reescribe los fragmentos que cambiaron.
+
+        Args:
+            path (str): Directorio del índice
+            df_prepared (pd.DataFrame): Salida de DataPreparationPipeline
+            controls (Sequence[str]): Número de control de cada fila
+            outcomes (Optional[Sequence[float]]): 'abandono' de cada fila (0/1; NaN si se desconoce)
+
+        Returns:
+            SimilarityIndex: Índice vigente, abierto
+        """
+        if len(controls) != len(df_prepared):
+            raise ValueError('El índice de números de control no coincide con el número de filas')
+        os.makedirs(path, exist_ok=True)
+        controls = np.asarray(pd.Series(controls).astype(str), dtype=str)
+        outcomes = (np.full(len(controls), np.nan, dtype=np.float32) if outcomes is None
+                    else pd.to_numeric(pd.Series(outcomes), errors='coerce').to_numpy(dtype=np.float32))
+        columns = [str(col) for col in df_prepared.columns]
+        row_hashes = row_fingerprints(df_prepared)
+        shard_of = pd.util.hash_array(controls.astype(object)) % N_SHARDS
+
+        with file_lock(os.path.join(path, '.lock')):
+            previous = set()
+            if cls.exists(path):
+                with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                    previous = set(json.load(f)['shards'])
+            names, written = [], 0
+            for shard in range(N_SHARDS):
+                rows = np.flatnonzero(shard_of == shard)
+                digest = hashlib.sha256('|'.join(columns).encode())
+                for part in (controls[rows], row_hashes[rows], outcomes[rows]):
+                    digest.update(np.ascontiguousarray(part).tobytes())
+                name = f'{shard:03d}-{digest.hexdigest()[:16]}'
+                names.append(name)
+                if name in previous and os.path.exists(os.path.join(path, f'{name}.npy')):
+                    continue
+                vectors = df_prepared.iloc[rows].to_numpy(dtype=np.float32)
+                norms = np.einsum('ij,ij->i', vectors, vectors)
+                _atomic_save(os.path.join(path, f'{name}.npy'), lambda f: np.save(f, vectors))
+                _atomic_save(os.path.join(path, f'{name}.npz'), lambda f: np.savez(
+                    f, norms=norms, outcomes=outcomes[rows], controls=controls[rows]))
+                written += 1
+            manifest = {'columns': columns, 'shards': names, 'n_rows': len(controls),
+                        'revision': hashlib.sha256('|'.join(names).encode()).hexdigest()[:16],
+                        'created_at': datetime.now().isoformat(timespec='seconds')}
+            _atomic_save(os.path.join(path, MANIFEST_FILE),
+                         lambda f: f.write(json.dumps(manifest, ensure_ascii=False).encode()))
+            # Fragmentos que ya no forman parte del índice vigente
+            for name in previous - set(names):
+                for ext in ('npy', 'npz'):
+                    if os.path.exists(os.path.join(path, f'{name}.{ext}')):
+                        os.remove(os.path.join(path, f'{name}.{ext}'))
+        logger.info(f'✅ Índice de similitud actualizado: {written} de {N_SHARDS} fragmentos reescritos '
+                    f'({len(controls)} alumnos)')
+        return cls(path)
+
+    def vectors_for(self, controls: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Vectores de los números de control dados.
+
+        Returns:
+            tuple: (vectores float32 de los encontrados, posiciones globales; -1 si no existe)
+        """
+        positions = self.controls.get_indexer(pd.Index(controls).astype(str))
+        found = positions[positions >= 0]
+        shard = np.searchsorted(self.offsets, found, side='right') - 1
+        vectors = np.empty((len(found), len(self.manifest['columns'])), dtype=np.float32)
+        for s in np.unique(shard):
+            hit = shard == s
+            vectors[hit] = self.shards[s]['vectors'][found[hit] - self.offsets[s]]
+        return vectors, positions
+
+    def search(self, queries: np.ndarray, k: int = 10, known_only: bool = False,
+               exclude: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+        """k vecinos más cercanos de cada vector de consulta, recorriendo los fragmentos por bloques.
+
+        Args:
+            queries (np.ndarray): Vectores (q x variables) en el espacio preparado
+            k (int): Vecinos por consulta
+            known_only (bool): Solo alumnos con desenlace ('abandono') conocido
+            exclude (Optional[np.ndarray]): Posición global a omitir por consulta (-1 = ninguna),
+                p. ej. el propio alumno
+
+        Returns:
+            tuple: (posiciones globales, distancias), ambas (q x k) ordenadas por distancia;
+                posición -1 si hay menos de k candidatos
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        n_queries = len(queries)
+        best_pos = np.full((n_queries, k), -1, dtype=np.int64)
+        best_dist = np.full((n_queries, k), np.inf, dtype=np.float32)
+        q_norms = np.einsum('ij,ij->i', queries, queries)
+        for s, shard in enumerate(self.shards):
+            if not len(shard['norms']):
+                continue
+            base = self.offsets[s]
+            invalid = np.isnan(shard['outcomes']) if known_only else None
+            for start in range(0, n_queries, QUERY_CHUNK):
+                stop = min(start + QUERY_CHUNK, n_queries)
+                # |q - x|^2 = |q|^2 + |x|^2 - 2 q.x, con un solo producto de matrices por bloque
+                dist = q_norms[start:stop, None] + shard['norms'][None, :] - 2 * (queries[start:stop] @ shard['vectors'].T)
+                np.maximum(dist, 0, out=dist)
+                if invalid is not None:
+                    dist[:, invalid] = np.inf
+                if exclude is not None:
+                    own = exclude[start:stop] - base
+                    mine = np.flatnonzero((own >= 0) & (own < len(shard['norms'])))
+                    dist[mine, own[mine]] = np.inf
+                take = min(k, dist.shape[1])
+                cand = np.argpartition(dist, take - 1, axis=1)[:, :take]
+                cand_dist = np.take_along_axis(dist, cand, axis=1)
+                merged_dist = np.concatenate([best_dist[start:stop], cand_dist], axis=1)
+                merged_pos = np.concatenate([best_pos[start:stop], cand + base], axis=1)
+                order = np.argsort(merged_dist, axis=1, kind='stable')[:, :k]
+                best_dist[start:stop] = np.take_along_axis(merged_dist, order, axis=1)
+                best_pos[start:stop] = np.take_along_axis(merged_pos, order, axis=1)
+        best_pos[np.isinf(best_dist)] = -1
+        return best_pos, np.sqrt(best_dist)
+
+    def neighbors(self, controls: Sequence[str], k: int = 10, known_only: bool = False) -> pd.DataFrame:
+        """Alumnos más parecidos a cada número de control, con su desenlace.
+
+        Args:
+            controls (Sequence[str]): Números de control a consultar (uno o una lista completa)
+            k (int): Vecinos por alumno
+            known_only (bool): Solo vecinos con desenlace conocido
+
+        Returns:
+            pd.DataFrame: Columnas '# Control', 'Rango', 'Vecino', 'Distancia' y 'abandono'
+                (Int64, nulo si el desenlace se desconoce); los números de control que no
+                están en el índice se omiten
+        """
+        vectors, positions = self.vectors_for(controls)
+        found = positions >= 0
+        if not found.any():
+            return pd.DataFrame(columns=['# Control', 'Rango', 'Vecino', 'Distancia', 'abandono'])
+        pos, dist = self.search(vectors, k=k, known_only=known_only, exclude=positions[found])
+        query = np.repeat(np.asarray(pd.Index(controls).astype(str))[found], k)
+        pos, dist = pos.ravel(), dist.ravel()
+        valid = pos >= 0
+        outcomes = pd.array(self.outcomes[pos[valid]], dtype='Float32').astype('Int64')
+        return pd.DataFrame({
+            '# Control': query[valid],
+            'Rango': np.tile(np.arange(1, k + 1), int(found.sum()))[valid],
+            'Vecino': self.controls.to_numpy()[pos[valid]],
+            'Distancia': np.round(dist[valid], 4),
+            'abandono': outcomes,
+        })
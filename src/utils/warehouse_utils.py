@@ -0,0 +1,215 @@
+"""
+Almacén local (SQLite) de los extractos crudos del SIS.
+Las tablas de alumnos (dalumn), datos académicos (dcalum) y calificaciones
+(dkarde) se guardan con llave primaria por número de control, y por número de
+control y materia en calificaciones. Cada carga hace un upsert: las filas con la
+misma llave se reemplazan (gana el último registro, igual que `keep='last'`) y
+las demás se conservan, en lugar de sobrescribir el archivo completo. Un upsert
+nunca borra filas: un alumno que ya no viene en un extracto nuevo sigue en el
+almacén. Para que una tabla refleje exactamente un extracto completo se carga
+con `upsert(..., replace=True)`, que vacía la tabla en la misma transacción. Los
+pipelines consultan el almacén con cruces indexados y pueden leer solo un
+subconjunto (una carrera, una cohorte o un alumno).
+"""
+import os
+import sqlite3
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import pandas as pd
+
+from src.utils.logging_utils import config_logging
+
+logger = config_logging()
+
+# Llave primaria de cada tabla
+TABLE_KEYS = {
+    'dalumn': ['aluctr'],
+    'dcalum': ['aluctr'],
+    'dkarde': ['aluctr', 'matcve'],
+}
+# Índices secundarios para las lecturas parciales
+TABLE_INDEXES = {
+    'dcalum': [['carcve'], ['caling']],
+}
+# Columnas por las que se puede pedir un subconjunto (todas indexadas)
+SUBSET_COLS = ['aluctr', 'carcve', 'caling']
+
+_META = """
+CREATE TABLE IF NOT EXISTS _revisiones (
+    tabla      TEXT PRIMARY KEY,
+    revision   TEXT NOT NULL,
+    filas      INTEGER NOT NULL,
+    origen     TEXT
+);
+"""
+
+
+def quote(name: str) -> str:
+    """Identificador SQL entre comillas dobles."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class SISWarehouse:
+    """Tablas crudas del SIS en un archivo SQLite con llaves e índices.
+
+    Attributes:
+        db_path: Ruta al archivo SQLite del almacén
+    """
+
+    def __init__(self, db_path: str) -> None:
+        """Crea (si no existe) el archivo del almacén.
+
+        Args:
+            db_path (str): Ruta al archivo SQLite.
+        """
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_META)
+            if 'origen' not in [row[1] for row in conn.execute('PRAGMA table_info(_revisiones)')]:
+                conn.execute('ALTER TABLE _revisiones ADD COLUMN origen TEXT')
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Abre una conexión por operación; SQLite serializa a los escritores."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def columns(self, table: str) -> List[str]:
+        """Columnas de una tabla en el orden en que se crearon (vacío si no existe)."""
+        with self._connect() as conn:
+            return [row[1] for row in conn.execute(f'PRAGMA table_info({quote(table)})')]
+
+    def count(self, table: str) -> int:
+        """Filas de una tabla (0 si no existe)."""
+        with self._connect() as conn:
+            row = conn.execute('SELECT filas FROM _revisiones WHERE tabla = ?', (table,)).fetchone()
+        return row[0] if row else 0
+
+    def revision(self, table: str) -> Optional[str]:
+        """Identificador que cambia con cada carga de la tabla (None si nunca se cargó)."""
+        with self._connect() as conn:
+            row = conn.execute('SELECT revision FROM _revisiones WHERE tabla = ?', (table,)).fetchone()
+        return row[0] if row else None
+
+    def origin(self, table: str) -> Optional[str]:
+        """Huella del archivo con el que se cargó la tabla por última vez (None si no se registró)."""
+        with self._connect() as conn:
+            row = conn.execute('SELECT origen FROM _revisiones WHERE tabla = ?', (table,)).fetchone()
+        return row[0] if row else None
+
+    def _ensure_table(self, conn: sqlite3.Connection, table: str, columns: Sequence[str]) -> None:
+        """Crea la tabla con su llave e índices, o agrega las columnas nuevas.
+
+        Las columnas que no son llave se declaran sin tipo: SQLite guarda cada
+        valor con el tipo con que llegó (texto, entero o real), igual que el CSV.
+        """
+        keys = TABLE_KEYS[table]
+        existing = [row[1] for row in conn.execute(f'PRAGMA table_info({quote(table)})')]
+        if not existing:
+            definition = [f'{quote(col)} TEXT NOT NULL' for col in keys]
+            definition += [quote(col) for col in columns if col not in keys]
+            definition.append(f'PRIMARY KEY ({", ".join(map(quote, keys))})')
+            conn.execute(f'CREATE TABLE {quote(table)} ({", ".join(definition)})')
+        else:
+            for col in columns:
+                if col not in existing:
+                    conn.execute(f'ALTER TABLE {quote(table)} ADD COLUMN {quote(col)}')
+        for index_cols in TABLE_INDEXES.get(table, []):
+            if all(col in columns or col in existing for col in index_cols):
+                name = quote(f'idx_{table}_{"_".join(index_cols)}')
+                conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {quote(table)} ({", ".join(map(quote, index_cols))})')
+
+    def upsert(self, table: str, frames: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+               replace: bool = False, origin: Optional[str] = None) -> int:
+        """Inserta o reemplaza filas por llave en una sola transacción.
+
+        Las filas cuya llave no viene en `frames` se conservan, salvo con
+        `replace=True`, que vacía la tabla antes de escribir.
+
+        Args:
+            table (str): 'dalumn', 'dcalum' o 'dkarde'
+            frames: Un DataFrame o un iterable de DataFrames (p. ej. lotes de un CSV);
+                si el iterable lanza una excepción no se guarda ningún lote
+            replace (bool): La carga es un extracto completo que sustituye a la tabla
+            origin (Optional[str]): Huella del archivo cargado (ver `origin`); si es
+                None se conserva la registrada
+
+        Returns:
+            int: Filas escritas
+        """
+        if isinstance(frames, pd.DataFrame):
+            frames = [frames]
+        keys = TABLE_KEYS[table]
+        written = skipped = 0
+        with self._connect() as conn:
+            if replace and self._has_table(conn, table):
+                conn.execute(f'DELETE FROM {quote(table)}')
+            for df in frames:
+                df = df.copy()
+                missing = df[keys].isna().any(axis=1)
+                skipped += int(missing.sum())
+                df = df[~missing]
+                for key in keys:
+                    df[key] = df[key].astype(str)
+                if table == 'dkarde':
+                    # misma estandarización de claves de materia que `read_grades`
+                    df['matcve'] = df['matcve'].str.replace(' ', '')
+                self._ensure_table(conn, table, list(df.columns))
+                sql = (f'INSERT OR REPLACE INTO {quote(table)} ({", ".join(map(quote, df.columns))}) '
+                       f'VALUES ({", ".join("?" * len(df.columns))})')
+                values = df.astype(object).where(df.notna(), None)
+                conn.executemany(sql, values.itertuples(index=False, name=None))
+                written += len(df)
+            if not written and not replace:
+                return 0
+            rows = conn.execute(f'SELECT COUNT(*) FROM {quote(table)}').fetchone()[0] if self._has_table(conn, table) else 0
+            conn.execute('INSERT INTO _revisiones (tabla, revision, filas, origen) VALUES (?, ?, ?, ?) '
+                         'ON CONFLICT(tabla) DO UPDATE SET revision = excluded.revision, filas = excluded.filas, '
+                         'origen = COALESCE(excluded.origen, origen)',
+                         (table, uuid.uuid4().hex, rows, origin))
+        if skipped:
+            logger.warning(f'⚠️ {skipped} filas de {table} sin llave, no se guardaron')
+        logger.info(f'✅ {written} filas guardadas en {table} ({rows} en total)')
+        return written
+
+    @staticmethod
+    def _has_table(conn: sqlite3.Connection, table: str) -> bool:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+    def query(self, sql: str, params: Sequence = ()) -> pd.DataFrame:
+        """Ejecuta una consulta de lectura y devuelve un DataFrame."""
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=list(params))
+
+    @staticmethod
+    def subset_clause(alias: str, subset: Optional[Dict[str, Sequence]]) -> tuple:
+        """Condición SQL (y parámetros) para leer solo un subconjunto.
+
+        Args:
+            alias (str): Alias de la tabla con las columnas de `SUBSET_COLS`
+            subset (Optional[Dict[str, Sequence]]): Columna -> valores permitidos,
+                p. ej. {'carcve': [1]} o {'aluctr': ['E17000001']}
+
+        Returns:
+            tuple: (condición, parámetros); ('1', []) si no hay subconjunto
+        """
+        if not subset:
+            return '1', []
+        conditions, params = [], []
+        for col, values in subset.items():
+            if col not in SUBSET_COLS:
+                raise ValueError(f'No se puede filtrar por {col}; columnas válidas: {SUBSET_COLS}')
+            values = [str(v) for v in values] if col == 'aluctr' else list(values)
+            conditions.append(f'{alias}.{quote(col)} IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+        return ' AND '.join(conditions), params
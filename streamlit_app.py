@@ -1,21 +1,61 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import openpyxl
 from datetime import datetime
 import os
 import base64
+import hashlib
+import logging
+import joblib
 from src.utils.config_utils import PreprocessConfig, load_config
 from src.utils import config_logging, log_function
+from src.utils.history_utils import PredictionHistoryStore
+from src.utils.feature_store import FeatureStore
+from src.utils.job_utils import JobQueue, DONE, FAILED, shared_progress
+from src.utils.cache_utils import TieredCache
+from src.utils.dag_utils import clear_memo, file_digest, file_fingerprint
+from src.utils.drift_utils import check_drift
+from src.utils.metrics_utils import metrics, snapshot_frame
+from src.utils.similarity_utils import SimilarityIndex
+from src.utils import results_utils as rs
+from src.utils import export_utils as ex
+from src.utils.schema_utils import (SIS_SCHEMAS, SchemaValidationError, read_header,
+                                    validate_frame, validate_header)
 from src.pipelines import pipeline_data_preparation as pl_dp, pipeline_preprocessing as pl_prep, pipeline_prediction as pl_pred
+from src.pipelines import pipeline_campus as pl_campus
 
 import streamlit_authenticator as stauth
 import yaml
 from yaml.loader import SafeLoader
 
+# Copy-on-Write es una opción global de pandas: aplica a todo el proceso (todas las sesiones y
+# trabajos en segundo plano). Las etapas de preprocesamiento dependen de ella para no copiar
+# sus entradas, así que se fija aquí, al arrancar, en vez de depender del orden de importación.
+pd.set_option('mode.copy_on_write', True)
+
 main_path = os.path.dirname(os.path.abspath(__file__))
 logger = config_logging()
-config_dict = load_config(main_path + '/config/config.yaml')
-valid_types = PreprocessConfig(**config_dict)
+CONFIG_PATH = main_path + '/config/config.yaml'
+
+@st.cache_resource(show_spinner=False)
+def load_app_config(config_path: str, mtime_ns: int) -> tuple[dict, PreprocessConfig, dict]:
+    """
+    Configuración leída y validada una vez por proceso (y de nuevo solo si el archivo cambia);
+    todas las sesiones comparten los mismos objetos, que no se modifican.
+    """
+    config_dict = load_config(config_path)
+    valid_types = PreprocessConfig(**config_dict)
+    return config_dict, valid_types, valid_types.campus_configs()
+
+# CAMPUSES: configuración de cada campus (uno solo, 'general', si config.yaml no define `campuses`)
+config_dict, valid_types, CAMPUSES = load_app_config(CONFIG_PATH, os.stat(CONFIG_PATH).st_mtime_ns)
+
+def stage_cache_dir(config: PreprocessConfig, *args, **kwargs) -> str:
+    """
+    Caché de etapas del campus, compartida por las réplicas (LRU en memoria + directorio compartido).
+    """
+    return config.files['stage_cache']
 
 st.set_page_config(
     page_title='EduTrack TecEldorado',
@@ -27,67 +67,699 @@ st.set_page_config(
     }  
 )
 
-@st.cache_data
-def load_data(files_dict: dict):
-    """
-    Función cacheada para cargar datos del archivo.
-    Esto evita recargar el mismo archivo múltiples veces.
-    """
-    for file in files_dict.keys():
-        try:
-            # Obtener el archivo cargado para esta tabla
-            uploaded_file = files_dict[file]
-            
-            if uploaded_file is not None:
-                # Determinar la extensión del archivo
-                file_extension = uploaded_file.name.split('.')[-1].lower()
-                
-                # Construir la ruta de destino
-                #destination_path = os.path.join(main_path, 'data', 'raw', f"{file}.csv")
-                print(f'guardando destino del archivo: {config_dict[file]}')
-                destination_path = config_dict[file]
-
-                # Leer el archivo según su extensión
-                if file_extension == 'csv':
-                    df = pd.read_csv(uploaded_file)
-                elif file_extension in ['xlsx', 'xls']:
-                    df = pd.read_excel(uploaded_file)
-                else:
-                    st.error(f"Formato de archivo no soportado: {file_extension}")
-                    continue
-                
-                # Guardar como CSV
-                df.to_csv(destination_path, index=False)
-                st.success(f"✅ Archivo {file} guardado exitosamente")
-                
-        except Exception as e:
-            show_error_load(e)
+# Archivo cargado en la interfaz -> clave de la tabla en `files` de config.yaml
+UPLOAD_TABLES = {
+    'dalumn': 'dalumn', 'dcalumn': 'dcalum', 'dkarde': 'dkarde', 'dplane': 'plan_estudio',
+    'despec': 'especialidad', 'descue': 'escuelas', 'dmunic': 'ubicaciones', 'dest': None
+}
+
+def stage_uploads(files_dict: dict, campus: str) -> tuple[dict, bool]:
+    """
+    Guarda tal cual los archivos cargados en la carpeta de trabajos del campus. Aquí
+    solo se revisan el formato y, en CSV, los encabezados (una línea); la lectura,
+    la validación de valores y la integración se hacen en la etapa 'carga' del
+    trabajo en segundo plano (`ingest_uploads`), que se detiene si algún archivo no
+    cumple su esquema.
+
+    Returns:
+        tuple: (por archivo: tabla, ruta temporal e identificador de la carga, que forma
+            parte de la llave del trabajo; True si se aceptaron todos los archivos)
+    """
+    config = CAMPUSES[campus]
+    uploads, accepted = {}, True
+    for file, uploaded_file in files_dict.items():
+        if uploaded_file is None:
             continue
-    
+        file_extension = uploaded_file.name.split('.')[-1].lower()
+        table = UPLOAD_TABLES.get(file)
+        if table is None:
+            st.info(f"ℹ️ El archivo {file} no se utiliza en el preprocesamiento, se omite")
+            continue
+        if file_extension not in ['csv', 'xlsx', 'xls']:
+            st.error(f"Formato de archivo no soportado: {file_extension}")
+            accepted = False
+            continue
+        if file_extension == 'csv':
+            try:
+                validate_header(read_header(uploaded_file, encoding='utf-8'), SIS_SCHEMAS[table])
+            except SchemaValidationError as e:
+                st.error(f"❌ El archivo {file} no cumple el formato esperado, no se guardó")
+                st.dataframe(e.summary, hide_index=True)
+                log_error(e)
+                accepted = False
+                continue
+            except Exception as e:
+                show_error_load(e)
+                accepted = False
+                continue
+        staging_dir = os.path.join(config.files['jobs_dir'], 'cargas')
+        os.makedirs(staging_dir, exist_ok=True)
+        path = os.path.join(staging_dir, f'{uploaded_file.file_id}.{file_extension}')
+        with open(path, 'wb') as f:
+            f.write(uploaded_file.getbuffer())
+        uploads[file] = {'table': table, 'path': path, 'name': uploaded_file.name, 'id': uploaded_file.file_id}
+    if not accepted:
+        for upload in uploads.values():
+            os.remove(upload['path'])
+        return {}, False
+    return uploads, True
 
-@st.cache_data
-def send2preprocess(config: dict):
+def ingest_uploads(campus: str, uploads: dict) -> dict:
     """
-    Función cacheada para procesar el DataFrame.
-    Aquí puedes agregar cualquier preprocesamiento necesario.
+    Etapa 'carga' del trabajo: lee y valida todos los archivos cargados y, solo si
+    todos cumplen su esquema, los guarda en las rutas del campus (o los integra a su
+    almacén por upsert). Un archivo inválido detiene el trabajo antes de tocar los datos.
+
+    Returns:
+        dict: Registros guardados por archivo
+
+    Raises:
+        SchemaValidationError: Si algún archivo no cumple su esquema
     """
-    # valid_types = PreprocessConfig(**config)
-    return pl_prep.preprocess_pipeline(valid_types)
+    config = CAMPUSES[campus]
+    try:
+        frames = {}
+        for file, upload in uploads.items():
+            schema = SIS_SCHEMAS[upload['table']]
+            if upload['path'].endswith('.csv'):
+                # En CSV se validan los encabezados antes de leerlo completo
+                validate_header(read_header(upload['path'], encoding='utf-8'), schema)
+                df = pd.read_csv(upload['path'])
+            else:
+                df = pd.read_excel(upload['path'])
+                validate_header(list(df.columns), schema)
+            df_errors = validate_frame(df, schema)
+            if not df_errors.empty:
+                raise SchemaValidationError(f"{schema.name} ({upload['name']})", df_errors)
+            frames[file] = df
 
-@st.cache_data
-def send2prepare(df: pd.DataFrame) -> pd.DataFrame:
+        saved = {}
+        for file, df in frames.items():
+            table = uploads[file]['table']
+            if config.source == 'warehouse' and table in pl_prep.SIS_TABLES:
+                # Las tablas del SIS se integran al almacén por llave (upsert)
+                saved[file] = pl_prep.open_warehouse(config).upsert(table, df)
+            else:
+                destination_path = config.files[table]
+                os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+                df.to_csv(destination_path, index=False)
+                saved[file] = len(df)
+            logger.info(f"✅ Archivo {uploads[file]['name']} guardado en {table} ({saved[file]} registros)")
+        return saved
+    finally:
+        for upload in uploads.values():
+            if os.path.exists(upload['path']):
+                os.remove(upload['path'])
+
+@TieredCache.cached_by('preprocess', stage_cache_dir)
+def send2preprocess(config: PreprocessConfig, input_key: str, keep_target: bool = False):
     """
+    Función cacheada para procesar el DataFrame del campus.
+    La llave incluye el contenido de las tablas de entrada (`input_key`).
     """
-    obj = pl_dp.DataPreparationPipeline(df)
+    return pl_prep.preprocess_pipeline(config, keep_target=keep_target)
+
+@TieredCache.cached_by('prepare', stage_cache_dir)
+def send2prepare(config: PreprocessConfig, df: pd.DataFrame, artifact_version: str) -> pd.DataFrame:
+    """
+    Función cacheada que prepara la matriz de variables con el artefacto vigente del campus
+    (`artifact_version` forma parte de la llave).
+    """
+    artifact = load_prep_artifact(config.campus)
+    obj = pl_dp.DataPreparationPipeline(df, artifact)
     return obj.get_prepared_data()
 
-@st.cache_data
-def send2predict(df: pd.DataFrame, config: PreprocessConfig) -> tuple[pd.DataFrame, pd.DataFrame]:
+def store_features(config: PreprocessConfig, df_prepared: pd.DataFrame, controls: pd.Series) -> str:
+    """
+    Guarda la matriz preparada en el almacén de variables del campus (una carpeta por contenido)
+    y devuelve su ruta; se abre mapeada en memoria, compartida entre sesiones y réplicas.
+    """
+    root = config.files.get('feature_store') or config.files['jobs_dir']
+    path = os.path.join(root, FeatureStore.key_for(df_prepared))
+    if not FeatureStore.exists(path):
+        FeatureStore.write(path, df_prepared, controls)
+    return path
+
+@st.cache_resource
+def load_prep_artifact(campus: str):
+    """
+    Artefacto de preparación ajustado en el entrenamiento del campus; None si no existe,
+    en cuyo caso la preparación se ajusta con los datos cargados.
+    """
+    path = CAMPUSES[campus].files.get('prep_artifact')
+    if path and os.path.exists(path):
+        return joblib.load(path)
+    logger.info('ℹ️ Sin artefacto de preparación, se ajusta con los datos cargados')
+    return None
+
+def get_artifact_version(config: PreprocessConfig) -> str:
+    """
+    Hash del artefacto de preparación del campus; 'sin-artefacto' si no existe.
+    """
+    path = config.files.get('prep_artifact')
+    if not (path and os.path.exists(path)):
+        return 'sin-artefacto'
+    return file_digest(path)[:12]
+
+@TieredCache.cached_by('predict', stage_cache_dir)
+def send2predict(config: PreprocessConfig, df: pd.DataFrame, model_version: str) -> tuple[pd.DataFrame, pd.DataFrame]:
     # QUEDA PENDIENTE EL MÓDULO QUE CARGA EL DATAFRAME EN EL MODELO Y RETORNA LAS PREDICCIONES
-    # valid_types = PreprocessConfig(**config)
-    obj = pl_pred.Predictionpipeline(df, valid_types)
+    obj = pl_pred.Predictionpipeline(df, config)
     return obj.get_predictions()
-    
+
+@TieredCache.cached_by('explain', stage_cache_dir)
+def send2explain(config: PreprocessConfig, df: pd.DataFrame, model_version: str, artifact_version: str) -> pd.DataFrame:
+    """
+    Función cacheada que obtiene los factores principales de cada predicción con el modelo del campus;
+    los umbrales se reportan en unidades originales con el artefacto de preparación vigente.
+    """
+    obj = pl_pred.Predictionpipeline(df, config)
+    return obj.get_explanations(artifact=load_prep_artifact(config.campus))
+
+def get_model_version(config: PreprocessConfig) -> str:
+    """
+    Versión del modelo del campus (versión de la app y hash del archivo).
+    """
+    return pl_pred.Predictionpipeline(None, config).get_model_version()
+
+@st.cache_resource
+def get_predictor(campus: str, model_version: str) -> pl_pred.Predictionpipeline:
+    """
+    Pipeline de predicción con el modelo del campus ya cargado, compartido para las simulaciones interactivas.
+    """
+    obj = pl_pred.Predictionpipeline(None, CAMPUSES[campus])
+    obj.load_model()
+    return obj
+
+@st.cache_resource
+def get_history_store(campus: str) -> PredictionHistoryStore:
+    """
+    Recurso compartido con el historial de predicciones del campus (SQLite).
+    """
+    return PredictionHistoryStore(CAMPUSES[campus].files['history_db'])
+
+def save_to_history(config: PreprocessConfig, df_results: pd.DataFrame, run_id: str, model_version: str) -> str:
+    """
+    Registra los resultados del campus en su historial de predicciones; todos
+    los campus de una corrida comparten `run_id`.
+    """
+    return get_history_store(config.campus).record_run(df_results, model_version, run_id)
+
+# Etapas de una corrida, en el orden en que se reporta su avance
+JOB_STAGES = ['carga', 'preprocesamiento', 'preparacion', 'deriva', 'similitud', 'prediccion', 'explicacion', 'historial']
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """
+    Cola de trabajos compartida por todas las sesiones del proceso.
+    Los hilos de trabajo (y los de cada campus) no tienen contexto de sesión;
+    Streamlit lo advierte en cada llamada a una función cacheada, así que esas
+    advertencias se omiten.
+    """
+    logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').addFilter(
+        lambda record: not record.threadName.startswith(('edutrack-job', 'dag-corrida')))
+    return JobQueue(valid_types.files['jobs_db'], JOB_STAGES, max_workers=2)
+
+def input_key(config: PreprocessConfig) -> str:
+    """
+    Huella del contenido de las tablas de entrada del campus (revisiones del almacén y catálogos).
+    """
+    return pl_prep.input_version(config)
+
+def campus_key(config: PreprocessConfig) -> str:
+    """
+    Llave de la corrida de un campus con huellas baratas (tamaño y fecha de sus tablas de
+    entrada, modelo y artefacto; revisiones del almacén): no lee el contenido de ningún archivo.
+    """
+    files = [config.files['model'], config.files.get('prep_artifact')]
+    versions = [file_fingerprint(path) if path and os.path.exists(path) else '-' for path in files]
+    return f"{config.campus}:{pl_prep.input_fingerprint(config)}|{'|'.join(versions)}"
+
+def job_key(uploads: dict) -> str:
+    """
+    Llave de una corrida de todos los campus (y de los archivos cargados con ella).
+    Dos envíos con la misma llave mientras el primero sigue activo comparten trabajo.
+    """
+    keys = [campus_key(config) for config in CAMPUSES.values()] + sorted(upload['id'] for upload in uploads.values())
+    return hashlib.sha256('|'.join(keys).encode()).hexdigest()[:16]
+
+def run_campus_job(config: PreprocessConfig, job_id: str, progress) -> dict:
+    """
+    Corrida de un campus: preprocesamiento, preparación, monitoreo de deriva,
+    índice de alumnos similares, predicción, explicación y registro en el
+    historial, todo con las rutas, cachés y modelo del campus. Los resultados
+    (y el reporte de deriva) quedan en archivos parquet del campus y la matriz
+    preparada en su almacén de variables.
+    """
+    # Versiones del campus calculadas una sola vez por corrida
+    model_version = get_model_version(config)
+    artifact_version = get_artifact_version(config)
+    files = config.files
+    progress('preprocesamiento')
+    dfProcessed, df_students_names = send2preprocess(config, input_key(config), True)
+    # El desenlace conocido ('abandono') solo se usa en el índice de alumnos similares
+    outcomes = dfProcessed['abandono'].to_numpy(dtype=float, na_value=np.nan)
+    dfProcessed = dfProcessed.drop(columns='abandono')
+    logger.debug(f'Trabajo {job_id}: preprocesamiento {dfProcessed.shape}')
+    progress('preprocesamiento', DONE)
+    progress('preparacion')
+    dfPrepared = send2prepare(config, dfProcessed, artifact_version)
+    logger.debug(f'Trabajo {job_id}: preparación {dfPrepared.shape}')
+    features_path = store_features(config, dfPrepared, df_students_names['# Control'])
+    dfPrepared = FeatureStore(features_path).to_frame()
+    progress('preparacion', DONE)
+    progress('deriva')
+    os.makedirs(files['jobs_dir'], exist_ok=True)
+    df_drift = check_drift(dfPrepared, files.get('drift_baseline'))
+    drift_path = None
+    if df_drift is not None:
+        drift_path = os.path.join(files['jobs_dir'], f'{job_id}_deriva.parquet')
+        df_drift.to_parquet(drift_path, index=False)
+    progress('deriva', DONE)
+    progress('similitud')
+    similarity = SimilarityIndex.build(files['similarity_index'], dfPrepared,
+                                       df_students_names['# Control'], outcomes)
+    progress('similitud', DONE)
+    progress('prediccion')
+    df_predicted, df_predicted_proba = send2predict(config, dfPrepared, model_version)
+    progress('prediccion', DONE)
+    progress('explicacion')
+    df_explained = send2explain(config, dfPrepared, model_version, artifact_version)
+    progress('explicacion', DONE)
+    progress('historial')
+    df_data_to_show = pd.concat([
+        df_students_names.reset_index(drop=True),
+        dfProcessed[rs.RESULT_CONTEXT_COLS].reset_index(drop=True),
+        df_predicted, df_predicted_proba, df_explained
+    ], axis=1)
+    save_to_history(config, df_data_to_show, job_id, model_version)
+    results_path = os.path.join(files['jobs_dir'], f'{job_id}.parquet')
+    df_data_to_show.to_parquet(results_path, index=False)
+    progress('historial', DONE)
+    return {'results_path': results_path, 'features_path': features_path,
+            'drift_path': drift_path, 'similarity_revision': similarity.revision}
+
+def run_prediction_job(job_id: str, progress, campus: str = None, uploads: dict = None) -> dict:
+    """
+    Corrida completa en segundo plano: primero integra los archivos cargados
+    para `campus` (etapa 'carga') y después corre todos los campus en paralelo
+    (un campus por hilo); cada campus reutiliza sus propias etapas cacheadas, así
+    que solo se recalcula lo de los campus cuyas entradas o modelo cambiaron.
+    El identificador del trabajo es también el de la corrida en el historial de cada campus.
+    """
+    progress('carga')
+    if uploads:
+        ingest_uploads(campus, uploads)
+    progress('carga', DONE)
+    progress = shared_progress(progress, len(CAMPUSES))
+    campuses = pl_campus.run_per_campus(
+        CAMPUSES, lambda campus, config: run_campus_job(config, job_id, progress), name='corrida')
+    # Las métricas del proceso (valores sin mapear, deriva, tiempos por etapa) viajan con el
+    # resultado para mostrarlas en cualquier réplica que cargue la corrida
+    snapshot = metrics.snapshot()
+    logger.info(f"📊 Métricas de la corrida {job_id}: {snapshot}")
+    return {'run_id': job_id, 'campuses': campuses, 'metricas': snapshot}
+
+def read_campus_frames(campuses: dict, key: str) -> dict:
+    """
+    Lee el parquet `key` de cada campus del resultado de un trabajo (se omiten los que no existen).
+    """
+    return {campus: pd.read_parquet(result[key]) for campus, result in campuses.items()
+            if result.get(key) and os.path.exists(result[key])}
+
+def load_job_results(job: dict):
+    """
+    Carga en la sesión los resultados de un trabajo terminado: los resultados de
+    todos los campus en una sola tabla (con la columna 'Campus' si hay varios) y
+    la matriz preparada de cada campus por separado.
+    """
+    result = job['result']
+    campuses = result['campuses']
+    discard_export()
+    st.session_state.pop('view', None)
+    st.session_state['results'] = pl_campus.concat_campuses(read_campus_frames(campuses, 'results_path'))
+    st.session_state['prepared'] = {campus: FeatureStore(r['features_path']).to_frame()
+                                    for campus, r in campuses.items()}
+    st.session_state['run_id'] = result['run_id']
+    drift = read_campus_frames(campuses, 'drift_path')
+    st.session_state['drift'] = pl_campus.concat_campuses(drift) if drift else None
+    st.session_state['metrics'] = result.get('metricas')
+    st.session_state['loaded_job'] = job['job_id']
+
+@st.fragment(run_every=2)
+def show_job_status():
+    """
+    Avance del trabajo enviado por la sesión; se consulta periódicamente sin
+    volver a ejecutar la página completa hasta que el trabajo termina.
+    """
+    job_id = st.session_state.get('job_id')
+    if not job_id or st.session_state.get('loaded_job') == job_id:
+        return
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return
+    if job['status'] == FAILED:
+        st.error(f"❌ La corrida {job_id} terminó con error: {job['error']}")
+        if job['stage'] == 'carga':
+            st.info("ℹ️ Los archivos cargados no se guardaron y no se generaron resultados")
+        return
+    if job['status'] == DONE:
+        load_job_results(job)
+        st.rerun()
+    stage = job['stage'] or 'en cola'
+    st.progress(job['fraction'], text=f"Procesando corrida {job_id}: {stage}")
+
+@st.cache_data
+def get_kpis(run_id: str, _df_results: pd.DataFrame) -> dict:
+    """
+    Indicadores agregados de la corrida, calculados una sola vez por run_id.
+    """
+    return rs.compute_kpis(_df_results)
+
+@st.cache_data
+def get_filter_options(run_id: str, _df_results: pd.DataFrame) -> dict:
+    """
+    Valores disponibles para los filtros de la corrida, calculados una sola vez por run_id.
+    """
+    return {col: sorted(_df_results[col].dropna().astype(str).unique())
+            for col in ['cve_carrera', 'cve_plan_estud', pl_campus.CAMPUS_COL] if col in _df_results.columns}
+
+def select_campus(key: str, options: list = None) -> str:
+    """
+    Campus sobre el que trabaja un panel; el selector solo aparece si hay más de un campus.
+    """
+    options = options or list(CAMPUSES)
+    if len(options) == 1:
+        return options[0]
+    return st.selectbox("Campus", options, key=key)
+
+def campus_results(df_results: pd.DataFrame, campus: str) -> pd.DataFrame:
+    """
+    Resultados de un campus, en el mismo orden que las filas de su matriz preparada.
+    """
+    if pl_campus.CAMPUS_COL not in df_results.columns:
+        return df_results
+    return df_results[df_results[pl_campus.CAMPUS_COL] == campus].reset_index(drop=True)
+
+@st.cache_data
+def send2compare(run_id: str, campus: str, _df: pd.DataFrame, model_paths: dict) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Función cacheada por corrida y campus que califica todos los modelos candidatos sobre la misma matriz preparada.
+    """
+    obj = pl_pred.MultiModelPipeline(_df, CAMPUSES[campus], model_paths)
+    return obj.get_comparison()
+
+def show_model_comparison(df_results: pd.DataFrame, run_id: str):
+    """
+    Análisis comparativo de los modelos configurados en `models` de cada campus.
+    """
+    options = [campus for campus, config in CAMPUSES.items() if len(config.models or {}) >= 2]
+    if not options:
+        return
+    with st.expander("Comparación de modelos"):
+        campus = select_campus("compare_campus", options)
+        if not st.toggle("Comparar modelos candidatos", key="compare_models"):
+            return
+        df_comparison, df_agreement, df_summary = send2compare(
+            run_id, campus, st.session_state['prepared'][campus], CAMPUSES[campus].models)
+        st.dataframe(df_summary, hide_index=True)
+        st.caption("Acuerdo entre pares de modelos")
+        st.dataframe(df_agreement)
+        df_disagree = pd.concat([campus_results(df_results, campus)[['# Control']], df_comparison], axis=1)
+        df_disagree = df_disagree[df_disagree['Acuerdo'] < 1].sort_values('Desv. riesgo', ascending=False)
+        st.caption(f"{len(df_disagree)} alumnos con predicciones distintas entre modelos (se muestran los 50 de mayor dispersión)")
+        st.dataframe(df_disagree.head(50), hide_index=True)
+
+def show_drift():
+    """
+    Deriva de las variables de la corrida respecto a la línea base del entrenamiento (PSI y KS).
+    """
+    df_drift = st.session_state.get('drift')
+    with st.expander("Deriva de variables"):
+        if df_drift is None:
+            st.info("ℹ️ No hay línea base de deriva para el modelo vigente (se genera al reentrenar)")
+            return
+        counts = df_drift['estado'].value_counts()
+        dcol1, dcol2, dcol3 = st.columns(3)
+        dcol1.metric("Estables", int(counts.get('estable', 0)))
+        dcol2.metric("Deriva moderada", int(counts.get('moderada', 0)))
+        dcol3.metric("Deriva significativa", int(counts.get('significativa', 0)))
+        st.caption("PSI < 0.1 estable · 0.1 a 0.25 moderada · > 0.25 significativa; "
+                   "medias en la escala normalizada del entrenamiento")
+        st.dataframe(df_drift, hide_index=True)
+
+def show_metrics():
+    """
+    Métricas del proceso registradas al terminar la corrida: valores sin mapear por
+    columna, PSI/KS de deriva y segundos por etapa de cada grafo.
+    """
+    snapshot = st.session_state.get('metrics')
+    if not snapshot:
+        return
+    with st.expander("Métricas del proceso"):
+        unmapped = snapshot.get('remap_sin_mapeo', {})
+        st.metric("Valores sin mapear", int(sum(unmapped.values())))
+        st.dataframe(snapshot_frame(snapshot), hide_index=True)
+
+def show_what_if(df_results: pd.DataFrame):
+    """
+    Simulación "qué pasaría si" para un alumno: califica en un solo lote los cambios
+    de calificación y tipo de calificación por materia sobre su fila preparada.
+    """
+    with st.expander("Simulación de escenarios"):
+        campus = select_campus("what_if_campus")
+        artifact = load_prep_artifact(campus)
+        if artifact is None:
+            st.info("ℹ️ La simulación requiere el artefacto de preparación del entrenamiento (files['prep_artifact'])")
+            return
+        with st.form("what_if"):
+            control = st.text_input("Número de control", key="what_if_control")
+            wcol1, wcol2, wcol3 = st.columns([2, 1, 1])
+            subjects = wcol1.multiselect("Materias", pl_prep.MATERIAS)
+            grade = wcol2.number_input("Calificación", min_value=0, max_value=100, value=70, step=1)
+            statuses = list(pl_prep.CALCVE_MAP.values())
+            status = wcol3.selectbox("Tipo de calificación", statuses, index=statuses.index('Ord_1ra'))
+            submitted = st.form_submit_button("Simular")
+        if not (submitted and control and subjects):
+            return
+        df_campus = campus_results(df_results, campus)
+        positions = np.flatnonzero(df_campus['# Control'].astype(str).to_numpy() == control.strip())
+        if len(positions) == 0:
+            st.info(f"No hay resultados para el alumno {control} en esta corrida")
+            return
+        row = st.session_state['prepared'][campus].iloc[positions[0]]
+        def changes(mats: list, value: int) -> dict:
+            return {col: v for mat in mats for col, v in ((mat, value), (f'{mat}_calcve', status))}
+        scenarios = {mat: changes([mat], grade) for mat in subjects}
+        if len(subjects) > 1:
+            scenarios['Todas'] = changes(subjects, grade)
+        # Barrido de calificaciones para todas las materias elegidas, en el mismo lote
+        sweep = {f'{value}': changes(subjects, value) for value in range(0, 101, 5)}
+        df_scored = get_predictor(campus, get_model_version(CAMPUSES[campus])).score_scenarios(
+            row, {**scenarios, **sweep}, artifact)
+        n_main = len(scenarios) + 1
+        st.dataframe(df_scored.head(n_main), hide_index=True)
+        df_sweep = df_scored.iloc[n_main:].assign(Calificación=list(range(0, 101, 5)))
+        st.line_chart(df_sweep, x='Calificación', y='Riesgo', y_label='Riesgo de abandono (%)')
+
+@st.cache_resource
+def get_similarity_index(campus: str, revision: str) -> SimilarityIndex:
+    """
+    Índice de alumnos similares del campus abierto una vez por revisión (fragmentos mapeados en memoria).
+    """
+    return SimilarityIndex(CAMPUSES[campus].files['similarity_index'])
+
+def show_similar(df_view: pd.DataFrame):
+    """
+    Alumnos del mismo campus con variables más parecidas a uno o varios alumnos y su desenlace conocido.
+    """
+    with st.expander("Alumnos similares"):
+        campus = select_campus("similar_campus")
+        revision = SimilarityIndex.current_revision(CAMPUSES[campus].files['similarity_index'])
+        if revision is None:
+            st.info("ℹ️ El índice de alumnos similares se genera con la siguiente corrida")
+            return
+        index = get_similarity_index(campus, revision)
+        scol1, scol2, scol3 = st.columns([2, 1, 1])
+        controls = scol1.text_input("Números de control (separados por coma)", key="similar_controls")
+        k = scol2.number_input("Vecinos", min_value=1, max_value=50, value=10, step=1)
+        known_only = scol3.toggle("Solo con desenlace conocido", value=True)
+        at_risk = st.toggle("Todos los alumnos en riesgo del filtro actual", key="similar_at_risk")
+        if at_risk:
+            df_campus = campus_results(df_view, campus)
+            queries = df_campus.loc[df_campus['Prediccion'] == 'Abandono', '# Control'].astype(str).tolist()
+        else:
+            queries = [c.strip() for c in controls.split(',') if c.strip()]
+        if not queries:
+            return
+        df_neighbors = index.neighbors(queries, k=int(k), known_only=known_only)
+        if df_neighbors.empty:
+            st.info("No se encontraron los alumnos consultados en el índice")
+            return
+        if len(queries) == 1:
+            outcome = df_neighbors['abandono'].map({1: 'Abandonó', 0: 'Continuó'}).fillna('Sin desenlace')
+            st.dataframe(df_neighbors.assign(Desenlace=outcome).drop(columns=['# Control', 'abandono']),
+                         hide_index=True)
+            return
+        df_summary = df_neighbors.groupby('# Control', sort=False).agg(
+            **{'Vecinos con desenlace': ('abandono', 'count'), '% abandono vecinos': ('abandono', 'mean'),
+               'Distancia media': ('Distancia', 'mean')}).reset_index()
+        df_summary['% abandono vecinos'] = (df_summary['% abandono vecinos'].astype(float) * 100).round(2)
+        df_summary['Distancia media'] = df_summary['Distancia media'].round(4)
+        st.caption(f"{len(df_summary)} alumnos consultados")
+        st.dataframe(df_summary.sort_values('% abandono vecinos', ascending=False), hide_index=True)
+
+def history_enricher(run_id: str):
+    """
+    Crea la función que agrega a cada bloque exportado el historial previo del
+    alumno en el historial de su campus.
+    """
+    df_previous = pd.concat({campus: get_history_store(campus).previous_summary(run_id) for campus in CAMPUSES})
+    def enrich(chunk: pd.DataFrame) -> pd.DataFrame:
+        campuses = (chunk[pl_campus.CAMPUS_COL].to_numpy() if pl_campus.CAMPUS_COL in chunk.columns
+                    else np.repeat(next(iter(CAMPUSES)), len(chunk)))
+        keys = pd.MultiIndex.from_arrays([campuses, chunk['# Control'].astype(str).to_numpy()])
+        return chunk.assign(**{col: df_previous[col].reindex(keys).to_numpy() for col in df_previous.columns})
+    return enrich
+
+def discard_export():
+    """
+    Elimina el archivo exportado de la sesión, si existe.
+    """
+    export = st.session_state.pop('export', None)
+    if export and os.path.exists(export['path']):
+        os.remove(export['path'])
+
+def show_export(df_results: pd.DataFrame, run_id: str):
+    """
+    Exportación bajo demanda: el archivo solo se genera al presionar el botón,
+    por bloques y en un archivo temporal.
+    """
+    with st.expander("💾 Descargar resultados"):
+        fmt = st.selectbox("Formato", list(ex.EXPORT_FORMATS), format_func=str.upper)
+        encoding = 'utf-8-sig'
+        if fmt == 'csv':
+            encoding = ex.CSV_ENCODINGS[st.selectbox("Codificación", list(ex.CSV_ENCODINGS))]
+        include_explanations = st.checkbox("Incluir factores de riesgo", value=True)
+        include_history = st.checkbox("Incluir historial previo", value=False)
+        if st.button("Generar archivo", icon=':material/download:'):
+            discard_export()
+            try:
+                path = ex.export_results(
+                    df_results, fmt, encoding=encoding,
+                    include_explanations=include_explanations,
+                    enrich_chunk=history_enricher(run_id) if include_history else None)
+                st.session_state['export'] = {'path': path, 'fmt': fmt, 'run_id': run_id}
+            except ValueError as e:
+                st.error(str(e))
+        export = st.session_state.get('export')
+        if export and export['run_id'] == run_id and os.path.exists(export['path']):
+            extension, mime = ex.EXPORT_FORMATS[export['fmt']]
+            with open(export['path'], 'rb') as f:
+                st.download_button(
+                    label="💾 Descargar archivo",
+                    data=f,
+                    file_name=f"Predicciones-{run_id}{extension}",
+                    mime=mime,
+                )
+
+def get_view(df_results: pd.DataFrame, run_id: str, carreras: list, planes: list, prob_range: tuple,
+             labels: list, sort_by, ascending: bool, campuses: list = ()) -> pd.DataFrame:
+    """
+    Resultados filtrados y ordenados, guardados en la sesión mientras no cambien
+    la corrida, los filtros o el orden (cambiar de página solo toma otra rebanada).
+    """
+    key = (run_id, tuple(carreras), tuple(planes), tuple(prob_range), tuple(labels), sort_by, ascending,
+           tuple(campuses))
+    view = st.session_state.get('view')
+    if view is None or view['key'] != key:
+        df_view = rs.filter_results(df_results, carreras, planes, prob_range, labels, campuses)
+        view = {'key': key, 'df': rs.sort_results(df_view, sort_by, ascending)}
+        st.session_state['view'] = view
+    return view['df']
+
+@st.fragment
+def show_results():
+    """
+    Muestra los resultados guardados en la sesión con filtrado, orden y
+    paginación del lado del servidor; solo la página visible se envía al navegador.
+    Los controles del panel solo re-ejecutan este fragmento.
+    """
+    df_results = st.session_state.get('results')
+    if df_results is None:
+        return
+    run_id = st.session_state['run_id']
+    st.subheader("Resultados")
+    st.caption(f"Corrida registrada en el historial: {run_id}")
+
+    kpis = get_kpis(run_id, df_results)
+    if 'por_campus' in kpis:
+        st.caption("Riesgo por campus")
+        st.dataframe(kpis['por_campus'], hide_index=True)
+    kcol1, kcol2 = st.columns(2)
+    with kcol1:
+        st.caption("Riesgo por carrera")
+        st.dataframe(kpis['por_carrera'], hide_index=True)
+    with kcol2:
+        st.caption("Riesgo por semestre")
+        st.dataframe(kpis['por_semestre'], hide_index=True)
+
+    options = get_filter_options(run_id, df_results)
+    with st.container(border=True):
+        fcol1, fcol2, fcol3 = st.columns(3)
+        carreras = fcol1.multiselect("Carrera", options['cve_carrera'])
+        planes = fcol2.multiselect("Plan de estudios", options['cve_plan_estud'])
+        labels = fcol3.multiselect("Predicción", ['Abandono', 'No abandono'])
+        campuses = []
+        if pl_campus.CAMPUS_COL in options:
+            campuses = st.multiselect("Campus", options[pl_campus.CAMPUS_COL])
+        prob_range = st.slider("Probabilidad (%)", 0.0, 100.0, (0.0, 100.0))
+        scol1, scol2, scol3 = st.columns([2, 1, 1])
+        sort_by = scol1.selectbox("Ordenar por", [None] + list(df_results.columns),
+                                  format_func=lambda col: col or '—')
+        ascending = scol2.toggle("Ascendente", value=True)
+        page_size = scol3.selectbox("Filas por página", [25, 50, 100, 500], index=1)
+
+    df_view = get_view(df_results, run_id, carreras, planes, prob_range, labels, sort_by, ascending, campuses)
+    page = st.number_input("Página", min_value=1, value=1, step=1)
+    df_page, n_pages = rs.paginate(df_view, page, page_size)
+    st.caption(f"{len(df_view)} alumnos · página {min(page, n_pages)} de {n_pages}")
+    st.dataframe(df_page, hide_index=True)
+    show_drift()
+    show_metrics()
+    show_what_if(df_results)
+    show_similar(df_view)
+    show_model_comparison(df_results, run_id)
+
+    subcol1, subcol2 = st.columns([2.5,1])
+    with subcol1:
+        show_export(df_results, run_id)
+    with subcol2:
+        if st.button("Borrar caché", type='secondary', icon='📛'):
+            # La caché de etapas de cada campus se invalida en todas las réplicas; las tablas
+            # memorizadas por el grafo de preprocesamiento solo en este proceso
+            st.cache_data.clear()
+            clear_memo()
+            for config in CAMPUSES.values():
+                TieredCache.for_path(stage_cache_dir(config)).clear()
+
+@st.fragment
+def show_history():
+    """
+    Muestra la trayectoria de riesgo de un alumno a partir del historial de su campus.
+    """
+    st.subheader("Historial de predicciones")
+    control = st.text_input("Número de control", key="history_control")
+    if control:
+        df_timeline = pl_campus.concat_campuses(
+            {campus: get_history_store(campus).student_timeline(control.strip()) for campus in CAMPUSES})
+        if df_timeline.empty:
+            st.info(f"No hay predicciones registradas para el alumno {control}")
+        else:
+            df_timeline['created_at'] = pd.to_datetime(df_timeline['created_at'])
+            st.line_chart(df_timeline, x='created_at', y='prob_abandono',
+                          x_label='Fecha de corrida', y_label='Riesgo de abandono (%)')
+            st.dataframe(df_timeline, hide_index=True)
 
 def log_error(error):
     """
@@ -108,15 +780,20 @@ def show_error_load(e):
 
 LOGO_ELD = valid_types.files['images']+'logo_tec_eldorado_500X468.png'
 LOGO_TECNM = valid_types.files['images']+'logo_TecNM_216X300.png'
-# Función para convertir imagen local a base64
+# Función para convertir imagen local a base64 (una vez por proceso)
+@st.cache_data
 def get_base64_image(image_path):
     with open(image_path, "rb") as img_file:
         return base64.b64encode(img_file.read()).decode()
 def close_the_session():
     logger.info(f'❗ Finalización de sesión, usuario {st.session_state.get('name')}')
+    st.session_state.pop('login_logged', None)
 def access_app():
     #st.set_page_config(layout="wide")
-    logger.info(f'✅ Inicio de sesión exitoso, usuario {st.session_state.get('name')}')
+    # el inicio de sesión se registra una vez y no en cada re-ejecución de la página
+    if not st.session_state.get('login_logged'):
+        logger.info(f'✅ Inicio de sesión exitoso, usuario {st.session_state.get('name')}')
+        st.session_state['login_logged'] = True
     # Convertir imágenes locales a base64
     img_izq_base64 = get_base64_image(LOGO_ELD)
     img_der_base64 = get_base64_image(LOGO_TECNM)
@@ -157,8 +834,19 @@ def access_app():
 
     #st.markdown("<h3 style='text-align: center;'>Carga de datos</h3>", unsafe_allow_html=True)
     st.subheader("Carga de datos")
+    show_uploads()
+    show_job_status()
+    show_results()
+    show_history()
 
+@st.fragment
+def show_uploads():
+    """
+    Cargadores de archivos y envío de la corrida. Al cargar un archivo solo se
+    re-ejecuta este panel; el avance lo recoge `show_job_status` en su siguiente consulta.
+    """
     files_dict = {}
+    campus = select_campus("upload_campus")
     #tabsList = ["Arch. dalumn", "Arch. dcalumn", "Arch. dkarde", "Arch. dplane",
     #"Arch. despec", "Arch. descue", "Arch. dmunic", "Arch. dest"]
 
@@ -198,32 +886,30 @@ def access_app():
     #pressed = st.button("Procesar", type='primary', icon=':material/psychology:', use_container_width=True)
     if st.button("Procesar", type='primary', icon=':material/psychology:'):
         
-        load_data(files_dict)
-        dfProcessed, df_students_names = send2preprocess(config_dict)
-        print('esto devuelve preprocess:')
-        print(dfProcessed)
-        dfPrepared = send2prepare(dfProcessed)
-        print('esto devuelve prepared:')
-        print(dfPrepared)
-        df_predicted, df_predicted_proba = send2predict(dfPrepared, config_dict)
-        df_data_to_show = pd.concat([df_students_names, df_predicted, df_predicted_proba], axis=1)
-        print(df_students_names)
-        st.dataframe(df_data_to_show)
-        subcol1, subcol2 = st.columns([2.5,1])
-        with subcol1:
-            st.download_button(
-                label="💾 Descargar resultados",
-                data=df_data_to_show.to_csv(index=False).encode("latin-1"),
-                file_name= f"Predicciones-{datetime.now()}.csv",
-                mime="text/csv",
-            )
-        with subcol2:
-            if st.button("Borrar caché", type='secondary', icon='📛'):
-                st.cache_data.clear()
+        uploads, accepted = stage_uploads(files_dict, campus)
+        if not accepted:
+            # Sin corrida: se procesaría el extracto anterior como si fuera el cargado
+            st.warning("⚠️ Corrija los archivos rechazados y vuelva a procesar; no se inició ninguna corrida")
+        else:
+            st.session_state['job_id'] = get_job_queue().submit(
+                job_key(uploads), lambda job_id, progress: run_prediction_job(job_id, progress, campus, uploads))
 
 ###############################################################################################################
-with open(valid_types.files['config_login']) as file:
-    config = yaml.load(file, Loader=SafeLoader)
+@st.cache_data
+def load_login_config(path: str, mtime_ns: int) -> dict:
+    """
+    Configuración de acceso; se lee una vez por versión del archivo y cada
+    re-ejecución recibe su propia copia (el autenticador la modifica). Las
+    contraseñas en texto plano se cifran aquí una sola vez: con `auto_hash` el
+    autenticador las cifraría con bcrypt en cada re-ejecución.
+    """
+    with open(path) as file:
+        config = yaml.load(file, Loader=SafeLoader)
+    stauth.Hasher.hash_passwords(config['credentials'])
+    return config
+
+config = load_login_config(valid_types.files['config_login'],
+                           os.stat(valid_types.files['config_login']).st_mtime_ns)
 
 authenticator = stauth.Authenticate(
     config['credentials'],
@@ -0,0 +1,43 @@
+"""
+Normalización de `DataPreparationPipeline` con variables numéricas sin rol en
+NUMERIC_ROLES: las de valores 0/1 se dejan sin escalar y las demás se escalan
+como continuas, igual al ajustar que al calificar con el artefacto.
+
+Uso:
+    python -m pytest tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.bench_preprocess_backends import synthetic_data
+from src.pipelines.pipeline_data_preparation import DataPreparationPipeline
+from src.pipelines.pipeline_preprocessing import transform_data
+
+
+@pytest.fixture(scope='module')
+def df_processed() -> pd.DataFrame:
+    """Salida del preprocesamiento con tres variables sin rol: constante, 0/1 y continua."""
+    df_main, _ = transform_data(*synthetic_data(2_000))
+    flag = np.arange(len(df_main)) % 2
+    return df_main.assign(flag_const=1, flag=flag, extra=np.arange(len(df_main)) * 10)
+
+
+def test_undeclared_binary_left_unscaled(df_processed: pd.DataFrame) -> None:
+    """Las variables 0/1 sin rol conservan sus valores; las continuas sin rol van a [0, 1]."""
+    pipeline = DataPreparationPipeline(df_processed)
+    df = pipeline.get_prepared_data()
+    scaler_cols = pipeline.get_artifact()['scaler']['columns']
+
+    assert (df['flag_const'] == 1).all()
+    np.testing.assert_array_equal(df['flag'].to_numpy(), df_processed['flag'].to_numpy())
+    assert 'flag_const' not in scaler_cols and 'flag' not in scaler_cols
+    assert 'extra' in scaler_cols
+    assert df['extra'].min() == 0 and df['extra'].max() == 1
+
+
+def test_artifact_reproduces_fit(df_processed: pd.DataFrame) -> None:
+    """Calificar con el artefacto del ajuste da la misma matriz."""
+    pipeline = DataPreparationPipeline(df_processed)
+    df_scored = DataPreparationPipeline(df_processed, pipeline.get_artifact()).get_prepared_data()
+    pd.testing.assert_frame_equal(df_scored, pipeline.get_prepared_data())
@@ -0,0 +1,51 @@
+"""
+Memoria pico del preprocesamiento con pandas, en versión reducida de
+`benchmarks/bench_preprocess_memory.py`: con el contrato de etapas y
+Copy-on-Write la memoria pico de `transform_data` no rebasa MAX_PEAK_RATIO
+veces el tamaño de las tablas de entrada, y las entradas no se modifican.
+
+Uso:
+    python -m pytest tests
+"""
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from benchmarks.bench_preprocess_backends import synthetic_data
+from benchmarks.bench_preprocess_memory import MAX_PEAK_RATIO, frames_size
+from src.pipelines.pipeline_preprocessing import transform_data
+
+N_STUDENTS = 5_000
+
+
+@pytest.fixture(scope='module')
+def sis_data() -> tuple:
+    """Datos sintéticos del SIS: (df_cal, df_alumn, df_dcalumn, code_tables)."""
+    return synthetic_data(N_STUDENTS)
+
+
+def test_peak_memory_within_bound(sis_data: tuple) -> None:
+    """La memoria pico de `transform_data` queda dentro de MAX_PEAK_RATIO veces la entrada."""
+    df_cal, df_alumn, df_dcalumn, code_tables = sis_data
+    input_size = frames_size([df_cal, df_alumn, df_dcalumn, *code_tables])
+
+    tracemalloc.start()
+    try:
+        df_main, _ = transform_data(df_cal, df_alumn, df_dcalumn, code_tables, keep_target=True)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(df_main) > 0
+    ratio = peak / input_size
+    assert ratio <= MAX_PEAK_RATIO, f'memoria pico x{ratio:.2f} la entrada (límite x{MAX_PEAK_RATIO:.2f})'
+
+
+def test_inputs_unchanged(sis_data: tuple) -> None:
+    """Las etapas no modifican las tablas que reciben."""
+    df_cal, df_alumn, df_dcalumn, code_tables = sis_data
+    before = [df.copy(deep=True) for df in (df_cal, df_alumn, df_dcalumn, *code_tables)]
+    transform_data(df_cal, df_alumn, df_dcalumn, code_tables, keep_target=True)
+    for original, df in zip(before, (df_cal, df_alumn, df_dcalumn, *code_tables)):
+        pd.testing.assert_frame_equal(df, original)
@@ -0,0 +1,55 @@
+"""
+Reentrenamiento con `TrainingPipeline` sobre extractos sintéticos y una rejilla
+mínima: se escriben el modelo, el artefacto de preparación, las métricas y la
+línea base de deriva, y una segunda carga de la matriz se lee de la caché del
+FeatureStore sin repetir el preprocesamiento.
+
+Uso:
+    python -m pytest tests
+"""
+import os
+
+import pandas as pd
+import pytest
+import yaml
+
+from benchmarks.bench_app_load import REPO_DIR, TRAINING, write_extracts
+from src.pipelines import pipeline_preprocessing as pl_prep
+from src.pipelines.pipeline_training import TrainingPipeline
+from src.utils.config_utils import PreprocessConfig
+
+N_STUDENTS = 1_000
+OUTPUT_FILES = ['modelo_abandono.joblib', 'preparacion.joblib', 'metricas.json', 'linea_base_deriva.json']
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch) -> PreprocessConfig:
+    """Configuración del repositorio con sus rutas relativas resueltas en `tmp_path`."""
+    with open(os.path.join(REPO_DIR, 'config', 'config.yaml'), 'r', encoding='utf-8') as f:
+        raw = yaml.safe_load(f)
+    raw['training'] = {**raw['training'], **TRAINING}
+    monkeypatch.chdir(tmp_path)
+    write_extracts(raw, N_STUDENTS)
+    return PreprocessConfig(**raw)
+
+
+def test_train_writes_outputs(config: PreprocessConfig) -> None:
+    """El entrenamiento deja en su carpeta los cuatro archivos que consume la app."""
+    model_dir = TrainingPipeline(config).train()
+    for name in OUTPUT_FILES:
+        assert os.path.isfile(os.path.join(model_dir, name)), name
+
+
+def test_features_read_from_cache(config: PreprocessConfig, monkeypatch) -> None:
+    """Con las mismas entradas la segunda carga sale de la caché, sin preprocesar."""
+    pipeline = TrainingPipeline(config)
+    X, y, groups, _ = pipeline.load_features()
+
+    def fail(*args, **kwargs):
+        raise AssertionError('la matriz debía leerse de la caché')
+
+    monkeypatch.setattr(pl_prep, 'preprocess_pipeline', fail)
+    X_cached, y_cached, groups_cached, _ = pipeline.load_features()
+    pd.testing.assert_frame_equal(X_cached, X)
+    pd.testing.assert_series_equal(y_cached, y)
+    assert (groups_cached == groups).all()